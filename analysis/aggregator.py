@@ -0,0 +1,167 @@
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+DOWNLOAD_EVENTS = ("cowrie.session.file_download", "cowrie.session.file_upload")
+TERMINAL_COLUMNS = ["session", "width", "height", "src_ip"]
+
+# Report name -> output file written by analysis.py, in the order they are saved
+REPORT_FILES = {
+    "event_stats": "event_stats.json",
+    "ip_stats": "ip_stats.json",
+    "command_failed": "command_failed.json",
+    "daily_connect": "daily_connect.json",
+    "download_hash": "download_hash.json",
+    "command_uniq": "command_uniq.json",
+    "client_version": "client_version.json",
+}
+
+# Columns each report needs; a report is skipped when one is missing from the logs,
+# just like the KeyError raised by the corresponding analyze_* method
+REPORT_COLUMNS = {
+    "event_stats": ["eventid"],
+    "ip_stats": ["eventid", "src_ip"],
+    "command_failed": ["eventid", "input"],
+    "daily_connect": ["eventid", "timestamp"],
+    "download_hash": ["eventid", "shasum"],
+    "command_uniq": ["eventid", "input", "session"],
+    "client_version": ["eventid", "version"],
+}
+
+
+def _add_counts(counts: Dict, values: pd.Series):
+    """Add value counts of a Series to a dict, keeping keys in order of first appearance"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    for key, count in values.value_counts(sort=False).items():
+        counts[key] = counts.get(key, 0) + int(count)
+
+
+def _sorted_counts(counts: Dict) -> dict:
+    """Sort counts in descending order exactly like pandas value_counts() does"""
+    return pd.Series(counts, dtype="int64").sort_values(ascending=False).to_dict()
+
+
+class EventAggregator:
+    """Compute every analyze_* report of CowrieLogAnalyzer in a single pass over log chunks"""
+
+    def __init__(self):
+        self.columns = set()
+        self.event_counts: Dict[str, int] = {}
+        self.terminal_info: List[dict] = []
+        self.ip_counts: Dict[str, int] = {}
+        self.client_versions: Dict[str, int] = {}
+        self.command_failed: Dict[str, int] = {}
+        self.download_hashes: Dict[str, int] = {}
+        self.daily_connects: Dict[str, int] = {}
+        self.command_sessions: Dict[str, list] = {}
+
+    def update(self, chunk: pd.DataFrame):
+        """Aggregate one chunk of log events; chunks must be passed in log order"""
+        self.columns.update(chunk.columns)
+        if "eventid" not in chunk.columns or chunk.empty:
+            return
+
+        _add_counts(self.event_counts, chunk["eventid"])
+
+        downloads = []
+        for eventid, events in chunk.groupby("eventid", sort=False, observed=True):
+            if eventid == "cowrie.session.connect":
+                if "src_ip" in events.columns:
+                    _add_counts(self.ip_counts, events["src_ip"])
+                if "timestamp" in events.columns:
+                    _add_counts(self.daily_connects, pd.to_datetime(events["timestamp"]).dt.strftime("%Y-%m-%d"))
+            elif eventid == "cowrie.client.version":
+                if "version" in events.columns:
+                    _add_counts(self.client_versions, events["version"])
+            elif eventid == "cowrie.client.size":
+                terminals = events.reindex(columns=TERMINAL_COLUMNS)
+                for column in TERMINAL_COLUMNS:
+                    if isinstance(terminals[column].dtype, pd.CategoricalDtype):
+                        terminals[column] = terminals[column].astype(object)
+                    elif column in ("width", "height") and pd.api.types.is_numeric_dtype(terminals[column]):
+                        terminals[column] = terminals[column].astype("float64")
+                self.terminal_info.extend(terminals.fillna("Unknown").to_dict(orient="records"))
+            elif eventid == "cowrie.command.failed":
+                if "input" in events.columns:
+                    _add_counts(self.command_failed, events["input"])
+            elif eventid == "cowrie.command.input":
+                if "input" in events.columns and "session" in events.columns:
+                    for command, sessions in events.groupby("input", sort=False, observed=True)["session"].agg(list).items():
+                        self.command_sessions.setdefault(command, []).extend(sessions)
+            elif eventid in DOWNLOAD_EVENTS:
+                downloads.append(events)
+
+        if downloads:
+            download_logs = pd.concat(downloads).sort_index() if len(downloads) > 1 else downloads[0]
+            if "shasum" in download_logs.columns:
+                _add_counts(self.download_hashes, download_logs["shasum"])
+
+    def update_all(self, chunks: Iterable[pd.DataFrame]):
+        """Aggregate every chunk of an iterable"""
+        for chunk in chunks:
+            self.update(chunk)
+
+    def merge(self, other: "EventAggregator"):
+        """Merge the state of an aggregator built from logs that follow this one"""
+        self.columns.update(other.columns)
+        for mine, theirs in (
+            (self.event_counts, other.event_counts),
+            (self.ip_counts, other.ip_counts),
+            (self.client_versions, other.client_versions),
+            (self.command_failed, other.command_failed),
+            (self.download_hashes, other.download_hashes),
+            (self.daily_connects, other.daily_connects),
+        ):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.terminal_info.extend(other.terminal_info)
+        for command, sessions in other.command_sessions.items():
+            self.command_sessions.setdefault(command, []).extend(sessions)
+
+    def to_state(self) -> dict:
+        """Serialize the aggregate state to a JSON-compatible dict"""
+        return {
+            "columns": sorted(self.columns),
+            "event_counts": self.event_counts,
+            "terminal_info": self.terminal_info,
+            "ip_counts": self.ip_counts,
+            "client_versions": self.client_versions,
+            "command_failed": self.command_failed,
+            "download_hashes": self.download_hashes,
+            "daily_connects": self.daily_connects,
+            "command_sessions": self.command_sessions,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "EventAggregator":
+        """Restore an aggregator from a dict created by to_state()"""
+        aggregator = cls()
+        aggregator.columns = set(state["columns"])
+        for name in ("event_counts", "terminal_info", "ip_counts", "client_versions", "command_failed", "download_hashes", "daily_connects", "command_sessions"):
+            setattr(aggregator, name, state[name])
+        return aggregator
+
+    def _has_columns(self, report: str) -> bool:
+        return all(column in self.columns for column in REPORT_COLUMNS[report])
+
+    def reports(self) -> Dict[str, dict]:
+        """Build the report dicts, identical to the results of the analyze_* methods"""
+        reports: Dict[str, Optional[dict]] = {}
+        if self._has_columns("event_stats"):
+            terminal_info = self.terminal_info if "cowrie.client.size" in self.event_counts else []
+            if not terminal_info or all(column in self.columns for column in TERMINAL_COLUMNS):
+                reports["event_stats"] = {"events": _sorted_counts(self.event_counts), **({"terminal_info": terminal_info} if terminal_info else {})}
+        if self._has_columns("ip_stats"):
+            reports["ip_stats"] = {"ips": _sorted_counts(self.ip_counts)}
+        if self._has_columns("command_failed"):
+            reports["command_failed"] = {"command_failed": _sorted_counts(self.command_failed)}
+        if self._has_columns("daily_connect"):
+            reports["daily_connect"] = {"ssh_attempts_by_date": dict(sorted(self.daily_connects.items()))}
+        if self._has_columns("download_hash"):
+            reports["download_hash"] = {"download_files": _sorted_counts(self.download_hashes)}
+        if self._has_columns("command_uniq"):
+            reports["command_uniq"] = {"commands": [{"input": command, "session": self.command_sessions[command]} for command in sorted(self.command_sessions)]}
+        if self._has_columns("client_version"):
+            reports["client_version"] = {"client_versions": _sorted_counts(self.client_versions)}
+        return reports
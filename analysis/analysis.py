@@ -1,8 +1,17 @@
 import pandas as pd
 import json
-from typing import Optional, Callable
+from typing import List, Optional, Callable
 import argparse
 
+import metrics
+import profiling
+from aggregator import REPORT_COLUMNS, REPORT_FILES, TERMINAL_COLUMNS, EventAggregator
+from event_table import compact_chunk, concat_compact, format_peak_rss, memory_usage_bytes
+from log_cache import cache_available, iter_cached_chunks, load_cached_frame
+from log_reader import DEFAULT_CHUNK_BYTES, LOG_COLUMNS, find_log_files, is_s3_url, iter_log_chunks
+from report_io import add_format_argument, dump_report
+from sketches import SKETCH_COLUMNS, SKETCH_REPORT_FILE, SKETCH_STATE_FILE, SketchAggregator, save_state
+
 
 def logs_loaded_required(func: Callable):
     """Decorator to ensure that logs are loaded"""
@@ -11,32 +20,88 @@ def logs_loaded_required(func: Callable):
         if self.logs is None:
             print("Logs are not loaded.")
             return None
-        return func(self, *args, **kwargs)
+        with metrics.ANALYZE_SECONDS.labels(func.__name__).time(), profiling.stage(func.__name__) as record:
+            record.rows = len(self.logs)
+            return func(self, *args, **kwargs)
 
     return wrapper
 
 
-def save_to_json(data: dict, output_file: str):
-    """Save data to a JSON file"""
+def _plain(data):
+    """Convert compact columns (categoricals, float32) back to plain values"""
+    if isinstance(data, pd.Series):
+        if isinstance(data.dtype, pd.CategoricalDtype):
+            return data.astype(object)
+        return data.astype("float64") if data.dtype == "float32" else data
+    return data.apply(_plain)
+
+
+def save_to_json(data: dict, output_file: str, fmt: Optional[str] = None):
+    """Save data to a report file (indent=4 JSON unless another report_io format is given)"""
     try:
-        with open(output_file, "w") as f:
-            json.dump(data, f, indent=4)
+        output_file = dump_report(data, output_file, fmt)
         print(f"Data saved to '{output_file}'.")
     except Exception as e:
         print(f"Error occurred while saving data: {e}")
 
 
+def report_columns(reports: List[str]) -> List[str]:
+    """Columns the given reports read, so that nothing else is parsed or kept in memory"""
+    columns = list(dict.fromkeys(column for report in reports for column in REPORT_COLUMNS[report]))
+    if "event_stats" in reports:
+        columns += [column for column in TERMINAL_COLUMNS if column not in columns]
+    return columns
+
+
+# Report name -> analyze_* method computing it from the loaded event table
+REPORT_METHODS = {
+    "event_stats": "analyze_event_stats",
+    "ip_stats": "analyze_ip_stats",
+    "command_failed": "analyze_command_failed",
+    "daily_connect": "analyze_daily_connect",
+    "download_hash": "analyze_dowload_hash",
+    "command_uniq": "analyze_uniq_command",
+    "client_version": "analyze_client_version",
+}
+
+
 class CowrieLogAnalyzer:
-    def __init__(self, logfile: str = "cowrie.json"):
-        """Initialize with the log file path"""
+    def __init__(self, logfile: str = "cowrie.json", columns: Optional[List[str]] = LOG_COLUMNS, chunk_bytes: int = DEFAULT_CHUNK_BYTES, use_cache: bool = True):
+        """Initialize with the log file path (a file, a directory of cowrie.json* files, a glob pattern or an s3:// URL)"""
         self.logfile = logfile
+        self.columns = columns
+        self.chunk_bytes = chunk_bytes
+        # The columnar cache is keyed by local file stats, so S3 objects are always streamed
+        self.use_cache = use_cache and not is_s3_url(logfile)
         self.logs: Optional[pd.DataFrame] = None
+        # Event indexes of the log files, loaded on the first session or src_ip lookup
+        self.indexes: dict = {}
 
-    def load_logs(self):
-        """Load log file into a DataFrame"""
+    def iter_chunks(self, columns: Optional[List[str]] = None):
+        """Yield DataFrame chunks of the log files, through the columnar cache if enabled"""
+        logfiles = find_log_files(self.logfile)
+        if not logfiles:
+            raise FileNotFoundError(self.logfile)
+        columns = self.columns if columns is None else columns
+        if self.use_cache:
+            return iter_cached_chunks(logfiles, columns, self.chunk_bytes)
+        return iter_log_chunks(logfiles, columns, self.chunk_bytes)
+
+    def load_logs(self, columns: Optional[List[str]] = None):
+        """Load log files into a compact DataFrame, reading native NDJSON logs in chunks"""
         try:
-            self.logs = pd.read_json(self.logfile)
-            print(f"Log file '{self.logfile}' loaded successfully.")
+            logfiles = find_log_files(self.logfile)
+            if not logfiles:
+                raise FileNotFoundError(self.logfile)
+            columns = self.columns if columns is None else columns
+            with profiling.stage("load_logs") as record:
+                if self.use_cache:
+                    self.logs = load_cached_frame(logfiles, columns, self.chunk_bytes)
+                else:
+                    self.logs = concat_compact(compact_chunk(chunk) for chunk in iter_log_chunks(logfiles, columns, self.chunk_bytes))
+                record.rows = len(self.logs)
+            metrics.observe_events(self.logs, metrics.sensor_name(self.logfile))
+            print(f"Log file '{self.logfile}' loaded successfully ({len(self.logs)} events, {memory_usage_bytes(self.logs) / (1024 * 1024):.1f} MiB).")
         except json.JSONDecodeError as e:
             print(f"JSON Decode Error: {e}")
             self.logs = None
@@ -47,6 +112,68 @@ class CowrieLogAnalyzer:
             print(f"Unexpected error occurred: {e}")
             self.logs = None
 
+    def analyze_all(self, reports: Optional[List[str]] = None, sketches: Optional[SketchAggregator] = None) -> Optional[dict]:
+        """Compute every report (or the given ones) in a single streaming pass without loading the whole log
+
+        If sketches is given, it is updated from the same pass.
+        """
+        reports = list(REPORT_FILES) if reports is None else reports
+        columns = report_columns(reports)
+        if sketches is not None:
+            columns += [column for column in SKETCH_COLUMNS if column not in columns]
+        try:
+            aggregator = EventAggregator()
+            sensor = metrics.sensor_name(self.logfile)
+            with metrics.ANALYZE_SECONDS.labels("analyze_all").time(), profiling.stage("analyze_all") as record:
+                for chunk in self.iter_chunks(columns):
+                    record.rows += len(chunk)
+                    aggregator.update(chunk)
+                    if sketches is not None:
+                        sketches.update(chunk)
+                    metrics.observe_events(chunk, sensor)
+            print(f"Log file '{self.logfile}' analyzed successfully.")
+            return {name: data for name, data in aggregator.reports().items() if name in reports}
+        except FileNotFoundError:
+            print(f"File '{self.logfile}' not found.")
+        except Exception as e:
+            print(f"Unexpected error occurred: {e}")
+        return None
+
+    def _events_for(self, column: str, key: str) -> Optional[pd.DataFrame]:
+        """Events whose column equals key, looked up in the event index of each log file"""
+        try:
+            logfiles = find_log_files(self.logfile)
+            if not logfiles:
+                raise FileNotFoundError(self.logfile)
+            if self.use_cache and cache_available():
+                from event_index import EventIndex
+
+                for logfile in logfiles:
+                    if logfile not in self.indexes:
+                        self.indexes[logfile] = EventIndex.load(logfile, self.chunk_bytes)
+                frames = [self.indexes[logfile].read(column, key) for logfile in logfiles]
+            else:
+                # Without the cache there is no index to use: scan the logs
+                frames = [chunk[chunk[column] == key] for chunk in iter_log_chunks(logfiles, None, self.chunk_bytes) if column in chunk.columns]
+            frames = [frame for frame in frames if not frame.empty]
+            return pd.concat([_plain(frame) for frame in frames], ignore_index=True) if frames else pd.DataFrame()
+        except FileNotFoundError:
+            print(f"File '{self.logfile}' not found.")
+        except Exception as e:
+            print(f"Unexpected error occurred: {e}")
+        return None
+
+    def session_timeline(self, session: str) -> Optional[pd.DataFrame]:
+        """Every event of a session in time order"""
+        events = self._events_for("session", session)
+        if events is not None and "timestamp" in events.columns:
+            events = events.sort_values("timestamp", kind="stable", ignore_index=True)
+        return events
+
+    def events_for_ip(self, src_ip: str) -> Optional[pd.DataFrame]:
+        """Every event from a source IP in log order"""
+        return self._events_for("src_ip", src_ip)
+
     def parse_timestamp(self, timestamp: str) -> str:
         """Convert timestamp to 'yyyy-mm-dd' format"""
         try:
@@ -59,12 +186,12 @@ class CowrieLogAnalyzer:
     def analyze_event_stats(self) -> Optional[dict]:
         """Aggregate event counts and extract specific event data"""
         try:
-            event_counts = self.logs["eventid"].value_counts().to_dict()
+            event_counts = _plain(self.logs["eventid"]).value_counts().to_dict()
 
             terminal_info = []
             if "cowrie.client.size" in event_counts:
                 client_size_logs = self.logs[self.logs["eventid"] == "cowrie.client.size"]
-                terminal_info = client_size_logs[["session", "width", "height", "src_ip"]].fillna("Unknown").to_dict(orient="records")
+                terminal_info = _plain(client_size_logs[["session", "width", "height", "src_ip"]]).fillna("Unknown").to_dict(orient="records")
 
             return {"events": event_counts, **({"terminal_info": terminal_info} if terminal_info else {})}
         except Exception as e:
@@ -76,7 +203,7 @@ class CowrieLogAnalyzer:
         """Aggregate connection attempts by IP"""
         try:
             ssh_logs = self.logs[self.logs["eventid"] == "cowrie.session.connect"]
-            ip_counts = ssh_logs["src_ip"].value_counts().to_dict()
+            ip_counts = _plain(ssh_logs["src_ip"]).value_counts().to_dict()
             return {"ips": ip_counts}
         except Exception as e:
             print(f"Error occurred while analyzing IP stats: {e}")
@@ -87,7 +214,7 @@ class CowrieLogAnalyzer:
         """Aggregate client version counts"""
         try:
             version_logs = self.logs[self.logs["eventid"] == "cowrie.client.version"]
-            version_counts = version_logs["version"].value_counts().to_dict()
+            version_counts = _plain(version_logs["version"]).value_counts().to_dict()
             return {"client_versions": version_counts}
         except Exception as e:
             print(f"Error occurred while analyzing client versions: {e}")
@@ -98,7 +225,7 @@ class CowrieLogAnalyzer:
         """Aggregate failed commands"""
         try:
             failed_commands = self.logs[self.logs["eventid"] == "cowrie.command.failed"]
-            failed_inputs = failed_commands["input"].value_counts().to_dict()
+            failed_inputs = _plain(failed_commands["input"]).value_counts().to_dict()
             return {"command_failed": failed_inputs}
         except Exception as e:
             print(f"Error occurred while analyzing failed commands: {e}")
@@ -109,7 +236,7 @@ class CowrieLogAnalyzer:
         """Aggregate download file hashes"""
         try:
             download_logs = self.logs[self.logs["eventid"].isin(["cowrie.session.file_download", "cowrie.session.file_upload"])]
-            download_hash_counts = download_logs["shasum"].value_counts().to_dict()
+            download_hash_counts = _plain(download_logs["shasum"]).value_counts().to_dict()
             return {"download_files": download_hash_counts}
         except Exception as e:
             print(f"Error occurred while analyzing download hashes: {e}")
@@ -134,7 +261,7 @@ class CowrieLogAnalyzer:
         """Aggregate unique commands executed"""
         try:
             command_logs = self.logs[self.logs["eventid"] == "cowrie.command.input"]
-            command_uniq_df = command_logs.groupby("input")["session"].agg(list).reset_index()
+            command_uniq_df = _plain(command_logs[["input", "session"]]).groupby("input")["session"].agg(list).reset_index()
             command_uniq = {"commands": command_uniq_df.to_dict(orient="records")}
         except Exception as e:
             print(f"Error occurred while analyzing unique commands: {e}")
@@ -143,44 +270,54 @@ class CowrieLogAnalyzer:
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description=("Cowrie log JSON file reader.\n" "Ensure the log file is formatted correctly using 'jq -s '.' log.json'."))
-    parser.add_argument("--logfile", type=str, default="cowrie.json", help=("Path to the Cowrie log file (default: cowrie.json).\n" "The file should be a single JSON array."))
+    parser = argparse.ArgumentParser(description=("Cowrie log JSON file reader.\n" "Reads native line-delimited cowrie.json* logs (plain or gzip) as well as files formatted with 'jq -s '.' log.json'."))
+    parser.add_argument("--logfile", type=str, default="cowrie.json", help=("Path to the Cowrie log file (default: cowrie.json).\n" "May also be a directory containing cowrie.json* files, a glob pattern or an s3://bucket/prefix/ URL."))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_BYTES, help="Number of bytes read per chunk from NDJSON logs")
+    parser.add_argument("--reports", nargs="+", choices=list(REPORT_FILES), default=None, help="Reports to generate (default: all)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the columnar (Parquet) log cache")
+    parser.add_argument("--mode", choices=["stream", "table"], default="stream", help="stream: single pass over log chunks (default); table: load a compact in-memory event table first")
+    parser.add_argument("--sketch", action="store_true", help=f"Replace ip_stats and command_failed with HyperLogLog distinct counts and top-K ({SKETCH_REPORT_FILE}, state in {SKETCH_STATE_FILE})")
+    parser.add_argument("--session", help="Print the timeline of this session as NDJSON instead of writing reports")
+    parser.add_argument("--src-ip", help="Print every event from this source IP as NDJSON instead of writing reports")
+    metrics.add_metrics_arguments(parser)
+    profiling.add_profiling_arguments(parser)
+    add_format_argument(parser)
     args = parser.parse_args()
+    metrics.start_metrics(args.metrics_port, args.metrics_textfile)
+    profiling.start_profiling(args.profile, args.profile_dir, args.profiler)
+
+    analyzer = CowrieLogAnalyzer(args.logfile, chunk_bytes=args.chunk_size, use_cache=not args.no_cache)
+
+    if args.session or args.src_ip:
+        events = analyzer.session_timeline(args.session) if args.session else analyzer.events_for_ip(args.src_ip)
+        if events is not None and not events.empty:
+            print(events.dropna(axis=1, how="all").to_json(orient="records", lines=True, date_format="iso", date_unit="us"))
+        raise SystemExit(0 if events is not None else 1)
+
+    selected = args.reports or list(REPORT_FILES)
+    sketches = None
+    if args.sketch:
+        # The sketches stand in for the exact (and unbounded) IP and failed-command counts
+        selected = [name for name in selected if name not in ("ip_stats", "command_failed")]
+        sketches = SketchAggregator()
 
-    analyzer = CowrieLogAnalyzer(args.logfile)
-    analyzer.load_logs()
-
-    # Event stats aggregation
-    event_stats = analyzer.analyze_event_stats()
-    if event_stats:
-        save_to_json(event_stats, "event_stats.json")
-
-    # IP stats aggregation
-    ip_stats = analyzer.analyze_ip_stats()
-    if ip_stats:
-        save_to_json(ip_stats, "ip_stats.json")
-
-    # Command failed aggregation
-    command_failed = analyzer.analyze_command_failed()
-    if command_failed:
-        save_to_json(command_failed, "command_failed.json")
-
-    # Daily connection aggregation
-    daily_connect = analyzer.analyze_daily_connect()
-    if daily_connect:
-        save_to_json(daily_connect, "daily_connect.json")
-
-    # Download hash aggregation
-    download_hash = analyzer.analyze_dowload_hash()
-    if download_hash:
-        save_to_json(download_hash, "download_hash.json")
-
-    # Unique command aggregation
-    command_uniq = analyzer.analyze_uniq_command()
-    if command_uniq:
-        save_to_json(command_uniq, "command_uniq.json")
-
-    # Client version aggregation
-    client_version = analyzer.analyze_client_version()
-    if client_version:
-        save_to_json(client_version, "client_version.json")
+    if args.mode == "table":
+        # Load only the columns the selected reports read, then run each analyze_* method
+        columns = report_columns(selected)
+        if sketches is not None:
+            columns += [column for column in SKETCH_COLUMNS if column not in columns]
+        analyzer.load_logs(columns)
+        reports = {name: getattr(analyzer, REPORT_METHODS[name])() for name in REPORT_FILES if name in selected}
+        if sketches is not None and analyzer.logs is not None:
+            sketches.update(analyzer.logs)
+    else:
+        # All aggregations (event stats, IP stats, failed commands, daily connections,
+        # download hashes, unique commands and client versions) in a single pass
+        reports = analyzer.analyze_all(selected, sketches) or {}
+    for name, data in reports.items():
+        if data:
+            save_to_json(data, REPORT_FILES[name], args.format)
+    if sketches is not None:
+        save_to_json(sketches.report(), SKETCH_REPORT_FILE, args.format)
+        save_state(sketches, SKETCH_STATE_FILE)
+    print(format_peak_rss())
@@ -1,11 +1,20 @@
-import json
 import re
 import argparse
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
 import glob
+import hashlib
+import pickle
+import subprocess
 import yaml
 import os
 
+import metrics
+import profiling
+from label_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, LabelCache
+from report_io import add_format_argument, dump_report, load_report
+from sigma_condition import SigmaRuleSet
+from sigma_matcher import CompiledSigmaMatcher
+
 # パスを指定してSigmaルールを取得
 def load_sigma_rules(rules_path="./sigma/rules/**/*.yml"):
     rules = []
@@ -18,6 +27,60 @@ def load_sigma_rules(rules_path="./sigma/rules/**/*.yml"):
             print(f"Error reading {rule_file}: {e}")
     return rules
 
+RULE_BUNDLE_VERSION = 1
+DEFAULT_RULES_PATH = "./sigma/rules/**/*.yml"
+DEFAULT_BUNDLE_PATH = "./sigma_rules.bundle.pkl"
+
+# globパターンのうちワイルドカードを含まない先頭部分のディレクトリを返す
+def _rules_root(rules_path):
+    parts = []
+    for part in rules_path.split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or "."
+
+# ルール集合のバージョンを求める(サブモジュールのコミット、取得できなければ各ファイルのmtimeとサイズ)
+def rule_set_version(rules_path=DEFAULT_RULES_PATH):
+    root = _rules_root(rules_path)
+    try:
+        # コミット時点のルールディレクトリのtreeハッシュ(未追跡・変更ファイルがある場合は使わない)
+        tree = subprocess.run(["git", "-C", root, "rev-parse", "HEAD:./"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "-C", root, "status", "--porcelain", "."], capture_output=True, text=True, check=True).stdout
+        if tree and not dirty:
+            return f"git:{tree}:{rules_path}"
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    digest = hashlib.sha1(rules_path.encode())
+    for rule_file in sorted(glob.glob(rules_path, recursive=True)):
+        stat = os.stat(rule_file)
+        digest.update(f"{rule_file}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return f"stat:{digest.hexdigest()}"
+
+# logsource.productがlinuxのルールのみをキャッシュから読み込む(ルールが更新されていればYAMLを読み直して保存する)
+def load_rule_bundle(rules_path=DEFAULT_RULES_PATH, bundle_path=DEFAULT_BUNDLE_PATH, version=None):
+    version = version or rule_set_version(rules_path)
+    try:
+        with open(bundle_path, 'rb') as f:
+            bundle = pickle.load(f)
+        if bundle.get("bundle_version") == RULE_BUNDLE_VERSION and bundle.get("version") == version:
+            return bundle["rules"]
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Ignoring rule bundle {bundle_path}: {e}")
+
+    rules = [
+        rule for rule in load_sigma_rules(rules_path)
+        if isinstance(rule, dict) and isinstance(rule.get("logsource"), dict) and rule["logsource"].get("product") == "linux"
+    ]
+    bundle = {"bundle_version": RULE_BUNDLE_VERSION, "version": version, "rules": rules}
+    tmp_path = f"{bundle_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, bundle_path)
+    return rules
+
 # Sigmaルール内の文字列をエスケープする
 def _escape_string(pattern):
     return re.escape(pattern)
@@ -33,6 +96,20 @@ def _convert_string_with_modifiers_to_regex(pattern, modifiers=[]):
         regex = f".*{regex}$"
     return regex
 
+# パターン1件分の辞書を作成する(照合器で使うため元の文字列とmodifiersも保持する)
+def _pattern_entry(field, pattern, modifiers=[], not_flag=False):
+    if modifiers:
+        regex = _convert_string_with_modifiers_to_regex(pattern, modifiers)
+    else:
+        regex = _escape_string(pattern)
+    return {
+        "field": field,
+        "match": regex,
+        "not": not_flag,
+        "literal": pattern,
+        "modifiers": modifiers,
+    }
+
 # ルールから正規表現を生成し、辞書形式で返す関数
 def generate_regex_patterns(rules):
     regex_patterns = {}
@@ -60,61 +137,24 @@ def generate_regex_patterns(rules):
                         if isinstance(patterns, list): # or string
                             for pattern_obj in patterns:
                                 if isinstance(pattern_obj, str):
-                                    regex = _escape_string(pattern_obj)
-                                    regex_patterns[(title, description)].append({
-                                        "field": field,
-                                        "match": regex,
-                                        "not": False
-                                    })
+                                    regex_patterns[(title, description)].append(_pattern_entry(field, pattern_obj))
                                 elif isinstance(pattern_obj, dict):
                                     for modifier_type, target_pattern in pattern_obj.items():
                                         if isinstance(target_pattern, str):
+                                            target_patterns = [target_pattern]
+                                        elif isinstance(target_pattern, list):
+                                            target_patterns = target_pattern
+                                        else:
+                                            continue
+                                        for tp in target_patterns:
                                             if modifier_type == "not":
-                                                regex = _escape_string(target_pattern)
-                                                regex_patterns[(title, description)].append({
-                                                    "field": field,
-                                                    "match": regex,
-                                                    "not": True
-                                                })
+                                                regex_patterns[(title, description)].append(_pattern_entry(field, tp, not_flag=True))
                                             else:
-                                                modifiers = [modifier_type]
-                                                regex = _convert_string_with_modifiers_to_regex(target_pattern, modifiers)
-                                                regex_patterns[(title, description)].append({
-                                                    "field": field,
-                                                    "match": regex,
-                                                    "not": False
-                                                })
-                                        elif isinstance(target_pattern, list):
-                                            for tp in target_pattern:
-                                                if modifier_type == "not":
-                                                    regex = _escape_string(tp)
-                                                    regex_patterns[(title, description)].append({
-                                                        "field": field,
-                                                        "match": regex,
-                                                        "not": True
-                                                    })
-                                                else:
-                                                    modifiers = [modifier_type]
-                                                    regex = _convert_string_with_modifiers_to_regex(tp, modifiers)
-                                                    regex_patterns[(title, description)].append({
-                                                        "field": field,
-                                                        "match": regex,
-                                                        "not": False
-                                                    })
+                                                regex_patterns[(title, description)].append(_pattern_entry(field, tp, [modifier_type]))
                         elif isinstance(patterns, str):
-                            regex = _escape_string(patterns)
-                            regex_patterns[(title, description)].append({
-                                "field": field,
-                                "match": regex,
-                                "not": False
-                            })
+                            regex_patterns[(title, description)].append(_pattern_entry(field, patterns))
                 elif isinstance(value, str):
-                  regex = _escape_string(value)
-                  regex_patterns[(title, description)].append({
-                      "field": key,
-                      "match": regex,
-                      "not": False
-                  })
+                  regex_patterns[(title, description)].append(_pattern_entry(key, value))
         except Exception as e:
             print(f"Error processing rule '{title}': {e}")
 
@@ -127,87 +167,93 @@ def generate_regex_patterns(rules):
       })
     return formatted_regex_patterns
 
-def analyze_log_with_sigma(log_file: str, regex_patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
+def analyze_log_with_sigma(log_file: str, regex_patterns: List[Dict[str, Any]], matcher: Optional[Union[CompiledSigmaMatcher, SigmaRuleSet]] = None, cache: Optional[LabelCache] = None) -> Dict[str, Any]:
     """
     指定されたログファイルを読み込み、Sigmaルールで生成した正規表現パターンと照合してラベル付けを行います。
 
     Args:
         log_file (str): 解析対象のログファイルのパス。
         regex_patterns (List[Dict[str, Any]]): Sigmaルールから生成された正規表現パターン。
+        matcher (CompiledSigmaMatcher | SigmaRuleSet, optional): 複数ファイルで共有するコンパイル済みの照合器。
+            SigmaRuleSetを渡した場合はconditionを評価し、ルール単位でラベル付けします(regex_patternsは使用しません)。
+        cache (LabelCache, optional): コマンドごとのラベルのキャッシュ。キャッシュにないコマンドだけを照合します。
 
     Returns:
         Dict[str, Any]: 解析結果。各コマンドの `input` をキーとし、マッチしたルールを `rules` リストに格納した辞書。
     """
     analyzed_commands = {}
     try:
-        with open(log_file, 'r') as f:
-            data = json.load(f)
-            for command in data.get('commands', []):
-                input_text = command.get('input', '')
-                matches = []
-                for rule in regex_patterns:
-                    title = rule.get("title")
-                    description = rule.get("description")
-                    for pattern in rule.get("patterns", []):
-                      regex = pattern.get("match", "")
-                      field = pattern.get("field", "")
-                      not_flag = pattern.get("not", False)
-
-                      if not_flag:
-                        if not re.search(regex, input_text):
-                           matches.append({
-                               "title": title,
-                               "description": description,
-                               "field": field,
-                               "match": regex,
-                                "not": True,
-                            })
-                      elif re.search(regex, input_text):
-                          matches.append({
-                              "title": title,
-                              "description": description,
-                              "field": field,
-                              "match": regex,
-                              "not": False,
-                          })
-
-                if matches:
-                   analyzed_commands[input_text] = {
-                        "rules": [{
-                                "title": match["title"],
-                                "description": match["description"],
-                                "field": match["field"],
-                                "match": match["match"],
-                                "not": match["not"],
-                            }
-                             for match in matches
-                            ]
-                    }
-                else:
-                   analyzed_commands[input_text] = {"rules": []}
+        # 全パターンを1つの照合器にまとめ、コマンドごとに1回だけ走査する
+        matcher = matcher or CompiledSigmaMatcher(regex_patterns)
+        # プロファイル時はルールごとの評価時間も記録する
+        if profiling.enabled and matcher.rule_seconds is None:
+            matcher.enable_rule_timing()
+        # command_uniq はどの形式(json/gzip/zstd/msgpack)で保存されていても読める
+        data = load_report(log_file)
+        commands = [command.get('input', '') for command in data.get('commands', [])]
+        with profiling.stage("analyze_log_with_sigma") as record:
+            record.rows = len(commands)
+            cached = cache.get_many(commands) if cache else {}
+            labeled = {}
+            for input_text in commands:
+                rules = cached.get(input_text)
+                if rules is None:
+                    with metrics.SIGMA_MATCH_SECONDS.time():
+                        rules = matcher.match_rules(input_text)
+                    labeled[input_text] = rules
+                analyzed_commands[input_text] = {"rules": rules}
+            if cache and labeled:
+                cache.put_many(labeled)
+        profiling.add_rule_times(matcher)
     except Exception as e:
         print(f"Error processing {log_file}: {e}")
     return analyzed_commands
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Analyze log file with Sigma rules.')
-    parser.add_argument('--logfile', type=str, required=True, help='Path to the log file')
+    parser.add_argument('--logfile', type=str, nargs='+', required=True, help='Path to the log file (several files share one loaded rule bundle)')
+    parser.add_argument('--rules', type=str, default=DEFAULT_RULES_PATH, help='Glob pattern of the Sigma rule files')
+    parser.add_argument('--bundle', type=str, default=DEFAULT_BUNDLE_PATH, help='Path of the compiled rule bundle cache')
+    parser.add_argument('--mode', choices=['condition', 'patterns'], default='condition', help=(
+        "'condition' evaluates each rule's detection condition (default); "
+        "'patterns' labels every matching string of any selection, as older versions did"))
+    parser.add_argument('--label-cache', type=str, default=DEFAULT_CACHE_PATH, help='Path of the command label cache shared by all directories')
+    parser.add_argument('--label-cache-size', type=int, default=DEFAULT_MAX_ENTRIES, help='Maximum number of commands kept in the label cache')
+    parser.add_argument('--no-label-cache', action='store_true', help='Match every command without the label cache')
+    metrics.add_metrics_arguments(parser)
+    profiling.add_profiling_arguments(parser)
+    add_format_argument(parser)
     args = parser.parse_args()
+    metrics.start_metrics(args.metrics_port, args.metrics_textfile)
+    profiling.start_profiling(args.profile, args.profile_dir, args.profiler)
 
-    sigma_rules = load_sigma_rules()
+    version = rule_set_version(args.rules)
+    sigma_rules = load_rule_bundle(args.rules, args.bundle, version)
     print(f"Loaded {len(sigma_rules)} Sigma rules")
 
-    regex_patterns = generate_regex_patterns(sigma_rules)
-    print(f"Generated {len(regex_patterns)} regex patterns")
+    if args.mode == 'condition':
+        regex_patterns = []
+        matcher = SigmaRuleSet(sigma_rules)
+        print(f"Compiled {len(matcher.rules)} rule conditions ({len(matcher.skipped)} unsupported rules skipped)")
+    else:
+        regex_patterns = generate_regex_patterns(sigma_rules)
+        print(f"Generated {len(regex_patterns)} regex patterns")
+        matcher = CompiledSigmaMatcher(regex_patterns)
+
+    cache = None if args.no_label_cache else LabelCache(args.label_cache, f"{args.mode}:{version}", args.label_cache_size)
+
+    for logfile in args.logfile:
+        analyzed_data = analyze_log_with_sigma(logfile, regex_patterns, matcher, cache)
 
-    analyzed_data = analyze_log_with_sigma(args.logfile, regex_patterns)
+        # 出力先のファイルパスを決定
+        log_dir = os.path.dirname(logfile)
+        output_file = os.path.join(log_dir, "command_analysis.json")
 
-    # 出力先のファイルパスを決定
-    log_dir = os.path.dirname(args.logfile)
-    output_file = os.path.join(log_dir, "command_analysis.json")
+        # 解析結果を指定の形式で保存(拡張子は形式に合わせて変わる)
+        output_file = dump_report(analyzed_data, output_file, args.format)
 
-    # 解析結果をJSONファイルに保存
-    with open(output_file, 'w') as f:
-        json.dump(analyzed_data, f, indent=4)
+        print(f"Analysis results saved to {output_file}")
 
-    print(f"Analysis results saved to {output_file}")
+    if cache:
+        print(f"Label cache: {cache.hits} hits, {cache.misses} misses")
+        cache.close()
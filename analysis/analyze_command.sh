@@ -1,7 +1,13 @@
 #!/bin/bash
 
+# Analyze every command_uniq.json (or its .json.gz/.json.zst/.msgpack variant) in one process so the Sigma rule bundle is loaded once
+files=()
 for dir in ../logs/COWRIE*; do
-  if [ -f "${dir}/command_uniq.json" ]; then
-    python analyze_command.py --logfile ${dir}/command_uniq.json
+  if compgen -G "${dir}/command_uniq.*" > /dev/null; then
+    files+=("${dir}/command_uniq.json")
   fi
 done
+
+if [ ${#files[@]} -gt 0 ]; then
+  python analyze_command.py --logfile "${files[@]}"
+fi
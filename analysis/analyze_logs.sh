@@ -1,9 +1,4 @@
 #!/bin/bash
 
-for dir in ../logs/*; do
-  cd "$dir" || exit
-  if [ -f "merged.json" ]; then
-    python ../../analysis/analysis.py --logfile merged.json
-  fi
-  cd - || exit
-done
+# Analyze every directory under ../logs in parallel (see run_analysis.py --help)
+python run_analysis.py --logs-root ../logs "$@"
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+from analysis import REPORT_METHODS, CowrieLogAnalyzer
+from event_table import peak_rss_bytes
+from generate_logs import generate, parse_size
+from log_reader import find_log_files
+from merge_logs import merge_to_file
+
+BENCH_DIR = "./bench_data"
+GENERATOR_FILE = "generator.json"
+DEFAULT_SCALES = ["10MB"]
+# Generator settings shared by every scale, so results of different runs are comparable
+GENERATOR_SETTINGS = {"sensors": 3, "days": 7, "ips": 5000, "commands": 500, "hashes": 200, "seed": 0}
+# Wall time differences below this are timer noise, not regressions
+MIN_REGRESSION_SECONDS = 0.05
+ANALYZE_METHODS = list(REPORT_METHODS.values())
+STAGES = ["merge", "load_logs", *ANALYZE_METHODS, "analyze_all", "analyze_log_with_sigma"]
+
+
+def _measure(func: Callable) -> Tuple[object, dict]:
+    """Run func and return its result with the wall and CPU time it took"""
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = func()
+    return result, {"wall_seconds": round(time.perf_counter() - wall, 4), "cpu_seconds": round(time.process_time() - cpu, 4)}
+
+
+def _sensor_input(sensor_dir: str) -> str:
+    """The merged log of a sensor if the merge stage built it, else its rotated files"""
+    merged = os.path.join(sensor_dir, "merged.json")
+    return merged if os.path.exists(merged) else sensor_dir
+
+
+def run_stage(stage: str, data_dir: str, rules: str) -> dict:
+    """Run one stage over every sensor directory of data_dir in this process and measure it
+
+    Preparation the stage depends on (loading the logs for an analyze_* method, loading the
+    rules and writing command_uniq.json for Sigma) is timed separately as setup.
+    """
+    sensor_dirs = sorted(os.path.join(data_dir, name) for name in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, name)))
+    measured: dict = {}
+    rows = 0
+
+    if stage == "merge":
+        def merge():
+            for sensor_dir in sensor_dirs:
+                merge_to_file(find_log_files(sensor_dir), os.path.join(sensor_dir, "merged.json"))
+        _, measured = _measure(merge)
+        rows = sum(sum(1 for _ in open(os.path.join(d, "merged.json"), "rb")) for d in sensor_dirs)
+
+    elif stage == "load_logs" or stage in ANALYZE_METHODS:
+        analyzers = [CowrieLogAnalyzer(_sensor_input(d), use_cache=False) for d in sensor_dirs]
+        _, load = _measure(lambda: [analyzer.load_logs() for analyzer in analyzers])
+        rows = sum(len(analyzer.logs) for analyzer in analyzers if analyzer.logs is not None)
+        if stage == "load_logs":
+            measured = load
+        else:
+            measured = {"setup_seconds": load["wall_seconds"], "setup_peak_rss_bytes": peak_rss_bytes()}
+            _, timing = _measure(lambda: [getattr(analyzer, stage)() for analyzer in analyzers])
+            measured.update(timing)
+
+    elif stage == "analyze_all":
+        analyzers = [CowrieLogAnalyzer(_sensor_input(d), use_cache=False) for d in sensor_dirs]
+        results, measured = _measure(lambda: [analyzer.analyze_all() for analyzer in analyzers])
+        rows = sum(sum(result["event_stats"]["events"].values()) for result in results if result)
+
+    elif stage == "analyze_log_with_sigma":
+        from analyze_command import analyze_log_with_sigma, load_sigma_rules
+        from sigma_condition import SigmaRuleSet
+
+        def prepare():
+            sigma_rules = load_sigma_rules(rules)
+            command_files = []
+            for sensor_dir in sensor_dirs:
+                analyzer = CowrieLogAnalyzer(_sensor_input(sensor_dir), use_cache=False)
+                command_file = os.path.join(sensor_dir, "command_uniq.json")
+                with open(command_file, "w") as f:
+                    json.dump(analyzer.analyze_all(["command_uniq"])["command_uniq"], f)
+                command_files.append(command_file)
+            return SigmaRuleSet(sigma_rules), command_files
+
+        (matcher, command_files), setup = _measure(prepare)
+        if not matcher.rules:
+            return {"skipped": f"no Sigma rules found at '{rules}'"}
+        measured = {"setup_seconds": setup["wall_seconds"]}
+        results, timing = _measure(lambda: [analyze_log_with_sigma(command_file, [], matcher) for command_file in command_files])
+        measured.update(timing)
+        rows = sum(len(result) for result in results)
+
+    else:
+        raise ValueError(f"Unknown stage '{stage}'")
+
+    measured["rows"] = rows
+    measured["peak_rss_bytes"] = peak_rss_bytes()
+    return measured
+
+
+def run_stage_subprocess(stage: str, data_dir: str, rules: str) -> dict:
+    """Run a stage in a fresh interpreter, so that its peak RSS is not inflated by earlier stages"""
+    command = [sys.executable, os.path.abspath(__file__), "--run-stage", stage, "--data-dir", data_dir, "--rules", rules]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    # The stage prints its progress; the measurement is the last line
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"error": (completed.stderr.strip().splitlines() or [f"exit code {completed.returncode}"])[-1]}
+    return json.loads(lines[-1])
+
+
+def prepare_data(scale: str, bench_dir: str) -> Tuple[str, dict]:
+    """Generate the logs of a scale once; later runs reuse them while the settings are unchanged"""
+    data_dir = os.path.join(bench_dir, scale)
+    settings = {"size_bytes": parse_size(scale), **GENERATOR_SETTINGS}
+    generator_file = os.path.join(data_dir, GENERATOR_FILE)
+    if os.path.exists(generator_file):
+        with open(generator_file, "r") as f:
+            stored = json.load(f)
+        if stored["settings"] == settings:
+            return data_dir, stored
+    print(f"Generating {scale} of synthetic logs in '{data_dir}'...")
+    stats = generate(data_dir, **settings)
+    # Outputs of earlier runs belong to the previous logs
+    for sensor_dir in stats:
+        for name in ("merged.json", "command_uniq.json"):
+            if os.path.exists(os.path.join(sensor_dir, name)):
+                os.remove(os.path.join(sensor_dir, name))
+    stored = {"settings": settings, "bytes": sum(s["bytes"] for s in stats.values()), "events": sum(s["events"] for s in stats.values())}
+    with open(generator_file, "w") as f:
+        json.dump(stored, f, indent=4)
+    return data_dir, stored
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[dict], baseline: List[dict], threshold: float) -> List[str]:
+    """Describe every stage whose wall time or peak RSS grew by more than threshold over the baseline"""
+    previous = {(r["scale"], r["stage"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["scale"], result["stage"]))
+        if not before:
+            continue
+        for key in ("wall_seconds", "peak_rss_bytes"):
+            if key == "wall_seconds" and result.get(key, 0) - before.get(key, 0) < MIN_REGRESSION_SECONDS:
+                continue
+            if result.get(key) and before.get(key) and result[key] > before[key] * (1 + threshold):
+                regressions.append(f"{result['scale']} {result['stage']}: {key} {before[key]} -> {result[key]} (+{result[key] / before[key] - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis stages on synthetic logs and write the measurements as JSON.")
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES, help="Log sizes to benchmark, e.g. 10MB 1GB 10GB (default: 10MB)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to run (default: all); merge runs first so later stages read merged.json")
+    parser.add_argument("--bench-dir", default=BENCH_DIR, help=f"Directory for the generated logs, reused between runs (default: {BENCH_DIR})")
+    parser.add_argument("--rules", default="./sigma/rules/**/*.yml", help="Glob pattern of the Sigma rule files for analyze_log_with_sigma")
+    parser.add_argument("--output", default="benchmark_results.json", help="Result file (default: benchmark_results.json)")
+    parser.add_argument("--baseline", help="Earlier result file to compare with; exits with status 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative increase of wall time or peak RSS reported as a regression (default: 0.1)")
+    parser.add_argument("--run-stage", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        print(json.dumps(run_stage(args.run_stage, args.data_dir, args.rules)))
+        return
+
+    results = []
+    for scale in args.scales:
+        data_dir, data = prepare_data(scale, args.bench_dir)
+        for stage in [stage for stage in STAGES if stage in args.stages]:
+            measured = run_stage_subprocess(stage, data_dir, args.rules)
+            results.append({"scale": scale, "bytes": data["bytes"], "events": data["events"], "stage": stage, **measured})
+            summary = measured.get("error") or measured.get("skipped") or f"{measured['wall_seconds']:.2f}s wall, {measured['cpu_seconds']:.2f}s CPU, peak RSS {measured['peak_rss_bytes'] / (1024 * 1024):.0f} MiB"
+            print(f"{scale} {stage}: {summary}")
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    tmp_path = f"{args.output}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=4)
+    os.replace(tmp_path, args.output)
+    print(f"Results saved to '{args.output}'.")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,153 @@
 import boto3
 import os
+import re
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timezone
 from dotenv import load_dotenv
 import botocore.exceptions
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 
 load_dotenv()
 
-def download_s3_logs(bucket_name, download_path):
+MANIFEST_FILE = ".s3_manifest.json"
+DEFAULT_WORKERS = 16
+DATE_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})")
+# Rotated logs are a few MB to a few hundred MB: multipart only for large objects
+TRANSFER_CONFIG = TransferConfig(multipart_threshold=64 * 1024 * 1024, multipart_chunksize=16 * 1024 * 1024, max_concurrency=4)
+
+
+def create_s3_client(endpoint_url=None, workers=DEFAULT_WORKERS):
+    """S3 client shared by every download thread, with one pooled connection per worker"""
+    config = Config(max_pool_connections=workers, retries={"max_attempts": 10, "mode": "adaptive"})
+    return boto3.session.Session().client("s3", endpoint_url=endpoint_url or None, config=config)
+
+
+def object_date(obj):
+    """Date of a log object: the rotation date in its key, or its last modification"""
+    match = DATE_PATTERN.search(obj["Key"].rsplit("/", 1)[-1])
+    if match:
+        return date.fromisoformat(match.group(1))
+    return obj["LastModified"].astimezone(timezone.utc).date()
+
+
+def list_objects(s3, bucket_name, prefixes=None, since=None, until=None):
+    """Yield the objects under the given sensor-name prefixes within [since, until]"""
+    paginator = s3.get_paginator("list_objects_v2")
+    for prefix in prefixes or [""]:
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith("/"):
+                    continue
+                if since or until:
+                    day = object_date(obj)
+                    if (since and day < since) or (until and day > until):
+                        continue
+                yield obj
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
     try:
-        s3 = boto3.client('s3')
-        paginator = s3.get_paginator('list_objects_v2')
-        pages = paginator.paginate(Bucket=bucket_name)
-
-        if not os.path.exists(download_path):
-            os.makedirs(download_path)
-
-        for page in pages:
-            for obj in page.get('Contents', []):
-                key = obj['Key']
-                file_path = os.path.join(download_path, key)
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                s3.download_file(bucket_name, key, file_path)
-                print(f"Downloaded {key} to {file_path}")
-    except botocore.exceptions.ClientError as e:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def is_up_to_date(obj, file_path, manifest):
+    """True if the local copy has the object's size and either its ETag or a newer mtime"""
+    if not os.path.exists(file_path):
+        return False
+    stat = os.stat(file_path)
+    if stat.st_size != obj["Size"]:
+        return False
+    entry = manifest.get(obj["Key"])
+    if entry is not None:
+        return entry.get("etag") == obj["ETag"]
+    return stat.st_mtime >= obj["LastModified"].timestamp()
+
+
+def download_object(s3, bucket_name, obj, file_path):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = file_path + ".part"
+    s3.download_file(bucket_name, obj["Key"], tmp_path, Config=TRANSFER_CONFIG)
+    os.replace(tmp_path, file_path)
+    # Keep the object's modification time so incremental analysis sees rotated files as unchanged
+    modified = obj["LastModified"].timestamp()
+    os.utime(file_path, (modified, modified))
+
+
+def download_s3_logs(bucket_name, download_path, prefixes=None, since=None, until=None, workers=DEFAULT_WORKERS, endpoint_url=None, full=False):
+    """Download new or changed log objects concurrently and return (downloaded, skipped, failed)"""
+    downloaded, skipped, failed = 0, 0, 0
+    manifest = None
+    try:
+        s3 = create_s3_client(endpoint_url, workers)
+        os.makedirs(download_path, exist_ok=True)
+        manifest_path = os.path.join(download_path, MANIFEST_FILE)
+        manifest = {} if full else load_manifest(manifest_path)
+
+        pending = []
+        for obj in list_objects(s3, bucket_name, prefixes, since, until):
+            file_path = os.path.join(download_path, obj["Key"])
+            if not full and is_up_to_date(obj, file_path, manifest):
+                manifest.setdefault(obj["Key"], {"etag": obj["ETag"], "size": obj["Size"]})
+                skipped += 1
+            else:
+                pending.append((obj, file_path))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(download_object, s3, bucket_name, obj, file_path): (obj, file_path) for obj, file_path in pending}
+            for future in as_completed(futures):
+                obj, file_path = futures[future]
+                try:
+                    future.result()
+                except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError, OSError) as e:
+                    print(f"Failed to download {obj['Key']}: {e}")
+                    failed += 1
+                    continue
+                manifest[obj["Key"]] = {"etag": obj["ETag"], "size": obj["Size"]}
+                downloaded += 1
+                print(f"Downloaded {obj['Key']} to {file_path}")
+    except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as e:
         print(f"An error occurred: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+    finally:
+        # Record what was downloaded even if the sync stopped part way
+        if manifest is not None:
+            save_manifest(manifest, manifest_path)
+    print(f"{downloaded} downloaded, {skipped} up to date, {failed} failed")
+    return downloaded, skipped, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync Cowrie logs from S3, downloading only new or changed objects.")
+    parser.add_argument("--prefix", action="append", dest="prefixes", help="Only sync keys starting with this sensor name (repeatable)")
+    parser.add_argument("--since", type=date.fromisoformat, help="Only sync logs dated on or after YYYY-MM-DD")
+    parser.add_argument("--until", type=date.fromisoformat, help="Only sync logs dated on or before YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Concurrent downloads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--full", action="store_true", help="Download every object even if the local copy matches")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     bucket_name = os.getenv('S3_BUCKET_NAME')
     download_path = os.getenv('DOWNLOAD_PATH')
+    # Point at a local S3 stand-in such as MinIO or moto's server mode
+    endpoint_url = os.getenv('S3_ENDPOINT_URL')
 
-    download_s3_logs(bucket_name, download_path)
+    download_s3_logs(bucket_name, download_path, args.prefixes, args.since, args.until, args.workers, endpoint_url, args.full)
+
+
+if __name__ == "__main__":
+    main()
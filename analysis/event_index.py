@@ -0,0 +1,116 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from log_cache import CACHE_COLUMNS, cache_path, ensure_cache, pq, read_cache_metadata, source_signature
+
+INDEX_VERSION = 1
+# Columns with an index from each key to the rows holding it
+INDEX_COLUMNS = ["session", "src_ip"]
+
+
+def index_path(logfile: str) -> str:
+    """Path of the index stored next to the Parquet cache of a log file"""
+    return cache_path(logfile)[: -len(".parquet")] + ".index.npz"
+
+
+class EventIndex:
+    """Rows of every session and src_ip in the Parquet cache of one log file
+
+    For each indexed column the keys are kept sorted together with a stable permutation
+    of the row numbers grouped by key and the offset of each key's group, so the events
+    of one key are found with a binary search and read from the few row groups holding them.
+    """
+
+    def __init__(self, logfile: str, arrays: Dict[str, np.ndarray]):
+        self.logfile = logfile
+        self.arrays = arrays
+        self.parquet_file = None
+        self.stored: List[str] = []
+        self.starts = np.zeros(1, dtype=np.int64)
+
+    def _open(self):
+        path = cache_path(self.logfile)
+        self.stored = read_cache_metadata(path)["columns"]
+        self.parquet_file = pq.ParquetFile(path, memory_map=True)
+        sizes = [self.parquet_file.metadata.row_group(i).num_rows for i in range(self.parquet_file.num_row_groups)]
+        self.starts = np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+
+    @classmethod
+    def build(cls, logfile: str) -> "EventIndex":
+        """Build the index from the cache of a log file and persist it"""
+        path = cache_path(logfile)
+        stored = read_cache_metadata(path)["columns"]
+        arrays = {"metadata": np.array(json.dumps({"version": INDEX_VERSION, "source": source_signature(logfile)}))}
+        for column in INDEX_COLUMNS:
+            if column not in stored:
+                continue
+            values = pq.read_table(path, columns=[column], memory_map=True).column(column).to_pandas()
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype("category")
+            # Renumber the dictionary codes so that they follow the sorted keys
+            categories = np.asarray(values.cat.categories, dtype=str)
+            order = np.argsort(categories, kind="stable")
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            codes = values.cat.codes.to_numpy()
+            codes = np.where(codes >= 0, rank[codes], -1)
+            keys = categories[order]
+            rows = np.argsort(codes, kind="stable")
+            # Rows without a key (code -1) sort first and are left out
+            rows = rows[int((codes < 0).sum()):]
+            offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(codes[codes >= 0], minlength=len(keys)), out=offsets[1:])
+            arrays[f"{column}_keys"] = keys
+            arrays[f"{column}_rows"] = rows.astype(np.int64)
+            arrays[f"{column}_offsets"] = offsets
+
+        target = index_path(logfile)
+        tmp_path = f"{target}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, target)
+        return cls(logfile, arrays)
+
+    @classmethod
+    def load(cls, logfile: str, chunk_bytes: Optional[int] = None) -> "EventIndex":
+        """Load the index of a log file, (re)building the cache and index when stale"""
+        if ensure_cache(logfile, chunk_bytes) or not os.path.exists(index_path(logfile)):
+            return cls.build(logfile)
+        with np.load(index_path(logfile)) as data:
+            arrays = {name: data[name] for name in data.files}
+        metadata = json.loads(str(arrays["metadata"]))
+        if metadata.get("version") != INDEX_VERSION or metadata.get("source") != source_signature(logfile):
+            return cls.build(logfile)
+        return cls(logfile, arrays)
+
+    def rows(self, column: str, key: str) -> np.ndarray:
+        """Row numbers of the events whose column equals key, in log order"""
+        if f"{column}_keys" not in self.arrays:
+            return np.empty(0, dtype=np.int64)
+        keys = self.arrays[f"{column}_keys"]
+        position = int(np.searchsorted(keys, key))
+        if position == len(keys) or keys[position] != key:
+            return np.empty(0, dtype=np.int64)
+        offsets = self.arrays[f"{column}_offsets"]
+        return self.arrays[f"{column}_rows"][offsets[position] : offsets[position + 1]]
+
+    def read(self, column: str, key: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read the events whose column equals key, decoding only the row groups that hold them"""
+        if self.parquet_file is None:
+            self._open()
+        rows = self.rows(column, key)
+        present = [c for c in (columns if columns is not None else CACHE_COLUMNS) if c in self.stored]
+        if len(rows) == 0:
+            return pd.DataFrame(columns=present)
+
+        starts = self.starts
+        row_groups = np.searchsorted(starts, rows, side="right") - 1
+        selected = np.unique(row_groups)
+        # Position of each row in the concatenation of the selected row groups
+        selected_starts = np.concatenate([[0], np.cumsum(starts[selected + 1] - starts[selected])[:-1]])
+        positions = rows - starts[row_groups] + selected_starts[np.searchsorted(selected, row_groups)]
+        table = self.parquet_file.read_row_groups(selected.tolist(), columns=present)
+        return table.take(positions).to_pandas()
@@ -0,0 +1,79 @@
+import sys
+from typing import Iterable, Optional
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Low-cardinality or highly repetitive string fields, dictionary-encoded in the compact table.
+# IP addresses are encoded the same way: each row holds a 4-byte code, like a packed IPv4 address,
+# while the reports keep their dotted-quad keys.
+COMPACT_CATEGORICAL_COLUMNS = ["eventid", "src_ip", "dst_ip", "session", "sensor", "protocol", "version", "input", "shasum", "username", "password", "url"]
+COMPACT_FLOAT_COLUMNS = ["width", "height", "src_port", "dst_port"]
+
+
+def compact_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Convert a parsed chunk to compact dtypes: categoricals, float32 numbers and UTC epoch timestamps"""
+    compact = {}
+    for column in chunk.columns:
+        values = chunk[column]
+        if column in COMPACT_CATEGORICAL_COLUMNS and not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype("category")
+        elif column in COMPACT_FLOAT_COLUMNS and pd.api.types.is_numeric_dtype(values):
+            # Terminal sizes and ports are exact in float32, and float keeps NaN for missing values
+            values = values.astype("float32")
+        elif column == "timestamp" and not pd.api.types.is_datetime64_any_dtype(values):
+            values = pd.to_datetime(values, utc=True, errors="coerce")
+        compact[column] = values
+    return pd.DataFrame(compact, index=chunk.index)
+
+
+def _str_categories(part: pd.Series) -> pd.Series:
+    """Give a categorical object (str) categories, whatever dtype its chunk happened to infer
+
+    A chunk where a column is missing or all NaN gets empty float64 categories, and
+    union_categoricals refuses to merge categories of different dtypes.
+    """
+    categories = part.cat.categories
+    if categories.dtype == object:
+        return part
+    categories = pd.Index([str(category) for category in categories], dtype=object)
+    return pd.Series(pd.Categorical.from_codes(part.cat.codes, categories=categories), index=part.index)
+
+
+def concat_compact(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate compact chunks, merging the categories of each column instead of falling back to objects"""
+    chunks = [chunk.reset_index(drop=True) for chunk in chunks]
+    if not chunks:
+        return pd.DataFrame()
+    columns = list(dict.fromkeys(column for chunk in chunks for column in chunk.columns))
+    frame = {}
+    for column in columns:
+        parts = [chunk[column] if column in chunk.columns else pd.Series(index=chunk.index, dtype="category") for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            frame[column] = pd.Series(union_categoricals([_str_categories(part) for part in parts], ignore_order=True))
+        else:
+            frame[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(frame)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far, or None where it cannot be measured"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def format_peak_rss() -> str:
+    peak = peak_rss_bytes()
+    return "Peak RSS: unknown" if peak is None else f"Peak RSS: {peak / (1024 * 1024):.1f} MiB"
+
+
+def memory_usage_bytes(frame: pd.DataFrame) -> int:
+    return int(frame.memory_usage(deep=True).sum())
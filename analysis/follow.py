@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import time
+from typing import BinaryIO, List, Optional
+
+import metrics
+from aggregator import REPORT_FILES, EventAggregator
+from incremental import file_fingerprint
+from log_reader import DEFAULT_CHUNK_BYTES, LOG_COLUMNS, parse_line_block
+from report_io import add_format_argument, dump_report
+
+# Path of the live log on a host running docker-compose.yml (volume cowrie-var)
+DEFAULT_LIVE_LOG = os.getenv("COWRIE_LIVE_LOG", "/var/lib/docker/volumes/cowrie_cowrie-var/_data/log/cowrie/cowrie.json")
+FOLLOW_STATE_FILE = ".follow_state.json"
+FOLLOW_STATE_VERSION = 1
+# Read at most this much per poll so a large backlog is processed in bounded steps
+READ_BYTES = 4 * 1024 * 1024
+
+
+class LogFollower:
+    """Read complete lines appended to a growing log file across rotation and truncation
+
+    Rotation (the file is renamed and a new one created at the same path) is detected by a
+    changed inode: the rest of the old file is read before switching. Truncation in place is
+    detected by the size dropping below the read position, and the file is re-read from the start.
+    """
+
+    def __init__(self, path: str, offset: int = 0):
+        self.path = path
+        self.file: Optional[BinaryIO] = None
+        self.inode: Optional[int] = None
+        self.offset = offset
+        self.remainder = b""
+        self.rotations = 0
+        self.truncations = 0
+
+    def _open(self) -> bool:
+        try:
+            self.file = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.file.seek(self.offset)
+        return True
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _read(self) -> bytes:
+        data = self.file.read(READ_BYTES)
+        if not data:
+            return b""
+        data = self.remainder + data
+        end = data.rfind(b"\n")
+        # The offset always points at the start of the incomplete last line
+        self.remainder = data[end + 1:]
+        self.offset = self.file.tell() - len(self.remainder)
+        return data[: end + 1]
+
+    def poll(self) -> bytes:
+        """Return the complete lines written since the previous poll (possibly empty)"""
+        if self.file is None and not self._open():
+            return b""
+        block = self._read()
+        if block:
+            return block
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # Between the rename and the creation of the new file
+            return b""
+        if stat.st_ino != self.inode:
+            # Rotated: the old file was drained above (a last line without newline is kept)
+            block = self.remainder + b"\n" if self.remainder.strip() else b""
+            self.close()
+            self.offset, self.remainder = 0, b""
+            self.rotations += 1
+            self._open()
+            return block
+        if stat.st_size < self.file.tell():
+            self.file.seek(0)
+            self.offset, self.remainder = 0, b""
+            self.truncations += 1
+        return b""
+
+
+class LiveAnalyzer:
+    """Keep every analyze_* aggregate up to date while following a live log"""
+
+    def __init__(self, logfile: str, output_dir: str, latency: float = 5.0, flush_interval: float = 60.0, poll_interval: float = 1.0, from_end: bool = False, sensor: Optional[str] = None, fmt: Optional[str] = None):
+        self.logfile = logfile
+        self.sensor = sensor or socket.gethostname()
+        self.fmt = fmt
+        self.output_dir = output_dir
+        self.latency = latency
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self.state_path = os.path.join(output_dir, FOLLOW_STATE_FILE)
+        self.aggregator = EventAggregator()
+        self.events = 0
+        self.running = True
+
+        offset = self._restore()
+        if offset is None:
+            offset = os.path.getsize(logfile) if from_end and os.path.exists(logfile) else 0
+        self.follower = LogFollower(logfile, offset)
+
+    def _restore(self) -> Optional[int]:
+        """Resume from the last flushed snapshot if it belongs to the current live file"""
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if state.get("version") != FOLLOW_STATE_VERSION or not os.path.exists(self.logfile):
+            return None
+        self.aggregator = EventAggregator.from_state(state["aggregator"])
+        if state.get("fingerprint") != file_fingerprint(self.logfile) or state["offset"] > os.path.getsize(self.logfile):
+            # The file was rotated while we were stopped: keep the totals, read the new file from the start
+            return 0
+        return state["offset"]
+
+    def _apply(self, blocks: List[bytes]):
+        if not blocks:
+            return
+        chunk = parse_line_block(b"".join(blocks), LOG_COLUMNS)
+        self.aggregator.update(chunk)
+        metrics.observe_events(chunk, self.sensor)
+        self.events += len(chunk)
+
+    def flush(self) -> bool:
+        """Write the reports in the formats of analysis.py and checkpoint the aggregate state
+
+        A failed write is printed and reported as False instead of stopping the daemon.
+        """
+        try:
+            for name, data in self.aggregator.reports().items():
+                if data:
+                    dump_report(data, os.path.join(self.output_dir, REPORT_FILES[name]), self.fmt)
+            state = {
+                "version": FOLLOW_STATE_VERSION,
+                "fingerprint": file_fingerprint(self.logfile) if os.path.exists(self.logfile) else None,
+                "offset": self.follower.offset,
+                "aggregator": self.aggregator.to_state(),
+            }
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            print(f"Error occurred while writing the reports: {e}")
+            return False
+        metrics.write_textfile()
+        return True
+
+    def stop(self, *_):
+        self.running = False
+
+    def run(self, max_seconds: Optional[float] = None):
+        """Poll the log until stopped, batching lines for at most `latency` seconds before aggregating"""
+        start = time.monotonic()
+        last_flush = start
+        pending: List[bytes] = []
+        pending_bytes = 0
+        pending_since = None
+        dirty = False
+        while self.running and (max_seconds is None or time.monotonic() - start < max_seconds):
+            block = self.follower.poll()
+            now = time.monotonic()
+            if block:
+                pending.append(block)
+                pending_bytes += len(block)
+                pending_since = pending_since or now
+            if pending and (pending_bytes >= DEFAULT_CHUNK_BYTES or now - pending_since >= self.latency):
+                self._apply(pending)
+                pending, pending_bytes, pending_since = [], 0, None
+                dirty = True
+            # Checkpoint only with nothing pending, so the saved offset matches the aggregates
+            if dirty and not pending and now - last_flush >= self.flush_interval:
+                # A failed flush is retried at the next interval
+                dirty = not self.flush()
+                last_flush = now
+            if not block:
+                # Nothing new: sleep instead of spinning, which keeps CPU use negligible
+                time.sleep(self.poll_interval)
+
+        # Flush what was read; any unread lines stay beyond the saved offset
+        self._apply(pending)
+        self.flush()
+        self.follower.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow a live cowrie.json and keep the analysis.py reports up to date.")
+    parser.add_argument("--logfile", default=DEFAULT_LIVE_LOG, help=f"Live log to follow (default: {DEFAULT_LIVE_LOG}, or $COWRIE_LIVE_LOG)")
+    parser.add_argument("--output-dir", default=".", help="Directory for the report snapshots and the follow checkpoint")
+    parser.add_argument("--latency", type=float, default=5.0, help="Maximum seconds new lines wait before being aggregated (default: 5)")
+    parser.add_argument("--flush-interval", type=float, default=60.0, help="Seconds between report snapshots (default: 60)")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when no new lines were written (default: 1)")
+    parser.add_argument("--from-end", action="store_true", help="Without a checkpoint, start at the end of the file instead of the beginning")
+    parser.add_argument("--sensor", default=socket.gethostname(), help="Sensor label of the metrics (default: host name)")
+    add_format_argument(parser)
+    metrics.add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    metrics.start_metrics(args.metrics_port, args.metrics_textfile)
+    analyzer = LiveAnalyzer(args.logfile, args.output_dir, args.latency, args.flush_interval, args.poll_interval, args.from_end, args.sensor, args.format)
+    signal.signal(signal.SIGTERM, analyzer.stop)
+    signal.signal(signal.SIGINT, analyzer.stop)
+    print(f"Following '{args.logfile}', writing reports to '{args.output_dir}'.")
+    analyzer.run()
+    print(f"Stopped after {analyzer.events} events ({analyzer.follower.rotations} rotations, {analyzer.follower.truncations} truncations).")
+
+
+if __name__ == "__main__":
+    main()
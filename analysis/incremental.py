@@ -0,0 +1,114 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, Optional
+
+from aggregator import REPORT_FILES, EventAggregator
+from analysis import save_to_json
+from log_reader import DEFAULT_CHUNK_BYTES, LOG_COLUMNS, find_log_files, iter_line_blocks, open_log_file, parse_line_block
+
+STATE_FILE = ".analysis_state.json"
+STATE_VERSION = 1
+FINGERPRINT_BYTES = 4096
+
+
+def file_fingerprint(path: str) -> Optional[str]:
+    """Identify a log file by its first line, so that rotated copies are recognized"""
+    with open_log_file(path) as f:
+        return head_fingerprint(f.read(FINGERPRINT_BYTES))
+
+
+def head_fingerprint(head: bytes) -> Optional[str]:
+    """Fingerprint of a log file from its first FINGERPRINT_BYTES bytes"""
+    if not head:
+        return None
+    end = head.find(b"\n")
+    return hashlib.sha1(head if end == -1 else head[: end + 1]).hexdigest()
+
+
+def load_state(directory: str) -> dict:
+    """Load the checkpoint of a sensor directory, or an empty one"""
+    path = os.path.join(directory, STATE_FILE)
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+        if state.get("version") == STATE_VERSION:
+            return state
+        print(f"Ignoring checkpoint '{path}' written by another version.")
+    except FileNotFoundError:
+        pass
+    except json.JSONDecodeError as e:
+        print(f"Ignoring broken checkpoint '{path}': {e}")
+    return {"version": STATE_VERSION, "aggregator": None, "files": {}}
+
+
+def save_state(directory: str, state: dict):
+    """Atomically write the checkpoint of a sensor directory"""
+    path = os.path.join(directory, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def analyze_incremental(directory: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Optional[Dict[str, dict]]:
+    """Read only the log lines not seen by the previous run and merge them into the saved state
+
+    Only the raw cowrie.json* files are read: merged.json is rewritten by every merge, so
+    offsets into it mean nothing. Returns None when the directory has no raw logs.
+    """
+    paths = [path for path in find_log_files(directory) if os.path.basename(path).startswith("cowrie.json")]
+    if not paths:
+        print(f"No cowrie.json* logs in '{directory}': incremental mode cannot read merged.json, analyze it without --incremental.")
+        return None
+    state = load_state(directory)
+    aggregator = EventAggregator.from_state(state["aggregator"]) if state["aggregator"] else EventAggregator()
+    files: Dict[str, dict] = state["files"]
+    # Only files still present are kept, so the checkpoint does not grow with every rotation
+    seen: Dict[str, dict] = {}
+
+    new_bytes = 0
+    for path in paths:
+        with open_log_file(path) as f:
+            head = f.read(FINGERPRINT_BYTES)
+            fingerprint = head_fingerprint(head)
+            if fingerprint is None:
+                continue
+            if head.lstrip()[:1] == b"[":
+                print(f"Skipping '{path}': incremental mode needs native line-delimited logs.")
+                continue
+
+            # A rotated file keeps the first line of the live file it was read from
+            offset = files.get(fingerprint, {}).get("offset", 0)
+            f.seek(offset)
+            for block in iter_line_blocks(f, chunk_bytes, complete_only=True):
+                aggregator.update(parse_line_block(block, LOG_COLUMNS))
+                offset += len(block)
+                new_bytes += len(block)
+        seen[fingerprint] = {"path": os.path.basename(path), "offset": offset}
+
+    state["files"] = seen
+    state["aggregator"] = aggregator.to_state()
+    save_state(directory, state)
+    print(f"Read {new_bytes} new bytes from '{directory}'.")
+    return aggregator.reports()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally analyze the cowrie.json* logs of a sensor directory, reading only new lines.")
+    parser.add_argument("--logdir", type=str, default=".", help="Sensor directory containing cowrie.json* files; outputs and the checkpoint are written there")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_BYTES, help="Number of bytes read per chunk")
+    parser.add_argument("--reset", action="store_true", help="Discard the checkpoint and re-read every file")
+    args = parser.parse_args()
+
+    if args.reset and os.path.exists(os.path.join(args.logdir, STATE_FILE)):
+        os.remove(os.path.join(args.logdir, STATE_FILE))
+
+    reports = analyze_incremental(args.logdir, args.chunk_size)
+    if reports is None:
+        sys.exit(1)
+    for name, data in reports.items():
+        if data:
+            save_to_json(data, os.path.join(args.logdir, REPORT_FILES[name]))
@@ -1,14 +1,21 @@
 #!/bin/bash
 
+script_dir="$(cd "$(dirname "$0")" && pwd)"
+
+# Print a report as JSON whatever format it was written in (.json, .json.gz, .json.zst, .msgpack)
+report() {
+  python "$script_dir/report_io.py" cat "$1"
+}
+
 for dir in ../logs/COWRIE*; do
     cd $dir || exit
-  if [ -f "command_analysis.json" ]; then
+  if compgen -G "command_analysis.*" > /dev/null; then
     pwd
     echo "Number of unique commands label:"
-    jq '
+    report command_analysis.json | jq '
     . | to_entries |
     map(.value.rules | map(.title)) | flatten | unique | length
-    ' command_analysis.json
+    '
 
     echo "Number of unique vt label:"
     jq 'keys | length' vt_label.json
@@ -17,10 +24,10 @@ for dir in ../logs/COWRIE*; do
     jq 'keys | length' vt_category.json
 
     echo "Number of unique ip:"
-    jq '.ips | keys | length' ip_stats.json
+    report ip_stats.json | jq '.ips | keys | length'
 
     echo "Number of unique client version:"
-    jq '.client_versions | keys | length' client_version.json
+    report client_version.json | jq '.client_versions | keys | length'
   fi
     cd - || exit
 done
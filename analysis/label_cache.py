@@ -0,0 +1,67 @@
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List
+
+DEFAULT_CACHE_PATH = "./command_labels.sqlite"
+DEFAULT_MAX_ENTRIES = 2_000_000
+LABEL_CACHE_VERSION = 1
+BATCH_SIZE = 500
+
+
+class LabelCache:
+    """Persistent cache of Sigma labels per command, shared by every sensor directory
+
+    Entries are keyed by a hash of the rule bundle version and the command. Commands are
+    keyed verbatim: whitespace and case are significant to startswith/endswith, cased and
+    regex rules, so no further normalization is safe. The least recently used entries are
+    evicted once the cache holds more than max_entries commands.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, version: str = "", max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.version = f"{LABEL_CACHE_VERSION}:{version}"
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS labels (key BLOB PRIMARY KEY, rules TEXT NOT NULL, last_used REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS labels_last_used ON labels (last_used)")
+        self.connection.commit()
+
+    def _key(self, command: str) -> bytes:
+        return hashlib.sha256(f"{self.version}\0{command}".encode("utf-8", "surrogatepass")).digest()
+
+    def get_many(self, commands: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Look up commands and return the cached labels of those found"""
+        keys = {self._key(command): command for command in commands}
+        found: Dict[str, List[Dict[str, Any]]] = {}
+        key_list = list(keys)
+        now = time.time()
+        for start in range(0, len(key_list), BATCH_SIZE):
+            batch = key_list[start : start + BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            for key, rules in self.connection.execute(f"SELECT key, rules FROM labels WHERE key IN ({placeholders})", batch):
+                found[keys[key]] = json.loads(rules)
+            self.connection.execute(f"UPDATE labels SET last_used = ? WHERE key IN ({placeholders})", [now, *batch])
+        self.connection.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, labels: Dict[str, List[Dict[str, Any]]]):
+        """Store the labels of newly evaluated commands and evict the oldest entries"""
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO labels (key, rules, last_used) VALUES (?, ?, ?)",
+            ((self._key(command), json.dumps(rules), now) for command, rules in labels.items()),
+        )
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM labels").fetchone()
+        if count > self.max_entries:
+            self.connection.execute("DELETE FROM labels WHERE key IN (SELECT key FROM labels ORDER BY last_used LIMIT ?)", (count - self.max_entries,))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,173 @@
+import json
+import os
+from typing import Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from event_table import COMPACT_CATEGORICAL_COLUMNS, compact_chunk, concat_compact
+from log_reader import DEFAULT_CHUNK_BYTES, LOG_COLUMNS, iter_log_chunks
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # The cache is optional; logs are parsed from JSON without it
+    pa = None
+    pq = None
+
+CACHE_DIR = ".cowrie_cache"
+CACHE_VERSION = 1
+CACHE_METADATA_KEY = b"cowrie_cache"
+CACHE_BATCH_ROWS = 1_000_000
+
+# Columns stored in the cache: everything the analyses read plus a few common scalar fields
+CACHE_COLUMNS = LOG_COLUMNS + ["sensor", "protocol", "username", "password", "url", "dst_ip", "src_port", "dst_port"]
+CATEGORICAL_COLUMNS = ["eventid", "src_ip", "session"]
+FLOAT_COLUMNS = ["width", "height", "src_port", "dst_port"]
+
+
+def cache_available() -> bool:
+    """Check whether pyarrow is installed"""
+    return pq is not None
+
+
+def cache_path(logfile: str) -> str:
+    """Path of the Parquet cache for a log file"""
+    directory, name = os.path.split(os.path.abspath(logfile))
+    return os.path.join(directory, CACHE_DIR, name + ".parquet")
+
+
+def source_signature(logfile: str) -> dict:
+    """Size and mtime of a log file, stored with everything derived from it to detect changes"""
+    stat = os.stat(logfile)
+    return {"version": CACHE_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _cache_schema() -> "pa.Schema":
+    fields = []
+    for column in CACHE_COLUMNS:
+        if column in CATEGORICAL_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        elif column == "timestamp":
+            fields.append(pa.field(column, pa.timestamp("ns", tz="UTC")))
+        elif column in FLOAT_COLUMNS:
+            fields.append(pa.field(column, pa.float64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+def read_cache_metadata(path: str) -> Optional[dict]:
+    """Metadata (source signature and stored columns) of a cache file, or None if it is unreadable"""
+    try:
+        metadata = pq.read_metadata(path).metadata or {}
+        return json.loads(metadata[CACHE_METADATA_KEY])
+    except (OSError, KeyError, ValueError, pa.ArrowException):
+        return None
+
+
+def is_cache_valid(logfile: str) -> bool:
+    """Check whether the cache of a log file exists and matches the file's size and mtime"""
+    if not cache_available():
+        return False
+    metadata = read_cache_metadata(cache_path(logfile))
+    return metadata is not None and metadata.get("source") == source_signature(logfile)
+
+
+def _to_cache_table(chunk: pd.DataFrame, schema: "pa.Schema") -> "pa.Table":
+    """Convert a parsed chunk to the fixed, typed cache schema"""
+    arrays = []
+    for field in schema:
+        if field.name not in chunk.columns:
+            arrays.append(pa.nulls(len(chunk), type=field.type))
+            continue
+        values = chunk[field.name]
+        if field.name == "timestamp":
+            values = pd.to_datetime(values, utc=True, errors="coerce")
+        elif field.name in FLOAT_COLUMNS:
+            values = pd.to_numeric(values, errors="coerce").astype("float64")
+        else:
+            values = values.astype(object).where(values.notna(), None)
+        if field.name in CATEGORICAL_COLUMNS:
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _write_through(logfile: str, chunks: Iterable[pd.DataFrame], columns: Optional[List[str]]) -> Iterator[pd.DataFrame]:
+    """Yield parsed chunks while writing them to the cache of logfile"""
+    path = cache_path(logfile)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    signature = source_signature(logfile)
+    schema = _cache_schema()
+    present = set()
+    try:
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for chunk in chunks:
+                present.update(column for column in chunk.columns if column in CACHE_COLUMNS)
+                writer.write_table(_to_cache_table(chunk, schema), row_group_size=CACHE_BATCH_ROWS)
+                yield chunk if columns is None else chunk[[c for c in columns if c in chunk.columns]]
+            metadata = {"source": signature, "columns": [c for c in CACHE_COLUMNS if c in present]}
+            writer.add_key_value_metadata({CACHE_METADATA_KEY: json.dumps(metadata)})
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _read_cache(logfile: str, columns: Optional[List[str]], batch_rows: int) -> Iterator[pd.DataFrame]:
+    """Yield memory-mapped batches of the requested columns from a valid cache"""
+    path = cache_path(logfile)
+    metadata = read_cache_metadata(path)
+    present = [c for c in (columns if columns is not None else CACHE_COLUMNS) if c in metadata["columns"]]
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=present):
+        yield batch.to_pandas()
+
+
+def _use_cache(columns: Optional[List[str]]) -> bool:
+    return cache_available() and all(column in CACHE_COLUMNS for column in columns or [])
+
+
+def iter_cached_chunks(paths: Iterable[str], columns: Optional[List[str]] = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES, batch_rows: int = CACHE_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks of log files, reading from or building their columnar cache"""
+    for logfile in paths:
+        if not _use_cache(columns):
+            yield from iter_log_chunks([logfile], columns, chunk_bytes)
+        elif is_cache_valid(logfile):
+            yield from _read_cache(logfile, columns, batch_rows)
+        else:
+            yield from _write_through(logfile, iter_log_chunks([logfile], None, chunk_bytes), columns)
+
+
+def ensure_cache(logfile: str, chunk_bytes: Optional[int] = DEFAULT_CHUNK_BYTES) -> bool:
+    """Build the cache of a log file unless it is valid, and return whether it was built"""
+    if is_cache_valid(logfile):
+        return False
+    for _ in _write_through(logfile, iter_log_chunks([logfile], None, chunk_bytes or DEFAULT_CHUNK_BYTES), []):
+        pass
+    return True
+
+
+def load_cached_frame(paths: Iterable[str], columns: Optional[List[str]] = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> pd.DataFrame:
+    """Load log files into one compact DataFrame from their columnar cache, building it where needed"""
+    paths = list(paths)
+    if not _use_cache(columns):
+        return concat_compact(compact_chunk(chunk) for chunk in iter_log_chunks(paths, columns, chunk_bytes))
+
+    tables = []
+    for logfile in paths:
+        ensure_cache(logfile, chunk_bytes)
+        path = cache_path(logfile)
+        stored = read_cache_metadata(path)["columns"]
+        present = [c for c in (columns if columns is not None else CACHE_COLUMNS) if c in stored]
+        table = pq.read_table(path, columns=present, memory_map=True)
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame()
+    # Columns missing from some files are filled with nulls, as pd.concat would do
+    names = [c for c in CACHE_COLUMNS if any(c in table.column_names for table in tables)]
+    schema = _cache_schema()
+    tables = [pa.Table.from_arrays([table[c] if c in table.column_names else pa.nulls(len(table), type=schema.field(c).type) for c in names], names=names) for table in tables]
+    return compact_chunk(pa.concat_tables(tables).to_pandas(categories=[c for c in COMPACT_CATEGORICAL_COLUMNS if c in names]))
@@ -0,0 +1,145 @@
+import glob
+import gzip
+import io
+import os
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+import metrics
+
+# Read size used when splitting NDJSON logs into DataFrame chunks
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Columns used by the analyze_* methods of CowrieLogAnalyzer
+LOG_COLUMNS = ["eventid", "timestamp", "session", "src_ip", "width", "height", "version", "input", "shasum"]
+
+
+def is_s3_url(path: str) -> bool:
+    return path.startswith("s3://")
+
+
+def open_log_file(path: str) -> BinaryIO:
+    """Open a log file or s3:// object for binary reading, decompressing gzip files transparently"""
+    if is_s3_url(path):
+        from s3_source import open_s3_object
+
+        return open_s3_object(path)
+    f = open(path, "rb")
+    if f.peek(2)[:2] == GZIP_MAGIC:
+        f.close()
+        return gzip.open(path, "rb")
+    return f
+
+
+def starts_json_array(stream: BinaryIO) -> bool:
+    """Check whether an open log stream holds a single JSON array (jq -s '.')
+
+    The first bytes are peeked, not read, so the same stream can then be parsed; only leading
+    whitespace is consumed. This avoids opening a file (or s3:// object) twice.
+    """
+    while True:
+        buffered = stream.peek(1)
+        if not buffered:
+            return False
+        stripped = buffered.lstrip()
+        if stripped:
+            return stripped[:1] == b"["
+        stream.read(len(buffered))
+
+
+def is_json_array(path: str) -> bool:
+    """Check whether a log file was slurped into a single JSON array (jq -s '.')"""
+    with open_log_file(path) as f:
+        return starts_json_array(f)
+
+
+def log_sort_key(path: str) -> tuple:
+    """Order rotated files (cowrie.json.YYYY-MM-DD[.gz]) by date and the live cowrie.json last"""
+    name = os.path.basename(path)
+    if name.endswith(".gz"):
+        name = name[:-3]
+    suffix = name[len("cowrie.json"):].lstrip(".")
+    return (suffix == "", suffix, path)
+
+
+def find_log_files(path: str) -> List[str]:
+    """Resolve a file, directory or glob pattern (local or s3://) to the list of Cowrie log files to read"""
+    if is_s3_url(path):
+        from s3_source import find_s3_log_files
+
+        return find_s3_log_files(path)
+    if os.path.isdir(path):
+        files = glob.glob(os.path.join(path, "cowrie.json*"))
+    elif glob.has_magic(path):
+        files = glob.glob(path)
+    else:
+        return [path]
+    return sorted((f for f in files if os.path.isfile(f)), key=log_sort_key)
+
+
+def iter_line_blocks(stream: BinaryIO, chunk_bytes: int = DEFAULT_CHUNK_BYTES, complete_only: bool = False) -> Iterator[bytes]:
+    """Yield blocks of complete lines of roughly chunk_bytes from a binary stream
+
+    A trailing line without a newline is yielded last unless complete_only is set,
+    which is what readers of files that are still being written want.
+    """
+    remainder = b""
+    while True:
+        data = stream.read(chunk_bytes)
+        if not data:
+            break
+        data = remainder + data
+        end = data.rfind(b"\n")
+        if end == -1:
+            remainder = data
+            continue
+        remainder = data[end + 1:]
+        yield data[: end + 1]
+    if remainder.strip() and not complete_only:
+        yield remainder
+
+
+def parse_line_block(block: bytes, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Parse a block of NDJSON lines into a DataFrame, keeping only the given columns
+
+    dtype=False keeps JSON strings as str: inferring dtypes per chunk would turn a chunk of
+    digit-only commands (input "1", "2") into numbers while other chunks stay strings.
+    """
+    with metrics.PARSE_SECONDS.time():
+        chunk = pd.read_json(io.BytesIO(block), lines=True, dtype=False)
+    metrics.PARSED_ROWS.inc(len(chunk))
+    metrics.PARSED_BYTES.inc(len(block))
+    if columns is not None:
+        chunk = chunk[[c for c in columns if c in chunk.columns]]
+    return chunk
+
+
+def iter_line_chunks(lines: Iterable[bytes], columns: Optional[List[str]] = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[pd.DataFrame]:
+    """Group a stream of NDJSON lines (e.g. from merge_logs.py) into parsed DataFrame chunks"""
+    block: List[bytes] = []
+    size = 0
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield parse_line_block(b"".join(block), columns)
+            block, size = [], 0
+    if block:
+        yield parse_line_block(b"".join(block), columns)
+
+
+def iter_log_chunks(paths: Iterable[str], columns: Optional[List[str]] = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks from native NDJSON logs (plain or gzip) or legacy JSON array files"""
+    for path in paths:
+        with open_log_file(path) as f:
+            if starts_json_array(f):
+                chunk = pd.read_json(f, dtype=False)
+                if columns is not None:
+                    chunk = chunk[[c for c in columns if c in chunk.columns]]
+                yield chunk
+                continue
+            for block in iter_line_blocks(f, chunk_bytes):
+                yield parse_line_block(block, columns)
@@ -0,0 +1,143 @@
+import argparse
+import glob
+import hashlib
+import heapq
+import json
+import os
+import re
+import sys
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple
+
+from aggregator import REPORT_FILES, EventAggregator
+from analysis import save_to_json
+from log_reader import DEFAULT_CHUNK_BYTES, LOG_COLUMNS, iter_line_chunks, log_sort_key, open_log_file, starts_json_array
+
+TIMESTAMP_PATTERN = re.compile(rb'"timestamp"\s*:\s*"([^"]*)"')
+
+
+def _timestamp(line: bytes) -> bytes:
+    """Extract the ISO 8601 timestamp of an event line, which sorts chronologically as bytes"""
+    match = TIMESTAMP_PATTERN.search(line)
+    if match:
+        return match.group(1)
+    try:
+        return str(json.loads(line).get("timestamp", "")).encode()
+    except (ValueError, AttributeError):
+        return b""
+
+
+def iter_timestamped_lines(path: str) -> Iterator[Tuple[bytes, bytes]]:
+    """Yield (timestamp, line) pairs of a log file: native NDJSON (plain or gzip) or a legacy JSON array"""
+    with open_log_file(path) as f:
+        if starts_json_array(f):
+            # Files rewritten by format_logs.sh (jq -s '.'): load the array and emit one line per event
+            for event in json.load(f):
+                yield str(event.get("timestamp", "")).encode(), (json.dumps(event) + "\n").encode()
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            if not line.endswith(b"\n"):
+                line += b"\n"
+            yield _timestamp(line), line
+
+
+def merge_log_files(paths: Iterable[str], dedupe: bool = False) -> Iterator[bytes]:
+    """K-way merge log files by timestamp, holding one line per file in memory
+
+    With dedupe, identical lines are dropped. Duplicates share a timestamp, so only
+    the lines of the current timestamp have to be remembered.
+    """
+    streams = [iter_timestamped_lines(path) for path in paths]
+
+    current = None
+    seen = set()
+    for timestamp, line in heapq.merge(*streams, key=lambda item: item[0]):
+        if dedupe:
+            if timestamp != current:
+                current = timestamp
+                seen.clear()
+            digest = hashlib.blake2b(line, digest_size=16).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+        yield line
+
+
+def write_lines(lines: Iterable[bytes], output: BinaryIO) -> int:
+    """Write lines to a binary stream and return the number of lines written"""
+    count = 0
+    for line in lines:
+        output.write(line)
+        count += 1
+    return count
+
+
+def find_group_files(logs_root: str, pattern: str) -> List[str]:
+    """Find cowrie.json* files below the directories matching pattern, like merge_logs.sh did with find"""
+    files = set()
+    for directory in glob.glob(os.path.join(logs_root, pattern)):
+        files.update(f for f in glob.glob(os.path.join(directory, "**", "cowrie.json*"), recursive=True) if os.path.isfile(f))
+    return sorted(files, key=log_sort_key)
+
+
+def merge_groups(logs_root: str) -> Dict[str, List[str]]:
+    """Output directory -> input files of every merge done by the former merge_logs.sh"""
+    groups = {
+        os.path.join(logs_root, "COWRIE_SHORT_TERM"): find_group_files(logs_root, "CowrieShortTerm-*"),
+        os.path.join(logs_root, "COWRIE_BASE"): find_group_files(logs_root, "COWRIE_BASE*"),
+        os.path.join(logs_root, "COWRIE_RANDOM_SSH"): find_group_files(logs_root, "COWRIE_RANDOM_SSH*"),
+    }
+    for directory in sorted(glob.glob(os.path.join(logs_root, "CowrieShortTerm-*"))):
+        groups[directory] = find_group_files(directory, "")
+    return groups
+
+
+def merge_to_file(paths: List[str], output_file: str, dedupe: bool = False):
+    """Merge log files into a single NDJSON file, replacing it atomically"""
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "wb") as f:
+        count = write_lines(merge_log_files(paths, dedupe), f)
+    os.replace(tmp_file, output_file)
+    print(f"Merged {len(paths)} files ({count} events) into {output_file}")
+
+
+def analyze_merged(paths: List[str], output_dir: str, dedupe: bool = False, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    """Feed the merged event stream directly into the analyzer and write its reports"""
+    aggregator = EventAggregator()
+    aggregator.update_all(iter_line_chunks(merge_log_files(paths, dedupe), LOG_COLUMNS, chunk_bytes))
+    os.makedirs(output_dir, exist_ok=True)
+    for name, data in aggregator.reports().items():
+        if data:
+            save_to_json(data, os.path.join(output_dir, REPORT_FILES[name]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge rotated cowrie.json* files (plain or gzip) in timestamp order with constant memory.")
+    parser.add_argument("files", nargs="*", help="Log files to merge")
+    parser.add_argument("--output", type=str, default="-", help="Output NDJSON file, '-' for stdout (default)")
+    parser.add_argument("--all", action="store_true", help="Build merged.json for COWRIE_SHORT_TERM, COWRIE_BASE, COWRIE_RANDOM_SSH and every CowrieShortTerm-* directory")
+    parser.add_argument("--short-term", action="store_true", help="Build only the COWRIE_SHORT_TERM union of all CowrieShortTerm-* directories")
+    parser.add_argument("--logs-root", type=str, default="../logs", help="Logs root used by --all and --short-term (default: ../logs)")
+    parser.add_argument("--dedupe", action="store_true", help="Drop duplicate events")
+    parser.add_argument("--analyze", action="store_true", help="Write the analysis reports instead of merged.json (for FILES, into the --output directory)")
+    args = parser.parse_args()
+
+    if args.all or args.short_term:
+        groups = merge_groups(args.logs_root)
+        if args.short_term:
+            groups = {d: f for d, f in groups.items() if os.path.basename(d) == "COWRIE_SHORT_TERM"}
+        for directory, files in groups.items():
+            if not files:
+                continue
+            if args.analyze:
+                analyze_merged(files, directory, args.dedupe)
+            else:
+                merge_to_file(files, os.path.join(directory, "merged.json"), args.dedupe)
+    elif args.analyze:
+        analyze_merged(sorted(args.files, key=log_sort_key), "." if args.output == "-" else args.output, args.dedupe)
+    elif args.output == "-":
+        write_lines(merge_log_files(sorted(args.files, key=log_sort_key), args.dedupe), sys.stdout.buffer)
+    else:
+        merge_to_file(sorted(args.files, key=log_sort_key), args.output, args.dedupe)
@@ -0,0 +1,127 @@
+import argparse
+import glob
+import json
+import os
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+STATE_FILE = ".vt_merge_state.json"
+STATE_VERSION = 1
+
+
+def _alt(value: Any, default: Any) -> Any:
+    """jq's `value // default`: the default replaces null and false"""
+    return default if value is None or value is False else value
+
+
+def _values(items: Any) -> List[Any]:
+    """jq's `[items[]?.value // empty]`"""
+    if isinstance(items, dict):
+        items = list(items.values())
+    if not isinstance(items, list):
+        return []
+    return [item["value"] for item in items if isinstance(item, dict) and _alt(item.get("value"), None) is not None]
+
+
+def extract_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the fields of one VirusTotal report that vt.json keeps"""
+    data = report.get("data") or {}
+    attributes = data.get("attributes") or {}
+    classification = attributes.get("popular_threat_classification") or {}
+    return {
+        "category": _values(classification.get("popular_threat_category")),
+        "name": _values(classification.get("popular_threat_name")),
+        "label": _alt(classification.get("suggested_threat_label"), "N/A"),
+        "tags": _alt(attributes.get("tags"), []),
+        "magic": _alt(attributes.get("magic"), ""),
+        "id": _alt(data.get("id"), ""),
+        "last_analysis_status": _alt(attributes.get("last_analysis_status"), {}),
+    }
+
+
+def _signature(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_state(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state.get("files", {}) if state.get("version") == STATE_VERSION else {}
+
+
+def save_json(data: Any, path: str, indent: Optional[int] = 2) -> None:
+    """Write JSON the way jq prints it, atomically"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def update_entries(report_dir: str, files: Dict[str, Any]) -> int:
+    """Re-read only new or modified reports, drop deleted ones and return how many were read"""
+    names = sorted(os.path.basename(path) for path in glob.glob(os.path.join(report_dir, "*.json")))
+    for name in set(files) - set(names):
+        del files[name]
+    read = 0
+    for name in names:
+        path = os.path.join(report_dir, name)
+        signature = _signature(path)
+        if name in files and files[name]["signature"] == signature:
+            continue
+        with open(path, "r") as f:
+            entry = extract_report(json.load(f))
+        files[name] = {"signature": signature, "entry": entry}
+        read += 1
+    return read
+
+
+def summarize(entries: Iterable[Dict[str, Any]]):
+    """Count labels and categories, sorted by value like jq's group_by"""
+    labels: Counter = Counter()
+    categories: Counter = Counter()
+    for entry in entries:
+        labels[entry["label"]] += 1
+        categories.update(entry["category"])
+    label_counts = [{"label": label, "count": count} for label, count in sorted(labels.items())]
+    category_counts = [{"category": category, "count": count} for category, count in sorted(categories.items())]
+    return label_counts, category_counts
+
+
+def merge_reports(report_dir: str, incremental: bool = True) -> int:
+    """Write vt.json, vt_label.json and vt_category.json next to a reports directory"""
+    output_dir = os.path.dirname(os.path.abspath(report_dir))
+    state_path = os.path.join(output_dir, STATE_FILE)
+    files = load_state(state_path) if incremental else {}
+    read = update_entries(report_dir, files)
+
+    entries = [files[name]["entry"] for name in sorted(files)]
+    label_counts, category_counts = summarize(entries)
+    save_json(entries, os.path.join(output_dir, "vt.json"))
+    save_json(label_counts, os.path.join(output_dir, "vt_label.json"))
+    save_json(category_counts, os.path.join(output_dir, "vt_category.json"))
+    save_json({"version": STATE_VERSION, "files": files}, state_path, indent=None)
+    return read
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the classification of VirusTotal reports into vt.json, vt_label.json and vt_category.json.")
+    parser.add_argument("report_dirs", nargs="*", help="reports directories (default: every COWRIE*/reports under --logs-root)")
+    parser.add_argument("--logs-root", default="../logs", help="Directory containing the COWRIE* sensor directories (default: ../logs)")
+    parser.add_argument("--full", action="store_true", help="Re-read every report instead of only new or modified ones")
+    args = parser.parse_args()
+
+    report_dirs = args.report_dirs or sorted(glob.glob(os.path.join(args.logs_root, "COWRIE*", "reports")))
+    for report_dir in report_dirs:
+        read = merge_reports(report_dir, incremental=not args.full)
+        print(f"{report_dir}: read {read} reports")
+
+
+if __name__ == "__main__":
+    main()
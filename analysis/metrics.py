@@ -0,0 +1,130 @@
+import argparse
+import atexit
+import contextlib
+import os
+from typing import Dict, Optional
+
+import pandas as pd
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server, write_to_textfile
+except ImportError:  # Metrics are optional; every metric below becomes a no-op
+    CollectorRegistry = None
+
+METRICS_PORT = os.getenv("COWRIE_METRICS_PORT")
+METRICS_TEXTFILE = os.getenv("COWRIE_METRICS_TEXTFILE")
+# Windows of the unique source IP gauge, relative to the newest event seen
+IP_WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
+
+
+class _NoopMetric:
+    """Stand-in for a metric when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+    def time(self):
+        return contextlib.nullcontext()
+
+
+if CollectorRegistry is not None:
+    REGISTRY = CollectorRegistry()
+    # Honeypot activity
+    EVENTS = Counter("cowrie_events_total", "Cowrie events analyzed", ["sensor", "eventid"], registry=REGISTRY)
+    CONNECTS = Counter("cowrie_connects_total", "SSH/Telnet connections (cowrie.session.connect)", ["sensor"], registry=REGISTRY)
+    UNIQUE_IPS = Gauge("cowrie_unique_src_ips", "Distinct source IPs within a window before the newest event", ["sensor", "window"], registry=REGISTRY)
+    # Pipeline
+    PARSED_ROWS = Counter("cowrie_parsed_rows_total", "Log lines parsed from NDJSON", registry=REGISTRY)
+    PARSED_BYTES = Counter("cowrie_parsed_bytes_total", "Bytes of NDJSON parsed", registry=REGISTRY)
+    PARSE_SECONDS = Histogram("cowrie_parse_seconds", "Time to parse one block of NDJSON lines", registry=REGISTRY, buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+    ANALYZE_SECONDS = Histogram("cowrie_analyze_duration_seconds", "Duration of an analyze_* step", ["report"], registry=REGISTRY, buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300))
+    SIGMA_MATCH_SECONDS = Histogram("cowrie_sigma_match_seconds", "Time to match one command against the Sigma rules", registry=REGISTRY, buckets=(1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 1))
+    VT_QUEUE_DEPTH = Gauge("cowrie_vt_queue_depth", "Hashes waiting for a VirusTotal lookup", registry=REGISTRY)
+else:
+    REGISTRY = None
+    EVENTS = CONNECTS = UNIQUE_IPS = PARSED_ROWS = PARSED_BYTES = PARSE_SECONDS = ANALYZE_SECONDS = SIGMA_MATCH_SECONDS = VT_QUEUE_DEPTH = _NoopMetric()
+
+# Set by start_metrics(); the per-chunk honeypot counters are skipped while False
+enabled = False
+_textfile: Optional[str] = None
+# Sensor -> source IP -> epoch seconds of its newest event
+_last_seen: Dict[str, Dict[str, float]] = {}
+
+
+def sensor_name(logfile: str) -> str:
+    """Sensor label of a log path: the directory name of a file, or the directory itself"""
+    path = os.path.normpath(logfile)
+    if not os.path.isdir(path):
+        path = os.path.dirname(path)
+    return os.path.basename(os.path.abspath(path))
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--metrics-port", type=int, default=int(METRICS_PORT) if METRICS_PORT else None, help="Serve Prometheus metrics on this port (default: $COWRIE_METRICS_PORT)")
+    parser.add_argument("--metrics-textfile", default=METRICS_TEXTFILE, help="Write Prometheus metrics to this .prom file for the node_exporter textfile collector (default: $COWRIE_METRICS_TEXTFILE)")
+
+
+def start_metrics(port: Optional[int] = None, textfile: Optional[str] = None) -> bool:
+    """Expose the metrics over HTTP and/or a textfile written at exit (and by write_textfile)
+
+    Without arguments the COWRIE_METRICS_PORT and COWRIE_METRICS_TEXTFILE environment variables are used.
+    """
+    global enabled, _textfile
+    port = port if port is not None else (int(METRICS_PORT) if METRICS_PORT else None)
+    textfile = textfile or METRICS_TEXTFILE
+    if port is None and not textfile:
+        return False
+    if REGISTRY is None:
+        print("prometheus_client is not installed; metrics are disabled.")
+        return False
+    if port is not None:
+        start_http_server(port, registry=REGISTRY)
+    if textfile:
+        _textfile = textfile
+        atexit.register(write_textfile)
+    enabled = True
+    return True
+
+
+def write_textfile():
+    """Write the current metrics to the textfile given to start_metrics, if any"""
+    if _textfile:
+        write_to_textfile(_textfile, REGISTRY)
+
+
+def observe_events(chunk: pd.DataFrame, sensor: str):
+    """Count the events of a parsed chunk and update the unique source IP windows"""
+    if not enabled or chunk.empty or "eventid" not in chunk.columns:
+        return
+    eventids = chunk["eventid"].astype(object)
+    for eventid, count in eventids.value_counts().items():
+        EVENTS.labels(sensor, eventid).inc(count)
+        if eventid == "cowrie.session.connect":
+            CONNECTS.labels(sensor).inc(count)
+
+    if "src_ip" not in chunk.columns or "timestamp" not in chunk.columns:
+        return
+    timestamps = pd.to_datetime(chunk["timestamp"], utc=True, errors="coerce")
+    events = pd.DataFrame({"src_ip": chunk["src_ip"].astype(object), "seen": timestamps}).dropna()
+    if events.empty:
+        return
+    seen = (events.groupby("src_ip")["seen"].max() - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+    last_seen = _last_seen.setdefault(sensor, {})
+    for ip, epoch in seen.items():
+        if epoch > last_seen.get(ip, 0):
+            last_seen[ip] = epoch
+    newest = max(last_seen.values())
+    for window, seconds in IP_WINDOWS.items():
+        UNIQUE_IPS.labels(sensor, window).set(sum(1 for epoch in last_seen.values() if epoch >= newest - seconds))
+    # IPs outside the widest window can no longer be counted
+    horizon = newest - max(IP_WINDOWS.values())
+    _last_seen[sensor] = {ip: epoch for ip, epoch in last_seen.items() if epoch >= horizon}
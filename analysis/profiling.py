@@ -0,0 +1,191 @@
+import argparse
+import atexit
+import cProfile
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from event_table import peak_rss_bytes
+
+PROFILE_REPORT_FILE = "profile_report.json"
+# Number of slowest Sigma rules printed in the summary (all of them are in the report)
+SUMMARY_RULES = 10
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in ("1", "true", "yes", "on")
+
+
+# Checked by every hook first; nothing else happens while it is False
+enabled = _env_flag("COWRIE_PROFILE")
+profile_dir: Optional[str] = os.getenv("COWRIE_PROFILE_DIR")
+profiler: str = os.getenv("COWRIE_PROFILER", "cprofile")
+report_file: str = os.getenv("COWRIE_PROFILE_REPORT", PROFILE_REPORT_FILE)
+
+records: List[dict] = []
+# Sigma rule title -> [seconds, evaluations]
+rule_times: Dict[str, List[float]] = {}
+_active_profiler = None
+_dumps = 0
+_report_registered = False
+
+
+class StageRecord:
+    """Measurements of one run of a stage; set rows inside the with block"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+
+    def __enter__(self) -> "StageRecord":
+        global _active_profiler
+        self.profiler = None
+        if profile_dir and _active_profiler is None:
+            # Only the outermost stage is profiled; profilers do not nest
+            self.profiler = _start_profiler()
+            _active_profiler = self.profiler
+        self.rss_before = peak_rss_bytes()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_profiler
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        if self.profiler is not None:
+            _stop_profiler(self.profiler, self.name)
+            _active_profiler = None
+        peak = peak_rss_bytes()
+        records.append({
+            "stage": self.name,
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "rows": self.rows,
+            "peak_rss_bytes": peak,
+            # ru_maxrss only grows, so this is how far the stage raised the process peak
+            "peak_rss_growth_bytes": peak - self.rss_before if peak is not None and self.rss_before is not None else None,
+        })
+        return False
+
+
+class _NullStage:
+    """Returned by stage() while profiling is off; accepts rows and does nothing"""
+
+    rows = 0
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str):
+    """Context manager measuring wall time, CPU time, rows and peak RSS of a stage when profiling is enabled"""
+    return StageRecord(name) if enabled else _NULL_STAGE
+
+
+def _start_profiler():
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument is not installed; using cProfile.")
+        else:
+            instance = Profiler()
+            instance.start()
+            return instance
+    instance = cProfile.Profile()
+    instance.enable()
+    return instance
+
+
+def _stop_profiler(instance, name: str):
+    """Write the profile of a stage to <profile_dir>/<n>-<stage>.prof (cProfile) or .html (pyinstrument)"""
+    global _dumps
+    _dumps += 1
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{_dumps:03d}-{name}")
+    if isinstance(instance, cProfile.Profile):
+        instance.disable()
+        instance.dump_stats(f"{path}.prof")
+    else:
+        instance.stop()
+        with open(f"{path}.html", "w") as f:
+            f.write(instance.output_html())
+
+
+def add_rule_times(matcher):
+    """Collect the per-rule evaluation times recorded by a Sigma matcher (see enable_rule_timing)"""
+    if not enabled or getattr(matcher, "rule_seconds", None) is None:
+        return
+    for index, (seconds, calls) in matcher.rule_seconds.items():
+        totals = rule_times.setdefault(matcher.rule_title(index), [0.0, 0])
+        totals[0] += seconds
+        totals[1] += calls
+    matcher.rule_seconds.clear()
+
+
+def report() -> dict:
+    """Every stage run plus per-stage totals and the Sigma rules ordered by evaluation time"""
+    totals: Dict[str, dict] = {}
+    for record in records:
+        total = totals.setdefault(record["stage"], {"runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "rows": 0, "peak_rss_bytes": 0})
+        total["runs"] += 1
+        total["wall_seconds"] += record["wall_seconds"]
+        total["cpu_seconds"] += record["cpu_seconds"]
+        total["rows"] += record["rows"]
+        total["peak_rss_bytes"] = max(total["peak_rss_bytes"], record["peak_rss_bytes"] or 0)
+    rules = [{"title": title, "seconds": round(seconds, 6), "evaluations": int(calls)} for title, (seconds, calls) in sorted(rule_times.items(), key=lambda item: -item[1][0])]
+    return {"stages": totals, "runs": records, "sigma_rules": rules}
+
+
+def write_report():
+    """Save the report and print a summary, at exit when profiling is on"""
+    if not records and not rule_times:
+        return
+    data = report()
+    with open(report_file, "w") as f:
+        json.dump(data, f, indent=4)
+    for name, total in data["stages"].items():
+        rows_per_second = total["rows"] / total["wall_seconds"] if total["wall_seconds"] else 0
+        print(f"[profile] {name}: {total['wall_seconds']:.3f}s wall, {total['cpu_seconds']:.3f}s CPU, {total['rows']} rows ({rows_per_second:,.0f}/s), peak RSS {total['peak_rss_bytes'] / (1024 * 1024):.1f} MiB")
+    for rule in data["sigma_rules"][:SUMMARY_RULES]:
+        print(f"[profile] rule '{rule['title']}': {rule['seconds']:.4f}s over {rule['evaluations']} evaluations")
+    print(f"Profile saved to '{report_file}'.")
+
+
+def add_profiling_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--profile", action="store_true", default=enabled, help="Record wall/CPU time, rows and peak RSS per stage into profile_report.json (or set COWRIE_PROFILE=1)")
+    parser.add_argument("--profile-dir", default=profile_dir, help="Also dump a profile of every stage into this directory (default: $COWRIE_PROFILE_DIR)")
+    parser.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default=profiler, help="Profiler used for --profile-dir (default: cprofile, or $COWRIE_PROFILER)")
+
+
+def start_profiling(enable: bool = True, directory: Optional[str] = None, name: str = "cprofile"):
+    """Turn profiling on (with --profile-dir, per-stage profiles) and write the report at exit"""
+    global enabled, profile_dir, profiler
+    if not enable and not directory:
+        return
+    enabled = True
+    profile_dir = directory
+    profiler = name
+    _register_report()
+
+
+def _register_report():
+    global _report_registered
+    if not _report_registered:
+        _report_registered = True
+        atexit.register(write_report)
+
+
+if enabled:
+    _register_report()
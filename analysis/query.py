@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import shutil
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from log_cache import cache_available, cache_path, ensure_cache, pa, pq, source_signature
+from log_reader import DEFAULT_CHUNK_BYTES, find_log_files
+from merge_logs import merge_groups
+from run_analysis import find_sensor_dirs
+
+try:
+    import duckdb
+except ImportError:  # Only needed to run queries; syncing the dataset needs pyarrow alone
+    duckdb = None
+
+DATASET_DIR = ".cowrie_dataset"
+MANIFEST_FILE = "_manifest.json"
+
+# Named queries over the `events` view; the report queries mirror the analyze_* methods,
+# which do not count events missing the grouped field (value_counts() drops NaN)
+QUERIES = {
+    "event_stats": "SELECT eventid, count(*) AS count FROM events WHERE eventid IS NOT NULL GROUP BY eventid ORDER BY count DESC, eventid",
+    "terminal_info": "SELECT session, width, height, src_ip FROM events WHERE eventid = 'cowrie.client.size' ORDER BY timestamp",
+    "ip_stats": "SELECT src_ip, count(*) AS count FROM events WHERE eventid = 'cowrie.session.connect' AND src_ip IS NOT NULL GROUP BY src_ip ORDER BY count DESC, src_ip",
+    "command_failed": "SELECT input, count(*) AS count FROM events WHERE eventid = 'cowrie.command.failed' AND input IS NOT NULL GROUP BY input ORDER BY count DESC, input",
+    "daily_connect": "SELECT strftime(timestamp, '%Y-%m-%d') AS date, count(*) AS count FROM events WHERE eventid = 'cowrie.session.connect' AND timestamp IS NOT NULL GROUP BY 1 ORDER BY 1",
+    "download_hash": "SELECT shasum, count(*) AS count FROM events WHERE eventid IN ('cowrie.session.file_download', 'cowrie.session.file_upload') AND shasum IS NOT NULL GROUP BY shasum ORDER BY count DESC, shasum",
+    "command_uniq": "SELECT input, list(session ORDER BY timestamp) AS session FROM events WHERE eventid = 'cowrie.command.input' AND input IS NOT NULL GROUP BY input ORDER BY input",
+    "client_version": "SELECT version, count(*) AS count FROM events WHERE eventid = 'cowrie.client.version' AND version IS NOT NULL GROUP BY version ORDER BY count DESC, version",
+    "sensor_daily_connect": "SELECT sensor_dir, date, count(*) AS count FROM events WHERE eventid = 'cowrie.session.connect' GROUP BY ALL ORDER BY ALL",
+}
+
+# Report name -> key of the JSON written by analysis.py, for the counting reports
+REPORT_KEYS = {
+    "event_stats": "events",
+    "ip_stats": "ips",
+    "command_failed": "command_failed",
+    "daily_connect": "ssh_attempts_by_date",
+    "download_hash": "download_files",
+    "client_version": "client_versions",
+}
+
+
+def dataset_path(logs_root: str) -> str:
+    return os.path.join(logs_root, DATASET_DIR)
+
+
+def union_dirs(logs_root: str) -> set:
+    """Directories whose merged.json merge_logs.py builds from the logs of other directories"""
+    unions = set()
+    for directory, files in merge_groups(logs_root).items():
+        directory = os.path.abspath(directory)
+        if any(os.path.dirname(os.path.abspath(f)) != directory for f in files):
+            unions.add(directory)
+    return unions
+
+
+def source_files(sensor_dir: str, unions: Optional[set] = None) -> List[str]:
+    """Raw cowrie.json* logs of a sensor directory, or its merged.json when there are none
+
+    The merged.json of a union directory (e.g. COWRIE_SHORT_TERM) is never used: its events
+    are already synced from the directories it was merged from.
+    """
+    files = [f for f in find_log_files(sensor_dir) if os.path.basename(f).startswith("cowrie.json")]
+    merged = os.path.join(sensor_dir, "merged.json")
+    if files or os.path.abspath(sensor_dir) in (unions or set()):
+        return files
+    return [merged] if os.path.isfile(merged) else []
+
+
+def _load_manifest(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _remove_parts(dataset_dir: str, parts: List[str]):
+    for part in parts:
+        path = os.path.join(dataset_dir, part)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _write_partitions(table: "pa.Table", dataset_dir: str, sensor: str, name: str) -> Tuple[List[str], int]:
+    """Split a log file's events by UTC date into sensor_dir=/date= partitions"""
+    import pyarrow.compute as pc
+
+    dates = pc.strftime(table["timestamp"], format="%Y-%m-%d")
+    parts = []
+    for day in pc.unique(dates).to_pylist():
+        if day is None:
+            continue
+        part = os.path.join(f"sensor_dir={sensor}", f"date={day}", f"{name}.parquet")
+        os.makedirs(os.path.join(dataset_dir, os.path.dirname(part)), exist_ok=True)
+        pq.write_table(table.filter(pc.equal(dates, day)), os.path.join(dataset_dir, part))
+        parts.append(part)
+    return parts, int(dates.null_count)
+
+
+def sync_dataset(logs_root: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Tuple[int, int]:
+    """Bring the partitioned dataset up to date with the logs of every sensor directory
+
+    Each log file is converted through its columnar cache once; files whose size and
+    mtime are unchanged since the last sync are skipped. Returns (synced, skipped).
+    """
+    if not cache_available():
+        raise ImportError("pyarrow is required to build the query dataset")
+    dataset_dir = dataset_path(logs_root)
+    manifest_path = os.path.join(dataset_dir, MANIFEST_FILE)
+    manifest = _load_manifest(manifest_path)
+    synced, skipped = 0, 0
+    seen = set()
+    unions = union_dirs(logs_root)
+    for sensor_dir in find_sensor_dirs(logs_root):
+        sensor = os.path.basename(os.path.normpath(sensor_dir))
+        for logfile in source_files(sensor_dir, unions):
+            key = f"{sensor}/{os.path.basename(logfile)}"
+            seen.add(key)
+            signature = source_signature(logfile)
+            entry = manifest.get(key)
+            if entry and entry["source"] == signature and all(os.path.exists(os.path.join(dataset_dir, part)) for part in entry["parts"]):
+                skipped += 1
+                continue
+            ensure_cache(logfile, chunk_bytes)
+            _remove_parts(dataset_dir, entry["parts"] if entry else [])
+            parts, undated = _write_partitions(pq.read_table(cache_path(logfile)), dataset_dir, sensor, os.path.basename(logfile))
+            if undated:
+                print(f"Skipped {undated} events without a timestamp in '{logfile}'.")
+            manifest[key] = {"source": signature, "parts": parts}
+            synced += 1
+            print(f"Synced '{logfile}' into {len(parts)} partitions.")
+    for key in set(manifest) - seen:
+        _remove_parts(dataset_dir, manifest.pop(key)["parts"])
+
+    os.makedirs(dataset_dir, exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return synced, skipped
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def connect(logs_root: str, sensors: Optional[List[str]] = None, since: Optional[date] = None, until: Optional[date] = None):
+    """DuckDB connection with an `events` view over the dataset, restricted to the given partitions
+
+    Filters on sensor_dir and date only touch the matching partition directories.
+    """
+    if duckdb is None:
+        raise ImportError("duckdb is required to query the dataset")
+    pattern = os.path.join(dataset_path(logs_root), "*", "*", "*.parquet")
+    conditions = []
+    if sensors:
+        conditions.append(f"sensor_dir IN ({', '.join(_quote(sensor) for sensor in sensors)})")
+    if since:
+        conditions.append(f"date >= DATE '{since.isoformat()}'")
+    if until:
+        conditions.append(f"date <= DATE '{until.isoformat()}'")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    con = duckdb.connect()
+    con.execute("SET TimeZone = 'UTC'")
+    con.execute(f"CREATE VIEW events AS SELECT * FROM read_parquet({_quote(pattern)}, hive_partitioning = true, union_by_name = true){where}")
+    return con
+
+
+def run_report(con, name: str) -> Optional[dict]:
+    """Run a report query and shape its result like the JSON written by analysis.py"""
+    try:
+        rows = con.execute(QUERIES[name]).fetchall()
+    except duckdb.Error as e:
+        print(f"Error occurred while running query '{name}': {e}")
+        return None
+    if name == "command_uniq":
+        return {"commands": [{"input": command, "session": sessions} for command, sessions in rows]}
+    if name in REPORT_KEYS:
+        return {REPORT_KEYS[name]: {key: count for key, count in rows}}
+    columns = [column[0] for column in con.description]
+    return {name: [dict(zip(columns, row)) for row in rows]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the events of every sensor directory with SQL.")
+    parser.add_argument("--logs-root", default="../logs", help="Directory containing the sensor directories (default: ../logs)")
+    parser.add_argument("--sensor", action="append", dest="sensors", help="Only query this sensor directory (repeatable)")
+    parser.add_argument("--since", type=date.fromisoformat, help="Only query events on or after YYYY-MM-DD (UTC)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Only query events on or before YYYY-MM-DD (UTC)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_BYTES, help="Number of bytes read per chunk from NDJSON logs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("sync", help=f"Build or update the partitioned dataset under <logs-root>/{DATASET_DIR}")
+    subparsers.add_parser("rebuild", help="Delete and rebuild the dataset")
+    report_parser = subparsers.add_parser("report", help="Run a named query")
+    report_parser.add_argument("name", choices=list(QUERIES))
+    report_parser.add_argument("--output", help="Write the result as JSON to this file instead of printing it")
+    sql_parser = subparsers.add_parser("sql", help="Run an ad-hoc query against the `events` view")
+    sql_parser.add_argument("query")
+    args = parser.parse_args()
+
+    if args.command in ("sync", "rebuild"):
+        if args.command == "rebuild":
+            shutil.rmtree(dataset_path(args.logs_root), ignore_errors=True)
+        synced, skipped = sync_dataset(args.logs_root, args.chunk_size)
+        print(f"{synced} log files synced, {skipped} unchanged.")
+        return
+
+    con = connect(args.logs_root, args.sensors, args.since, args.until)
+    if args.command == "report":
+        result = run_report(con, args.name)
+        if result is None:
+            return
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=4, default=str)
+            print(f"Data saved to '{args.output}'.")
+        else:
+            print(json.dumps(result, indent=4, default=str))
+    else:
+        print(con.execute(args.query).df().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
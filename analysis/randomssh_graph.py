@@ -1,10 +1,10 @@
 import matplotlib.pyplot as plt
 import os
-import json
+
+from report_io import load_report
 
 def get_dates_counts_from_path(path):
-    with open(path) as f:
-        data = json.load(f)
+    data = load_report(path)
 
     dates = list(data['ssh_attempts_by_date'].keys())
     counts = list(data['ssh_attempts_by_date'].values())
@@ -0,0 +1,199 @@
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+from typing import Any, BinaryIO, Optional
+
+try:
+    import orjson
+except ImportError:  # Compact JSON falls back to the standard library
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # Only needed for the zstd format
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:  # Only needed for the msgpack format
+    msgpack = None
+
+# Format -> suffix replacing .json in the report file name
+REPORT_FORMATS = {
+    "json": ".json",  # indent=4, as the reports have always been written
+    "compact": ".json",
+    "gzip": ".json.gz",
+    "zstd": ".json.zst",
+    "msgpack": ".msgpack",
+}
+DEFAULT_REPORT_FORMAT = os.getenv("COWRIE_REPORT_FORMAT", "json")
+# Longest suffixes first, so that .json.gz is not taken for .gz
+_SUFFIXES = sorted(set(REPORT_FORMATS.values()), key=len, reverse=True)
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _stem(path: str) -> str:
+    for suffix in _SUFFIXES:
+        if path.endswith(suffix):
+            return path[: -len(suffix)]
+    return path
+
+
+def report_path(path: str, fmt: Optional[str] = None) -> str:
+    """File name of a report (given as name.json or any variant) in a format"""
+    return _stem(path) + REPORT_FORMATS[fmt or DEFAULT_REPORT_FORMAT]
+
+
+def find_report(path: str) -> Optional[str]:
+    """The most recently written variant of a report (name.json, .json.gz, .json.zst or .msgpack), if any"""
+    stem = _stem(path)
+    variants = [stem + suffix for suffix in _SUFFIXES if os.path.isfile(stem + suffix)]
+    if not variants:
+        return None
+    return max(variants, key=os.path.getmtime)
+
+
+def _dump_json(data: Any, f: BinaryIO, **kwargs):
+    """Stream data as JSON text into a binary file object without building the whole string"""
+    text = io.TextIOWrapper(f, encoding="utf-8", write_through=True)
+    try:
+        json.dump(data, text, **kwargs)
+        text.flush()
+    finally:
+        # Leave f open for the caller (closing the wrapper would close it)
+        text.detach()
+
+
+def write_report(data: Any, f: BinaryIO, fmt: Optional[str] = None):
+    """Serialize a report in a format into a binary file object
+
+    json, gzip and zstd are streamed, so a report of hundreds of MB is never held in memory as
+    one string; compact uses orjson, which only serializes to a single bytes object.
+    """
+    fmt = fmt or DEFAULT_REPORT_FORMAT
+    if fmt == "json":
+        _dump_json(data, f, indent=4)
+    elif fmt == "compact":
+        if orjson is not None:
+            f.write(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+        else:
+            _dump_json(data, f, separators=(",", ":"), ensure_ascii=False)
+    elif fmt == "gzip":
+        # Level 6 is several times faster than 9 for nearly the same size
+        with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=6, mtime=0) as compressed:
+            _dump_json(data, compressed, separators=(",", ":"), ensure_ascii=False)
+    elif fmt == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required for the zstd report format")
+        with zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=False) as compressed:
+            _dump_json(data, compressed, separators=(",", ":"), ensure_ascii=False)
+    elif fmt == "msgpack":
+        if msgpack is None:
+            raise ImportError("msgpack is required for the msgpack report format")
+        msgpack.pack(data, f, use_bin_type=True)
+    else:
+        raise ValueError(f"Unknown report format '{fmt}'")
+
+
+def dumps_report(data: Any, fmt: Optional[str] = None) -> bytes:
+    """Serialize a report in a format"""
+    buffer = io.BytesIO()
+    write_report(data, buffer, fmt)
+    return buffer.getvalue()
+
+
+def read_report(f: BinaryIO) -> Any:
+    """Deserialize a report of any format from a binary file object, detected from its first bytes
+
+    gzip and zstd are decompressed as streams and msgpack is unpacked from the stream, so the
+    compressed and decompressed copies of a report are never both held in memory.
+    """
+    if not hasattr(f, "peek"):
+        f = io.BufferedReader(f)
+    head = f.peek(64)[:64]
+    if head[:2] == GZIP_MAGIC:
+        with gzip.GzipFile(fileobj=f, mode="rb") as decompressed:
+            return read_report(decompressed)
+    if head[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ImportError("zstandard is required to read zstd reports")
+        with zstandard.ZstdDecompressor().stream_reader(f, closefd=False) as decompressed:
+            return read_report(decompressed)
+    # msgpack maps and arrays never start with whitespace, { or [
+    first = head.lstrip()[:1]
+    if first in (b"{", b"[") or not first:
+        raw = f.read()
+        if orjson is not None:
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass  # e.g. NaN written by json.dump, which orjson does not accept
+        return json.loads(raw)
+    if msgpack is None:
+        raise ImportError("msgpack is required to read msgpack reports")
+    return msgpack.unpack(f, raw=False, strict_map_key=False)
+
+
+def loads_report(raw: bytes) -> Any:
+    """Deserialize a report of any format, detected from its first bytes"""
+    return read_report(io.BytesIO(raw))
+
+
+def dump_report(data: Any, path: str, fmt: Optional[str] = None) -> str:
+    """Write a report atomically in a format and return the path written (the suffix follows the format)"""
+    target = report_path(path, fmt)
+    tmp_path = f"{target}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            write_report(data, f, fmt)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return target
+
+
+def load_report(path: str) -> Any:
+    """Read a report written in any format; path may name any of its variants"""
+    found = find_report(path)
+    if found is None:
+        raise FileNotFoundError(path)
+    with open(found, "rb") as f:
+        return read_report(f)
+
+
+def add_format_argument(parser: argparse.ArgumentParser):
+    parser.add_argument("--format", choices=list(REPORT_FORMATS), default=DEFAULT_REPORT_FORMAT, help="Report format: json (indent=4), compact, gzip, zstd or msgpack (default: json, or $COWRIE_REPORT_FORMAT)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print or convert reports written in any format.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    cat_parser = subparsers.add_parser("cat", help="Print a report as JSON (e.g. for jq)")
+    cat_parser.add_argument("report")
+    convert_parser = subparsers.add_parser("convert", help="Rewrite reports in another format")
+    convert_parser.add_argument("reports", nargs="+")
+    add_format_argument(convert_parser)
+    args = parser.parse_args()
+
+    if args.command == "cat":
+        sys.stdout.write(json.dumps(load_report(args.report), ensure_ascii=False) + "\n")
+        return
+    for path in args.reports:
+        source = find_report(path)
+        if source is None:
+            print(f"{path} not found.")
+            continue
+        target = dump_report(load_report(source), source, args.format)
+        if target != source:
+            os.remove(source)
+        print(f"Converted '{source}' to '{target}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import os
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from analysis import CowrieLogAnalyzer
+from log_reader import DEFAULT_CHUNK_BYTES
+from run_analysis import find_sensor_dirs
+
+ROLLUP_DIR = "rollups"
+# Resolution -> bucket width in seconds; minute buckets are built from the logs, the rest from them
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+ROLLUP_COLUMNS = ["eventid", "timestamp", "src_ip"]
+
+# Metric -> events it counts
+METRICS = {
+    "connect": ["cowrie.session.connect"],
+    "login": ["cowrie.login.success", "cowrie.login.failed"],
+    "command": ["cowrie.command.input"],
+    "download": ["cowrie.session.file_download", "cowrie.session.file_upload"],
+}
+_METRIC_OF_EVENT = {eventid: metric for metric, eventids in METRICS.items() for eventid in eventids}
+# Merge partial rollups once this many rows are buffered
+COMPACT_ROWS = 2_000_000
+
+
+def epoch_seconds(timestamps: pd.Series) -> np.ndarray:
+    """UTC epoch seconds of parsed or ISO 8601 string timestamps (NaT is not allowed)"""
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps, utc=True)
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+    return timestamps.to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+def rollup_chunk(chunk: pd.DataFrame, seconds: int = RESOLUTIONS["minute"]) -> pd.DataFrame:
+    """Count the events of each metric per (bucket, src_ip), bucketing by integer division of epoch seconds"""
+    if chunk.empty or not all(column in chunk.columns for column in ROLLUP_COLUMNS):
+        return pd.DataFrame(columns=["bucket", "src_ip", "metric", "count"])
+    metric = chunk["eventid"].astype(object).map(_METRIC_OF_EVENT)
+    events = chunk.loc[metric.notna() & chunk["timestamp"].notna(), ["timestamp", "src_ip"]]
+    frame = pd.DataFrame({
+        "bucket": epoch_seconds(events["timestamp"]) // seconds * seconds,
+        "src_ip": events["src_ip"].astype(object).fillna("").to_numpy(),
+        "metric": metric[events.index].to_numpy(),
+    })
+    return frame.groupby(["bucket", "src_ip", "metric"], sort=False).size().rename("count").reset_index()
+
+
+def reaggregate(rollup: pd.DataFrame, resolution: str = "day", by: Iterable[str] = ("src_ip", "metric")) -> pd.DataFrame:
+    """Coarsen a rollup to a resolution and sum its counts over the `by` columns"""
+    seconds = RESOLUTIONS[resolution]
+    keys = ["bucket", *by]
+    frame = rollup[list(dict.fromkeys([*keys, "count"]))].copy()
+    frame["bucket"] = frame["bucket"] // seconds * seconds
+    for column in keys[1:]:
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].astype(object)
+    result = frame.groupby(keys, sort=True)["count"].sum().reset_index()
+    result["count"] = result["count"].astype(np.int64)
+    return result
+
+
+class RollupBuilder:
+    """Accumulate minute rollups over log chunks, merging partial results to bound memory"""
+
+    def __init__(self):
+        self.parts: List[pd.DataFrame] = []
+        self.rows = 0
+
+    def update(self, chunk: pd.DataFrame):
+        part = rollup_chunk(chunk)
+        if part.empty:
+            return
+        self.parts.append(part)
+        self.rows += len(part)
+        if self.rows >= COMPACT_ROWS:
+            self.parts = [self.result()]
+            self.rows = len(self.parts[0])
+
+    def update_all(self, chunks: Iterable[pd.DataFrame]):
+        for chunk in chunks:
+            self.update(chunk)
+
+    def result(self) -> pd.DataFrame:
+        if not self.parts:
+            return pd.DataFrame({"bucket": pd.Series(dtype=np.int64), "src_ip": pd.Series(dtype=object), "metric": pd.Series(dtype=object), "count": pd.Series(dtype=np.int64)})
+        return reaggregate(pd.concat(self.parts, ignore_index=True), "minute")
+
+
+def rollup_path(sensor_dir: str, resolution: str) -> str:
+    return os.path.join(sensor_dir, ROLLUP_DIR, f"{resolution}.parquet")
+
+
+def save_rollup(rollup: pd.DataFrame, path: str):
+    """Write a rollup as Parquet with dictionary-encoded IPs and metrics"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compact = rollup.astype({"src_ip": "category", "metric": "category", "count": np.int32})
+    tmp_path = path + ".tmp"
+    compact.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def build_rollups(sensor_dir: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES, use_cache: bool = True) -> Dict[str, int]:
+    """Build the minute, hour and day rollups of a sensor directory and return their row counts"""
+    merged = os.path.join(sensor_dir, "merged.json")
+    analyzer = CowrieLogAnalyzer(merged if os.path.isfile(merged) else sensor_dir, chunk_bytes=chunk_bytes, use_cache=use_cache)
+    builder = RollupBuilder()
+    builder.update_all(analyzer.iter_chunks(ROLLUP_COLUMNS))
+    minute = builder.result()
+    rows = {}
+    for resolution in RESOLUTIONS:
+        rollup = minute if resolution == "minute" else reaggregate(minute, resolution)
+        save_rollup(rollup, rollup_path(sensor_dir, resolution))
+        rows[resolution] = len(rollup)
+    return rows
+
+
+def load_rollups(sensor_dirs: List[str], resolution: str = "day") -> pd.DataFrame:
+    """Read the stored rollups of several sensor directories with a sensor_dir column"""
+    frames = []
+    for sensor_dir in sensor_dirs:
+        path = rollup_path(sensor_dir, resolution)
+        if not os.path.exists(path):
+            continue
+        frame = pd.read_parquet(path)
+        frame["sensor_dir"] = os.path.basename(os.path.normpath(sensor_dir))
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=["bucket", "src_ip", "metric", "count", "sensor_dir"])
+    return pd.concat([frame.astype({"src_ip": object, "metric": object}) for frame in frames], ignore_index=True)
+
+
+def bucket_labels(buckets: pd.Series, resolution: str) -> pd.Series:
+    """Human-readable UTC labels of bucket starts, e.g. for graphs"""
+    fmt = {"minute": "%Y-%m-%d %H:%M", "hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d"}[resolution]
+    return pd.to_datetime(buckets, unit="s", utc=True).dt.strftime(fmt)
+
+
+def daily_connects(sensor_dir: str) -> Dict[str, int]:
+    """The ssh_attempts_by_date of daily_connect.json, from the day rollup"""
+    rollup = load_rollups([sensor_dir], "day")
+    daily = reaggregate(rollup[rollup["metric"] == "connect"], "day", by=())
+    return dict(zip(bucket_labels(daily["bucket"], "day"), daily["count"].astype(int).tolist()))
+
+
+def _epoch(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and read minute/hour/day rollups of connects, logins, commands and downloads.")
+    parser.add_argument("--logs-root", default="../logs", help="Directory containing the sensor directories (default: ../logs)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help=f"Write <sensor>/{ROLLUP_DIR}/{{minute,hour,day}}.parquet")
+    build_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_BYTES, help="Number of bytes read per chunk from NDJSON logs")
+    build_parser.add_argument("--no-cache", action="store_true", help="Do not read or write the columnar (Parquet) log cache")
+    build_parser.add_argument("dirs", nargs="*", help="Sensor directories (default: all under --logs-root)")
+    show_parser = subparsers.add_parser("show", help="Print a rollup, summed over source IPs unless --by-ip is given")
+    show_parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="hour")
+    show_parser.add_argument("--metric", choices=list(METRICS), default="connect")
+    show_parser.add_argument("--sensor", action="append", dest="sensors", help="Sensor directory name (repeatable, default: all)")
+    show_parser.add_argument("--since", type=date.fromisoformat, help="First day (UTC) to show")
+    show_parser.add_argument("--until", type=date.fromisoformat, help="Last day (UTC) to show")
+    show_parser.add_argument("--by-ip", action="store_true", help="Keep one row per source IP")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        for sensor_dir in args.dirs or find_sensor_dirs(args.logs_root):
+            rows = build_rollups(sensor_dir, args.chunk_size, not args.no_cache)
+            print(f"{sensor_dir}: " + ", ".join(f"{resolution} {count} rows" for resolution, count in rows.items()))
+        return
+
+    sensor_dirs = find_sensor_dirs(args.logs_root)
+    if args.sensors:
+        sensor_dirs = [d for d in sensor_dirs if os.path.basename(os.path.normpath(d)) in args.sensors]
+    # Hour and day rollups are read as stored; coarser views of finer rollups are reaggregated
+    rollup = load_rollups(sensor_dirs, args.resolution)
+    rollup = rollup[rollup["metric"] == args.metric]
+    if args.since:
+        rollup = rollup[rollup["bucket"] >= _epoch(args.since)]
+    if args.until:
+        rollup = rollup[rollup["bucket"] < _epoch(args.until) + RESOLUTIONS["day"]]
+    result = reaggregate(rollup, args.resolution, by=["sensor_dir", "src_ip"] if args.by_ip else ["sensor_dir"])
+    result.insert(0, "time", bucket_labels(result["bucket"], args.resolution))
+    print(result.drop(columns="bucket").to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+
+from aggregator import REPORT_FILES
+from analysis import CowrieLogAnalyzer, save_to_json
+from incremental import analyze_incremental
+from log_reader import DEFAULT_CHUNK_BYTES
+from report_io import add_format_argument
+from sketches import SKETCH_REPORT_FILE, SKETCH_STATE_FILE, SketchAggregator, save_state
+
+
+def find_sensor_dirs(logs_root: str) -> List[str]:
+    """Find sensor directories that contain a merged.json or cowrie.json* logs"""
+    dirs = []
+    for directory in sorted(glob.glob(os.path.join(logs_root, "*"))):
+        if not os.path.isdir(directory):
+            continue
+        if os.path.isfile(os.path.join(directory, "merged.json")) or glob.glob(os.path.join(directory, "cowrie.json*")):
+            dirs.append(directory)
+    return dirs
+
+
+def analyze_directory(directory: str, incremental: bool = False, use_cache: bool = True, chunk_bytes: int = DEFAULT_CHUNK_BYTES, sketch: bool = False, fmt: Optional[str] = None) -> dict:
+    """Analyze one sensor directory and write its reports there; runs in a worker process"""
+    start = time.perf_counter()
+    merged = os.path.join(directory, "merged.json")
+    sketches = None
+    if incremental:
+        reports = analyze_incremental(directory, chunk_bytes)
+    else:
+        analyzer = CowrieLogAnalyzer(merged if os.path.isfile(merged) else directory, chunk_bytes=chunk_bytes, use_cache=use_cache)
+        if sketch:
+            sketches = SketchAggregator()
+            reports = analyzer.analyze_all([name for name in REPORT_FILES if name not in ("ip_stats", "command_failed")], sketches)
+        else:
+            reports = analyzer.analyze_all()
+
+    written = []
+    if sketches is not None and reports is not None:
+        save_to_json(sketches.report(), os.path.join(directory, SKETCH_REPORT_FILE), fmt)
+        save_state(sketches, os.path.join(directory, SKETCH_STATE_FILE))
+        written.append(SKETCH_REPORT_FILE)
+    for name, data in (reports or {}).items():
+        if data:
+            save_to_json(data, os.path.join(directory, REPORT_FILES[name]), fmt)
+            written.append(REPORT_FILES[name])
+    return {"directory": directory, "seconds": time.perf_counter() - start, "written": written, "ok": reports is not None}
+
+
+def run(directories: List[str], workers: Optional[int] = None, incremental: bool = False, use_cache: bool = True, chunk_bytes: int = DEFAULT_CHUNK_BYTES, sketch: bool = False, fmt: Optional[str] = None) -> List[dict]:
+    """Analyze sensor directories in a process pool and print a summary"""
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(analyze_directory, directory, incremental, use_cache, chunk_bytes, sketch, fmt): directory for directory in directories}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"directory": futures[future], "seconds": 0.0, "written": [], "ok": False, "error": str(e)}
+            results.append(result)
+            print(f"[{'done' if result['ok'] else 'failed'}] {result['directory']} ({result['seconds']:.1f}s, {len(result['written'])} reports)")
+
+    results.sort(key=lambda r: r["directory"])
+    print("\nSummary:")
+    for result in results:
+        status = "ok" if result["ok"] else f"failed {result.get('error', '')}".rstrip()
+        print(f"  {result['directory']:<50} {result['seconds']:>8.1f}s  {status}")
+    failed = sum(not r["ok"] for r in results)
+    print(f"Analyzed {len(results) - failed}/{len(results)} directories in {time.perf_counter() - start:.1f}s.")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze every sensor directory under the logs root in parallel.")
+    parser.add_argument("--logs-root", type=str, default="../logs", help="Directory containing one sub-directory per sensor (default: ../logs)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--incremental", action="store_true", help="Only read lines added since the previous run (see incremental.py)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the columnar (Parquet) log cache")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_BYTES, help="Number of bytes read per chunk from NDJSON logs")
+    parser.add_argument("--sketch", action="store_true", help="Write sketch_stats.json and sketch_state.json instead of ip_stats.json and command_failed.json (cannot be combined with --incremental)")
+    add_format_argument(parser)
+    parser.add_argument("dirs", nargs="*", help="Sensor directories to analyze (default: all under --logs-root)")
+    args = parser.parse_args()
+    if args.incremental and args.sketch:
+        parser.error("--sketch cannot be combined with --incremental")
+
+    directories = args.dirs or find_sensor_dirs(args.logs_root)
+    if not directories:
+        print(f"No sensor directories found under '{args.logs_root}'.")
+    else:
+        run(directories, args.workers, args.incremental, not args.no_cache, args.chunk_size, args.sketch, args.format)
@@ -0,0 +1,133 @@
+import fnmatch
+import gzip
+import io
+import os
+from typing import BinaryIO, List, Optional, Tuple
+
+try:
+    import boto3
+    import botocore.exceptions
+    from botocore.config import Config
+except ImportError:  # boto3 is only needed for s3:// log sources
+    boto3 = None
+
+from log_reader import GZIP_MAGIC, log_sort_key
+
+S3_SCHEME = "s3://"
+# Reopen an interrupted body at the current offset this many times before giving up
+MAX_RESUMES = 5
+
+_client = None
+
+
+def get_s3_client():
+    """Client shared by every S3 stream, pointed at S3_ENDPOINT_URL when set (MinIO, moto)"""
+    global _client
+    if boto3 is None:
+        raise ImportError("boto3 is required to read s3:// log files")
+    if _client is None:
+        config = Config(retries={"max_attempts": 10, "mode": "adaptive"})
+        _client = boto3.session.Session().client("s3", endpoint_url=os.getenv("S3_ENDPOINT_URL") or None, config=config)
+    return _client
+
+
+def parse_s3_url(url: str) -> Tuple[str, str]:
+    """Split s3://bucket/key into (bucket, key)"""
+    bucket, _, key = url[len(S3_SCHEME):].partition("/")
+    return bucket, key
+
+
+class S3ObjectStream(io.RawIOBase):
+    """Raw binary stream over an S3 object read with ranged GETs
+
+    If the connection drops, reading continues with a new Range request from the
+    current offset instead of starting over.
+    """
+
+    def __init__(self, bucket: str, key: str, s3=None):
+        self.bucket = bucket
+        self.key = key
+        self.position = 0
+        self.s3 = s3 or get_s3_client()
+        self.body = None
+        self.resumes = 0
+
+    def _open(self):
+        response = self.s3.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={self.position}-")
+        self.body = response["Body"]
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        while True:
+            try:
+                if self.body is None:
+                    self._open()
+                data = self.body.read(len(buffer))
+                break
+            except botocore.exceptions.ClientError as e:
+                # Reading at or past the end of the object
+                if e.response.get("Error", {}).get("Code") == "InvalidRange":
+                    return 0
+                raise
+            except (botocore.exceptions.BotoCoreError, ConnectionError) as e:
+                self.resumes += 1
+                if self.resumes > MAX_RESUMES:
+                    raise
+                print(f"Resuming s3://{self.bucket}/{self.key} at byte {self.position}: {e}")
+                self.body = None
+        n = len(data)
+        buffer[:n] = data
+        self.position += n
+        return n
+
+    def close(self):
+        if self.body is not None:
+            self.body.close()
+            self.body = None
+        super().close()
+
+
+class _ClosingGzipFile(gzip.GzipFile):
+    """GzipFile that also closes the stream it decompresses (GzipFile leaves a fileobj open)"""
+
+    def __init__(self, stream: BinaryIO):
+        super().__init__(fileobj=stream, mode="rb")
+        self.stream = stream
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.stream.close()
+
+
+def open_s3_object(url: str, buffer_size: int = 8 * 1024 * 1024) -> BinaryIO:
+    """Open an s3:// log object for binary reading, decompressing gzip objects on the fly"""
+    bucket, key = parse_s3_url(url)
+    stream = io.BufferedReader(S3ObjectStream(bucket, key), buffer_size)
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        return _ClosingGzipFile(stream)
+    return stream
+
+
+def find_s3_log_files(url: str) -> List[str]:
+    """Resolve an s3:// object, prefix (ending with /) or glob to the log objects to read"""
+    bucket, key = parse_s3_url(url)
+    if not key.endswith("/") and not any(char in key for char in "*?["):
+        return [url]
+    prefix = key if key.endswith("/") else key[: min(key.find(char) for char in "*?[" if char in key)]
+    pattern = key + "cowrie.json*" if key.endswith("/") else key
+
+    paginator = get_s3_client().get_paginator("list_objects_v2")
+    urls = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            # fnmatch's "*" also crosses "/", so keep directory prefixes from matching deeper keys
+            if fnmatch.fnmatchcase(obj["Key"], pattern) and obj["Key"].count("/") == pattern.count("/"):
+                urls.append(f"{S3_SCHEME}{bucket}/{obj['Key']}")
+    return sorted(urls, key=log_sort_key)
@@ -0,0 +1,421 @@
+import fnmatch
+import re
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from sigma_matcher import LiteralScanner
+
+# Logsource categories whose rules describe a single executed command. Linux rules without a
+# category are auditd/syslog rules on fields (type, a0, ...) that a Cowrie command does not have.
+SUPPORTED_CATEGORIES = {"process_creation"}
+SUPPORTED_MODIFIERS = {"contains", "startswith", "endswith", "all", "re", "i", "m", "s", "cased", "windash", "exists"}
+
+SUBCOMMAND_SEPARATOR = re.compile(r"\s*(?:;|&&|\|\||\||\n)\s*")
+CONDITION_TOKEN = re.compile(r"\(|\)|[^\s()]+")
+
+
+class UnsupportedRule(Exception):
+    """Raised for rules using Sigma features that cannot be evaluated on Cowrie commands"""
+
+
+class CommandEvent:
+    """Sigma fields of one command typed into Cowrie
+
+    CommandLine is the command itself and Image the executable it starts; bare
+    program names are resolved to /usr/bin like the shell would for most tools.
+    """
+
+    __slots__ = ("fields", "lowered")
+
+    def __init__(self, command: str):
+        tokens = command.split(None, 1)
+        image = tokens[0].strip("'\"") if tokens else ""
+        if image and "/" not in image:
+            image = "/usr/bin/" + image
+        self.fields = {"CommandLine": command, "Image": image}
+        self.lowered = {name: value.lower() for name, value in self.fields.items()}
+
+
+def command_events(command: str) -> List[CommandEvent]:
+    """Events of a command line: the whole line and each command chained with ; && || or |"""
+    events = [CommandEvent(command)]
+    parts = [part for part in SUBCOMMAND_SEPARATOR.split(command) if part]
+    if len(parts) > 1:
+        events.extend(CommandEvent(part) for part in parts)
+    return events
+
+
+def _wildcard_regex(value: str) -> str:
+    """Translate Sigma wildcards (* and ?, escaped with a backslash) into a regex"""
+    regex = []
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char == "\\" and i + 1 < len(value) and value[i + 1] in "*?\\":
+            regex.append(re.escape(value[i + 1]))
+            i += 2
+            continue
+        regex.append(".*" if char == "*" else "." if char == "?" else re.escape(char))
+        i += 1
+    return "".join(regex)
+
+
+def _has_wildcard(value: str) -> bool:
+    return re.search(r"(?<!\\)[*?]", value) is not None
+
+
+def _longest_plain_part(value: str) -> str:
+    """Longest wildcard-free part of a value, usable as a literal prefilter"""
+    return max(re.split(r"(?<!\\)[*?]", value), key=len).replace("\\*", "*").replace("\\?", "?").replace("\\\\", "\\")
+
+
+def _windash_variants(value: str) -> List[str]:
+    variants = [value]
+    for dash, alternative in (("-", "/"), ("/", "-")):
+        if value.startswith(dash) or f" {dash}" in value:
+            swapped = re.sub(rf"(^|\s){re.escape(dash)}", lambda m: m.group(1) + alternative, value)
+            if swapped not in variants:
+                variants.append(swapped)
+    return variants
+
+
+class Node:
+    """A predicate over a CommandEvent"""
+
+    cost = 1
+
+    def evaluate(self, event: CommandEvent) -> bool:
+        raise NotImplementedError
+
+    def literals(self) -> Optional[Set[str]]:
+        """Lowercased literals of which at least one occurs in the command whenever the node matches"""
+        return None
+
+
+class Const(Node):
+    def __init__(self, value: bool):
+        self.value = value
+
+    def evaluate(self, event):
+        return self.value
+
+
+class ValueMatch(Node):
+    """One field value test: equality, contains, startswith, endswith, regex, null or exists"""
+
+    def __init__(self, field: str, value: Any, kind: str, cased: bool = False, regex_flags: int = 0):
+        self.field = field
+        self.kind = kind
+        self.cased = cased
+        self.value = value
+        self.regex = None
+        self.literal = None
+        if kind == "re":
+            self.regex = re.compile(value, regex_flags)
+            self.cost = 10
+        elif kind in ("null", "exists"):
+            pass
+        else:
+            text = value if cased else value.lower()
+            if _has_wildcard(text):
+                regex = _wildcard_regex(text)
+                if kind in ("equals", "endswith"):
+                    regex += r"\Z"
+                if kind in ("equals", "startswith"):
+                    regex = r"\A" + regex
+                self.regex = re.compile(regex, re.DOTALL)
+                self.cost = 5
+            self.value = text
+            if field in ("CommandLine", None):
+                self.literal = _longest_plain_part(text).lower()
+
+    def evaluate(self, event):
+        # Keywords (field None) are searched in the command line
+        field = self.field or "CommandLine"
+        values = event.fields.get(field) if self.cased or self.kind == "re" else event.lowered.get(field)
+        if self.kind == "null":
+            return not values
+        if self.kind == "exists":
+            return (values is not None) == bool(self.value)
+        if values is None:
+            return False
+        if self.regex is not None:
+            return self.regex.search(values) is not None
+        if self.kind == "contains":
+            return self.value in values
+        if self.kind == "startswith":
+            return values.startswith(self.value)
+        if self.kind == "endswith":
+            return values.endswith(self.value)
+        return values == self.value
+
+    def literals(self):
+        return {self.literal} if self.literal else None
+
+
+class And(Node):
+    def __init__(self, children: List[Node]):
+        # Cheap literal tests first, so that most events are rejected before any regex runs
+        self.children = sorted(children, key=lambda child: child.cost)
+        self.cost = sum(child.cost for child in children)
+
+    def evaluate(self, event):
+        for child in self.children:
+            if not child.evaluate(event):
+                return False
+        return True
+
+    def literals(self):
+        candidates = [child.literals() for child in self.children]
+        candidates = [literals for literals in candidates if literals]
+        if not candidates:
+            return None
+        # Any child's literals are necessary; prefer the most selective set
+        return min(candidates, key=lambda literals: (len(literals), -min(len(literal) for literal in literals)))
+
+
+class Or(Node):
+    def __init__(self, children: List[Node]):
+        self.children = sorted(children, key=lambda child: child.cost)
+        self.cost = sum(child.cost for child in children)
+
+    def evaluate(self, event):
+        for child in self.children:
+            if child.evaluate(event):
+                return True
+        return False
+
+    def literals(self):
+        literals = set()
+        for child in self.children:
+            child_literals = child.literals()
+            if not child_literals:
+                return None
+            literals |= child_literals
+        return literals
+
+
+class Not(Node):
+    def __init__(self, child: Node):
+        self.child = child
+        self.cost = child.cost
+
+    def evaluate(self, event):
+        return not self.child.evaluate(event)
+
+
+def _compile_field(field_spec: str, values: Any) -> Node:
+    """Compile one 'Field|modifier|...: values' entry of a selection"""
+    field, *modifiers = field_spec.split("|")
+    unsupported = set(modifiers) - SUPPORTED_MODIFIERS
+    if unsupported:
+        raise UnsupportedRule(f"unsupported modifiers {sorted(unsupported)}")
+    values = values if isinstance(values, list) else [values]
+
+    if "exists" in modifiers:
+        return ValueMatch(field, bool(values[0]), "exists")
+
+    kind = "equals"
+    for modifier in ("contains", "startswith", "endswith", "re"):
+        if modifier in modifiers:
+            kind = modifier
+    cased = "cased" in modifiers
+    regex_flags = (re.IGNORECASE if "i" in modifiers else 0) | (re.MULTILINE if "m" in modifiers else 0) | (re.DOTALL if "s" in modifiers else 0)
+
+    matches: List[Node] = []
+    for value in values:
+        if value is None:
+            matches.append(ValueMatch(field, None, "null"))
+            continue
+        if isinstance(value, (dict, list)):
+            raise UnsupportedRule(f"unsupported value for {field_spec}")
+        value = str(value).lower() if isinstance(value, bool) else str(value)
+        variants = _windash_variants(value) if "windash" in modifiers else [value]
+        nodes = [ValueMatch(field, variant, kind, cased, regex_flags) for variant in variants]
+        matches.append(nodes[0] if len(nodes) == 1 else Or(nodes))
+    if not matches:
+        return Const(False)
+    if len(matches) == 1:
+        return matches[0]
+    return And(matches) if "all" in modifiers else Or(matches)
+
+
+def _compile_selection(definition: Any) -> Node:
+    """Compile a detection item: a field map, a list of field maps or a list of keywords"""
+    if isinstance(definition, dict):
+        return And([_compile_field(field, values) for field, values in definition.items()]) if definition else Const(False)
+    if isinstance(definition, list):
+        if all(isinstance(item, dict) for item in definition):
+            return Or([_compile_selection(item) for item in definition]) if definition else Const(False)
+        if all(not isinstance(item, (dict, list)) for item in definition):
+            return Or([ValueMatch(None, str(item), "contains") for item in definition]) if definition else Const(False)
+    if isinstance(definition, (str, int)):
+        return ValueMatch(None, str(definition), "contains")
+    raise UnsupportedRule("unsupported detection item")
+
+
+class _ConditionParser:
+    """Recursive descent parser for Sigma conditions (or < and < not, 1 of / all of)"""
+
+    def __init__(self, condition: str, selections: Dict[str, Node]):
+        self.tokens = CONDITION_TOKEN.findall(condition)
+        self.position = 0
+        self.selections = selections
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise UnsupportedRule("unexpected end of condition")
+        self.position += 1
+        return token
+
+    def parse(self) -> Node:
+        node = self._parse_or()
+        if self._peek() is not None:
+            raise UnsupportedRule(f"unsupported condition near '{self._peek()}'")
+        return node
+
+    def _parse_or(self) -> Node:
+        children = [self._parse_and()]
+        while self._peek() is not None and self._peek().lower() == "or":
+            self._next()
+            children.append(self._parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def _parse_and(self) -> Node:
+        children = [self._parse_not()]
+        while self._peek() is not None and self._peek().lower() == "and":
+            self._next()
+            children.append(self._parse_not())
+        return children[0] if len(children) == 1 else And(children)
+
+    def _parse_not(self) -> Node:
+        if self._peek() is not None and self._peek().lower() == "not":
+            self._next()
+            return Not(self._parse_not())
+        return self._parse_atom()
+
+    def _parse_atom(self) -> Node:
+        token = self._next()
+        if token == "(":
+            node = self._parse_or()
+            if self._next() != ")":
+                raise UnsupportedRule("unbalanced parentheses")
+            return node
+        if token.lower() in ("1", "any", "all") and self._peek() is not None and self._peek().lower() == "of":
+            self._next()
+            target = self._next()
+            if target.lower() == "them":
+                names = [name for name in self.selections if not name.startswith("_")]
+            else:
+                names = [name for name in self.selections if fnmatch.fnmatchcase(name, target)]
+            if not names:
+                raise UnsupportedRule(f"no selection matches '{target}'")
+            children = [self.selections[name] for name in names]
+            if len(children) == 1:
+                return children[0]
+            return And(children) if token.lower() == "all" else Or(children)
+        if token in self.selections:
+            return self.selections[token]
+        raise UnsupportedRule(f"unknown identifier '{token}'")
+
+
+def compile_detection(detection: Dict[str, Any]) -> Node:
+    """Compile the detection section of a Sigma rule into a predicate tree"""
+    selections = {name: _compile_selection(definition) for name, definition in detection.items() if name not in ("condition", "timeframe")}
+    conditions = detection.get("condition")
+    if conditions is None:
+        raise UnsupportedRule("missing condition")
+    conditions = conditions if isinstance(conditions, list) else [conditions]
+    nodes = []
+    for condition in conditions:
+        if not isinstance(condition, str) or "|" in condition:
+            raise UnsupportedRule("aggregation conditions are not supported")
+        nodes.append(_ConditionParser(condition, selections).parse())
+    return nodes[0] if len(nodes) == 1 else Or(nodes)
+
+
+class CompiledRule:
+    """A Sigma rule compiled into a predicate and its literal prefilter"""
+
+    def __init__(self, index: int, rule: Dict[str, Any]):
+        self.index = index
+        self.title = rule.get("title", "No Title")
+        self.description = rule.get("description", None)
+        self.id = rule.get("id", None)
+        self.level = rule.get("level", None)
+        self.predicate = compile_detection(rule.get("detection") or {})
+        self.prefilter = self.predicate.literals()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"title": self.title, "description": self.description, "id": self.id, "level": self.level}
+
+
+class SigmaRuleSet:
+    """Evaluate the conditions of linux Sigma rules against Cowrie commands
+
+    Every rule whose condition can only hold when one of a few literals occurs in the
+    command is indexed by those literals; one LiteralScanner pass over the lowercased
+    command then selects the candidate rules, and only those are evaluated.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules: List[CompiledRule] = []
+        self.skipped: Dict[str, str] = {}
+        for rule in rules:
+            if not isinstance(rule, dict):
+                continue
+            logsource = rule.get("logsource") or {}
+            if logsource.get("product") != "linux" or logsource.get("category") not in SUPPORTED_CATEGORIES:
+                continue
+            try:
+                self.rules.append(CompiledRule(len(self.rules), rule))
+            except (UnsupportedRule, re.error, AttributeError, TypeError) as e:
+                self.skipped[rule.get("title", "No Title")] = str(e)
+
+        self.always: List[CompiledRule] = []
+        self.by_literal: Dict[str, List[CompiledRule]] = {}
+        for compiled in self.rules:
+            if compiled.prefilter is None:
+                self.always.append(compiled)
+            else:
+                for literal in compiled.prefilter:
+                    self.by_literal.setdefault(literal, []).append(compiled)
+        self.scanner = LiteralScanner(self.by_literal)
+        # Rule index -> [seconds, evaluations], only while enable_rule_timing() is in effect
+        self.rule_seconds: Optional[Dict[int, List[float]]] = None
+
+    def enable_rule_timing(self):
+        """Record the time spent evaluating each rule (see profiling.add_rule_times)"""
+        self.rule_seconds = {}
+
+    def rule_title(self, index: int) -> str:
+        return self.rules[index].title
+
+    def match(self, command: str) -> List[CompiledRule]:
+        """Return the rules matching a command, in rule order"""
+        candidates = {compiled.index: compiled for compiled in self.always}
+        for literal in self.scanner.scan(command.lower()):
+            for compiled in self.by_literal[literal]:
+                candidates[compiled.index] = compiled
+        if not candidates:
+            return []
+        events = command_events(command)
+        if self.rule_seconds is None:
+            return [compiled for _, compiled in sorted(candidates.items()) if any(compiled.predicate.evaluate(event) for event in events)]
+        matched = []
+        for _, compiled in sorted(candidates.items()):
+            start = time.perf_counter()
+            if any(compiled.predicate.evaluate(event) for event in events):
+                matched.append(compiled)
+            timing = self.rule_seconds.setdefault(compiled.index, [0.0, 0])
+            timing[0] += time.perf_counter() - start
+            timing[1] += 1
+        return matched
+
+    def match_rules(self, command: str) -> List[Dict[str, Any]]:
+        """Return the matching rules of a command in the format of command_analysis.json"""
+        return [compiled.to_dict() for compiled in self.match(command)]
@@ -0,0 +1,155 @@
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Modifiers that generate_regex_patterns turns into plain substring, prefix or suffix regexes
+LITERAL_MODIFIERS = {"contains", "startswith", "endswith"}
+
+
+def _escape(text: str) -> str:
+    return re.escape(text)
+
+
+def _trie_regex(node: dict) -> str:
+    """Build a regex from a character trie that matches the longest literal at a position"""
+    branches = []
+    for char in sorted(key for key in node if key):
+        child = node[char]
+        regex = _escape(char)
+        # Collapse chains of single-child nodes so nesting only grows at branch points
+        while len(child) == 1 and "" not in child:
+            (next_char, child), = child.items()
+            regex += _escape(next_char)
+        branches.append(regex + _trie_regex(child))
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{body})?" if "" in node else body
+
+
+class LiteralScanner:
+    """Find every literal of a set that occurs in a string with a single regex scan
+
+    The literals are compiled into one trie-shaped regex inside a lookahead, so each
+    position reports the longest literal starting there. Shorter literals starting at
+    the same position are prefixes of it and are added from a precomputed table,
+    which gives the same result as an Aho-Corasick automaton.
+    """
+
+    def __init__(self, literals: Iterable[str]):
+        self.literals = {literal for literal in literals if literal}
+        trie: dict = {}
+        for literal in self.literals:
+            node = trie
+            for char in literal:
+                node = node.setdefault(char, {})
+            node[""] = True
+        self.regex = re.compile(f"(?=({_trie_regex(trie)}))", re.DOTALL) if self.literals else None
+        self.prefixes = {literal: [literal[:i] for i in range(1, len(literal) + 1) if literal[:i] in self.literals] for literal in self.literals}
+
+    def scan(self, text: str) -> Set[str]:
+        """Return the set of literals that occur in text"""
+        if self.regex is None:
+            return set()
+        found = set()
+        for longest in set(self.regex.findall(text)):
+            found.update(self.prefixes[longest])
+        return found
+
+
+def _literal_kind(pattern: Dict[str, Any]):
+    """Return how a generated pattern matches its literal, or None if it needs the regex"""
+    if "literal" not in pattern or not isinstance(pattern["literal"], str):
+        return None
+    modifiers = pattern.get("modifiers", [])
+    if pattern.get("not", False) or not modifiers or modifiers[0] not in LITERAL_MODIFIERS:
+        return "contains"
+    return modifiers[0]
+
+
+class CompiledSigmaMatcher:
+    """Match commands against all patterns of generate_regex_patterns in one pass
+
+    Literal patterns (plain, contains, startswith, endswith and their "not" variants) are
+    resolved with a single LiteralScanner; any other pattern falls back to its compiled regex.
+    Results are identical to calling re.search for every (command, rule, pattern).
+    """
+
+    def __init__(self, regex_patterns: List[Dict[str, Any]]):
+        self.rules = regex_patterns
+        self.by_literal: Dict[str, List[Tuple[int, int, str]]] = {}
+        self.not_patterns: List[Tuple[int, int, str]] = []
+        self.regex_patterns: List[Tuple[int, int, "re.Pattern", bool]] = []
+
+        for rule_index, rule in enumerate(regex_patterns):
+            for pattern_index, pattern in enumerate(rule.get("patterns", [])):
+                kind = _literal_kind(pattern)
+                if kind is None:
+                    self.regex_patterns.append((rule_index, pattern_index, re.compile(pattern.get("match", "")), pattern.get("not", False)))
+                elif pattern.get("not", False):
+                    self.not_patterns.append((rule_index, pattern_index, pattern["literal"]))
+                else:
+                    self.by_literal.setdefault(pattern["literal"], []).append((rule_index, pattern_index, kind))
+        self.scanner = LiteralScanner(list(self.by_literal) + [literal for _, _, literal in self.not_patterns])
+        self.has_empty_literal = "" in self.by_literal or any(literal == "" for _, _, literal in self.not_patterns)
+        # Rule index -> [seconds, evaluations] of its regex patterns, only while enable_rule_timing() is in effect
+        self.rule_seconds: Optional[Dict[int, List[float]]] = None
+
+    def enable_rule_timing(self):
+        """Record the time spent on the regex patterns of each rule; literal patterns cost one shared scan"""
+        self.rule_seconds = {}
+
+    def rule_title(self, index: int) -> str:
+        return self.rules[index].get("title", "No Title")
+
+    def _matches_literal(self, text: str, literal: str, kind: str) -> bool:
+        if kind == "startswith":
+            return text.startswith(literal)
+        if kind == "endswith":
+            # Same as re.search(".*X$"): "$" also matches before a trailing newline
+            return text.endswith(literal) or text.endswith(literal + "\n")
+        return True
+
+    def match(self, text: str) -> List[Tuple[int, int]]:
+        """Return (rule index, pattern index) of every matching pattern, in rule order"""
+        present = self.scanner.scan(text)
+        if self.has_empty_literal:
+            present.add("")
+
+        hits = []
+        for literal in present:
+            for rule_index, pattern_index, kind in self.by_literal.get(literal, ()):
+                if self._matches_literal(text, literal, kind):
+                    hits.append((rule_index, pattern_index))
+        for rule_index, pattern_index, literal in self.not_patterns:
+            if literal not in present:
+                hits.append((rule_index, pattern_index))
+        if self.rule_seconds is None:
+            for rule_index, pattern_index, regex, not_flag in self.regex_patterns:
+                if bool(regex.search(text)) != not_flag:
+                    hits.append((rule_index, pattern_index))
+        else:
+            for rule_index, pattern_index, regex, not_flag in self.regex_patterns:
+                start = time.perf_counter()
+                if bool(regex.search(text)) != not_flag:
+                    hits.append((rule_index, pattern_index))
+                timing = self.rule_seconds.setdefault(rule_index, [0.0, 0])
+                timing[0] += time.perf_counter() - start
+                timing[1] += 1
+        hits.sort()
+        return hits
+
+    def match_rules(self, text: str) -> List[Dict[str, Any]]:
+        """Return the matches of a command in the format of command_analysis.json"""
+        matches = []
+        for rule_index, pattern_index in self.match(text):
+            rule = self.rules[rule_index]
+            pattern = rule["patterns"][pattern_index]
+            matches.append({
+                "title": rule.get("title"),
+                "description": rule.get("description"),
+                "field": pattern.get("field", ""),
+                "match": pattern.get("match", ""),
+                "not": pattern.get("not", False),
+            })
+        return matches
@@ -0,0 +1,253 @@
+import argparse
+import base64
+import glob
+import json
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+SKETCH_STATE_FILE = "sketch_state.json"
+SKETCH_REPORT_FILE = "sketch_stats.json"
+SKETCH_COLUMNS = ["eventid", "src_ip", "input"]
+
+HLL_PRECISION = 14  # 16384 registers, about 0.8% standard error
+CMS_WIDTH = 1 << 16
+CMS_DEPTH = 4
+TOP_K = 1000
+
+# hash_array keys of the Count-Min rows; changing them invalidates saved states
+_CMS_HASH_KEYS = ["cowrie-cms-row0", "cowrie-cms-row1", "cowrie-cms-row2", "cowrie-cms-row3"]
+
+
+def _hash(values: np.ndarray, hash_key: str = "0123456789123456") -> np.ndarray:
+    """64-bit hashes of an object array, identical across processes and runs"""
+    return pd.util.hash_array(values, hash_key=hash_key.ljust(16, "0")[:16], categorize=False)
+
+
+def _encode(array: np.ndarray) -> str:
+    return base64.b64encode(zlib.compress(array.tobytes())).decode("ascii")
+
+
+def _decode(data: str, dtype) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(base64.b64decode(data)), dtype=dtype).copy()
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Vectorized int.bit_length() of a uint64 array"""
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= (np.uint64(1) << np.uint64(shift))
+        lengths[high] += shift
+        values[high] >>= np.uint64(shift)
+    lengths += (values > 0).astype(np.uint8)
+    return lengths
+
+
+class HyperLogLog:
+    """Distinct count estimate in 2**precision one-byte registers, mergeable by register-wise max"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: np.ndarray):
+        """Add values; duplicates do not change the registers, so pass unique values where known"""
+        if len(values) == 0:
+            return
+        hashes = _hash(values)
+        suffix_bits = 64 - self.precision
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        rank = (suffix_bits + 1 - _bit_length(suffix)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+    def to_state(self) -> dict:
+        return {"precision": self.precision, "registers": _encode(self.registers)}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "HyperLogLog":
+        sketch = cls(state["precision"])
+        sketch.registers = _decode(state["registers"], np.uint8)
+        return sketch
+
+
+class TopK:
+    """Heavy hitters: a Count-Min sketch for counts plus the k keys with the highest estimates
+
+    Estimates never undercount; they may overcount by about total/width. Merging adds the
+    Count-Min tables and re-ranks the union of both candidate sets.
+    """
+
+    def __init__(self, k: int = TOP_K, width: int = CMS_WIDTH, depth: int = CMS_DEPTH):
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+        self.candidates = np.empty(0, dtype=object)
+
+    def _columns(self, keys: np.ndarray) -> np.ndarray:
+        return np.stack([(_hash(keys, _CMS_HASH_KEYS[row]) % np.uint64(self.width)).astype(np.int64) for row in range(self.depth)])
+
+    def estimates(self, keys: np.ndarray) -> np.ndarray:
+        if len(keys) == 0:
+            return np.empty(0, dtype=np.int64)
+        columns = self._columns(keys)
+        return np.min(self.table[np.arange(self.depth)[:, None], columns], axis=0)
+
+    def _rank(self, keys: np.ndarray):
+        keys = pd.unique(keys)
+        estimates = self.estimates(keys)
+        if len(keys) > self.k:
+            keep = np.argpartition(-estimates, self.k - 1)[: self.k]
+            keys = keys[keep]
+        self.candidates = keys
+
+    def update(self, values: np.ndarray):
+        counts = pd.Series(values, dtype=object).value_counts(sort=False)
+        self.add_counts(counts.index.to_numpy(dtype=object), counts.to_numpy(dtype=np.int64))
+
+    def add_counts(self, keys: np.ndarray, counts: np.ndarray):
+        """Add the counts of distinct keys"""
+        if len(keys) == 0:
+            return
+        columns = self._columns(keys)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], counts)
+        self.total += int(counts.sum())
+        self._rank(np.concatenate([self.candidates, keys]))
+
+    def merge(self, other: "TopK"):
+        self.table += other.table
+        self.total += other.total
+        self._rank(np.concatenate([self.candidates, other.candidates]))
+
+    def top(self, n: Optional[int] = None) -> Dict[str, int]:
+        """Estimated counts of the top keys in descending order"""
+        estimates = self.estimates(self.candidates)
+        order = np.lexsort((self.candidates.astype(str), -estimates))[: n or self.k]
+        return {str(self.candidates[i]): int(estimates[i]) for i in order}
+
+    def to_state(self) -> dict:
+        return {"k": self.k, "width": self.width, "depth": self.depth, "total": self.total, "table": _encode(self.table), "candidates": [str(key) for key in self.candidates]}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TopK":
+        sketch = cls(state["k"], state["width"], state["depth"])
+        sketch.table = _decode(state["table"], np.int64).reshape(sketch.depth, sketch.width)
+        sketch.total = state["total"]
+        sketch.candidates = np.array(state["candidates"], dtype=object)
+        return sketch
+
+
+# Sketch name -> (eventid, column) it tracks
+SKETCH_SOURCES = {
+    "ips": ("cowrie.session.connect", "src_ip"),
+    "command_failed": ("cowrie.command.failed", "input"),
+    "commands": ("cowrie.command.input", "input"),
+}
+
+
+class SketchAggregator:
+    """Constant-memory counterpart of ip_stats and command_failed: distinct counts and top-K per source"""
+
+    def __init__(self, k: int = TOP_K):
+        self.distinct = {name: HyperLogLog() for name in SKETCH_SOURCES}
+        self.top = {name: TopK(k) for name in SKETCH_SOURCES}
+
+    def update(self, chunk: pd.DataFrame):
+        if "eventid" not in chunk.columns or chunk.empty:
+            return
+        eventids = chunk["eventid"].astype(object)
+        for name, (eventid, column) in SKETCH_SOURCES.items():
+            if column not in chunk.columns:
+                continue
+            counts = chunk.loc[eventids == eventid, column].dropna().astype(object).value_counts(sort=False)
+            keys = counts.index.to_numpy(dtype=object)
+            self.distinct[name].update(keys)
+            self.top[name].add_counts(keys, counts.to_numpy(dtype=np.int64))
+
+    def update_all(self, chunks: Iterable[pd.DataFrame]):
+        for chunk in chunks:
+            self.update(chunk)
+
+    def merge(self, other: "SketchAggregator"):
+        for name in SKETCH_SOURCES:
+            self.distinct[name].merge(other.distinct[name])
+            self.top[name].merge(other.top[name])
+
+    def report(self, n: Optional[int] = None) -> dict:
+        return {name: {"distinct": self.distinct[name].estimate(), "total": self.top[name].total, "top": self.top[name].top(n)} for name in SKETCH_SOURCES}
+
+    def to_state(self) -> dict:
+        return {name: {"distinct": self.distinct[name].to_state(), "top": self.top[name].to_state()} for name in SKETCH_SOURCES}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SketchAggregator":
+        aggregator = cls()
+        for name in SKETCH_SOURCES:
+            aggregator.distinct[name] = HyperLogLog.from_state(state[name]["distinct"])
+            aggregator.top[name] = TopK.from_state(state[name]["top"])
+        return aggregator
+
+
+def save_state(aggregator: SketchAggregator, path: str):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(aggregator.to_state(), f)
+    os.replace(tmp_path, path)
+
+
+def load_state(path: str) -> SketchAggregator:
+    with open(path, "r") as f:
+        return SketchAggregator.from_state(json.load(f))
+
+
+def merge_states(paths: List[str]) -> SketchAggregator:
+    """Merge the sketch states of several sensors or days"""
+    merged = SketchAggregator()
+    for path in paths:
+        merged.merge(load_state(path))
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the sketch states of several sensors into fleet-wide distinct counts and top-K.")
+    parser.add_argument("states", nargs="*", help=f"{SKETCH_STATE_FILE} files (default: every */{SKETCH_STATE_FILE} under --logs-root)")
+    parser.add_argument("--logs-root", default="../logs", help="Directory containing the sensor directories (default: ../logs)")
+    parser.add_argument("--output", default="fleet_sketch_stats.json", help="Merged report (default: fleet_sketch_stats.json)")
+    parser.add_argument("--state-output", help="Also write the merged state, to merge it again later")
+    parser.add_argument("--top", type=int, default=None, help="Number of top keys to report (default: all tracked)")
+    args = parser.parse_args()
+
+    paths = args.states or sorted(glob.glob(os.path.join(args.logs_root, "*", SKETCH_STATE_FILE)))
+    if not paths:
+        print("No sketch states found.")
+        return
+    merged = merge_states(paths)
+    with open(args.output, "w") as f:
+        json.dump(merged.report(args.top), f, indent=4)
+    if args.state_output:
+        save_state(merged, args.state_output)
+    print(f"Merged {len(paths)} sketch states into '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The analysis modules are flat scripts imported by name, as when run from analysis/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_log(path, events):
+    """Write events as a native NDJSON Cowrie log and return its path"""
+    with open(path, "w") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+    return str(path)
+
+
+def sample_events():
+    """A small log covering every report, with numeric-looking commands and missing fields"""
+    events = []
+    for i in range(12):
+        session = f"{i:012x}"
+        src_ip = f"192.0.2.{i % 5}"
+        day = f"2024-12-0{1 + i % 3}"
+
+        def event(eventid, second, **fields):
+            events.append({"eventid": eventid, "timestamp": f"{day}T00:{i:02d}:{second:02d}.000000Z", "session": session, "src_ip": src_ip, **fields})
+
+        event("cowrie.session.connect", 0, src_port=40000 + i, dst_port=22)
+        # One client.version without a version and one client.size without a height
+        event("cowrie.client.version", 1, **({"version": f"SSH-2.0-Go{i % 2}"} if i != 3 else {}))
+        event("cowrie.client.size", 2, width=80 + i % 2, **({"height": 24} if i != 4 else {}))
+        event("cowrie.command.input", 3, input=["1", "2", "uname -a", "ls", "007"][i % 5])
+        if i % 3 == 0:
+            event("cowrie.command.failed", 4, input=["wget", "1"][i % 2])
+        if i % 4 == 0:
+            # One download without a shasum
+            event("cowrie.session.file_download", 5, **({"shasum": f"{i % 8:064x}"} if i != 8 else {}))
+    return events
+
+
+@pytest.fixture
+def sample_log(tmp_path):
+    return write_log(tmp_path / "cowrie.json", sample_events())
@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+moto = pytest.importorskip("moto")
+
+import download_s3_logs  # noqa: E402
+from download_s3_logs import MANIFEST_FILE, download_s3_logs as sync  # noqa: E402
+
+BUCKET = "cowrie-log"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = download_s3_logs.create_s3_client()
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def read_manifest(download_path):
+    with open(os.path.join(download_path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def test_skips_unchanged_objects(s3, tmp_path):
+    download_path = str(tmp_path)
+    s3.put_object(Bucket=BUCKET, Key="COWRIE_A/cowrie.json.2024-12-01", Body=b'{"eventid": "cowrie.session.connect"}\n')
+    s3.put_object(Bucket=BUCKET, Key="COWRIE_A/cowrie.json", Body=b"")
+
+    assert sync(BUCKET, download_path, workers=2) == (2, 0, 0)
+    manifest = read_manifest(download_path)
+    assert sorted(manifest) == ["COWRIE_A/cowrie.json", "COWRIE_A/cowrie.json.2024-12-01"]
+    assert (tmp_path / "COWRIE_A" / "cowrie.json.2024-12-01").read_bytes() == b'{"eventid": "cowrie.session.connect"}\n'
+
+    assert sync(BUCKET, download_path, workers=2) == (0, 2, 0)
+
+    # A changed object is downloaded again and its new ETag recorded
+    s3.put_object(Bucket=BUCKET, Key="COWRIE_A/cowrie.json", Body=b'{"eventid": "cowrie.login.failed"}\n')
+    assert sync(BUCKET, download_path, workers=2) == (1, 1, 0)
+    etag = s3.head_object(Bucket=BUCKET, Key="COWRIE_A/cowrie.json")["ETag"]
+    assert read_manifest(download_path)["COWRIE_A/cowrie.json"]["etag"] == etag
+
+    # --full ignores the manifest
+    assert sync(BUCKET, download_path, workers=2, full=True) == (2, 0, 0)
+
+
+def test_manifest_is_saved_when_a_download_fails(s3, tmp_path, monkeypatch):
+    download_path = str(tmp_path)
+    s3.put_object(Bucket=BUCKET, Key="COWRIE_A/cowrie.json.2024-12-01", Body=b"{}\n")
+    s3.put_object(Bucket=BUCKET, Key="COWRIE_A/cowrie.json.2024-12-02", Body=b"{}\n")
+    original = download_s3_logs.download_object
+
+    def flaky_download(s3_client, bucket_name, obj, file_path):
+        if obj["Key"].endswith("2024-12-02"):
+            raise download_s3_logs.botocore.exceptions.EndpointConnectionError(endpoint_url="http://s3.invalid")
+        original(s3_client, bucket_name, obj, file_path)
+
+    monkeypatch.setattr(download_s3_logs, "download_object", flaky_download)
+    assert sync(BUCKET, download_path, workers=2) == (1, 0, 1)
+    assert list(read_manifest(download_path)) == ["COWRIE_A/cowrie.json.2024-12-01"]
+
+    monkeypatch.setattr(download_s3_logs, "download_object", original)
+    assert sync(BUCKET, download_path, workers=2) == (1, 1, 0)
+
+
+def test_prefix_and_date_filters(s3, tmp_path):
+    from datetime import date
+
+    for key in ["COWRIE_A/cowrie.json.2024-11-30", "COWRIE_A/cowrie.json.2024-12-01", "COWRIE_B/cowrie.json.2024-12-01"]:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b"{}\n")
+    assert sync(BUCKET, str(tmp_path), prefixes=["COWRIE_A"], since=date(2024, 12, 1)) == (1, 0, 0)
+    assert list(read_manifest(str(tmp_path))) == ["COWRIE_A/cowrie.json.2024-12-01"]
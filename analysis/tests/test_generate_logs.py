@@ -0,0 +1,18 @@
+from datetime import date
+
+from generate_logs import generate
+
+
+def test_sessions_are_split_between_sensors(tmp_path):
+    stats = generate(str(tmp_path), 0, sensors=3, days=2, ips=50, commands=20, hashes=5, sessions=10)
+    assert [counts["sessions"] for counts in stats.values()] == [4, 3, 3]
+    for sensor_dir, counts in stats.items():
+        connects = sum(path.read_text().count('"cowrie.session.connect"') for path in (tmp_path / sensor_dir).glob("cowrie.json*"))
+        assert connects == counts["sessions"]
+
+
+def test_same_arguments_give_same_logs(tmp_path):
+    first = generate(str(tmp_path / "a"), 64 * 1024, sensors=1, start=date(2024, 12, 1), days=1, seed=3)
+    second = generate(str(tmp_path / "b"), 64 * 1024, sensors=1, start=date(2024, 12, 1), days=1, seed=3)
+    assert list(first.values()) == list(second.values())
+    assert (tmp_path / "a" / "SENSOR_01" / "cowrie.json").read_bytes() == (tmp_path / "b" / "SENSOR_01" / "cowrie.json").read_bytes()
@@ -0,0 +1,33 @@
+import json
+import os
+
+from analysis import CowrieLogAnalyzer
+from conftest import sample_events, write_log
+from incremental import analyze_incremental, load_state
+
+
+def test_incremental_matches_full_analysis(tmp_path):
+    events = sample_events()
+    logfile = write_log(tmp_path / "cowrie.json", events[:20])
+    analyze_incremental(str(tmp_path))
+    with open(logfile, "a") as f:
+        for event in events[20:]:
+            f.write(json.dumps(event) + "\n")
+    reports = analyze_incremental(str(tmp_path))
+    assert json.dumps(reports) == json.dumps(CowrieLogAnalyzer(logfile, use_cache=False).analyze_all())
+
+
+def test_deleted_files_are_pruned(tmp_path):
+    events = sample_events()
+    old = write_log(tmp_path / "cowrie.json.2024-12-01", events[:10])
+    write_log(tmp_path / "cowrie.json", events[10:])
+    analyze_incremental(str(tmp_path))
+    assert len(load_state(str(tmp_path))["files"]) == 2
+    os.remove(old)
+    analyze_incremental(str(tmp_path))
+    assert [entry["path"] for entry in load_state(str(tmp_path))["files"].values()] == ["cowrie.json"]
+
+
+def test_merged_json_only_fails(tmp_path):
+    write_log(tmp_path / "merged.json", sample_events())
+    assert analyze_incremental(str(tmp_path)) is None
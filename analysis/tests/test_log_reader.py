@@ -0,0 +1,36 @@
+import json
+
+from aggregator import EventAggregator
+from log_reader import LOG_COLUMNS, iter_line_chunks, parse_line_block
+
+
+def _lines(commands):
+    lines = []
+    for i, command in enumerate(commands):
+        event = {"eventid": "cowrie.command.input", "timestamp": f"2024-12-01T00:00:{i:02d}.000000Z", "session": f"s{i}", "src_ip": "192.0.2.1", "input": command}
+        lines.append(json.dumps(event).encode() + b"\n")
+    return lines
+
+
+def test_numeric_looking_inputs_stay_strings():
+    chunk = parse_line_block(b"".join(_lines(["1", "2", "007"])), LOG_COLUMNS)
+    assert chunk["input"].tolist() == ["1", "2", "007"]
+
+
+def test_numeric_looking_inputs_across_chunks():
+    # One line per chunk, so the digit-only commands are parsed apart from "uname -a"
+    aggregator = EventAggregator()
+    aggregator.update_all(iter_line_chunks(_lines(["1", "2", "uname -a", "ls"]), LOG_COLUMNS, chunk_bytes=1))
+    commands = [command["input"] for command in aggregator.reports()["command_uniq"]["commands"]]
+    assert commands == ["1", "2", "ls", "uname -a"]
+
+
+def test_numeric_looking_inputs_through_cache(tmp_path):
+    # The second run reads the Parquet cache written by the first
+    from analysis import CowrieLogAnalyzer
+    from conftest import write_log
+
+    logfile = write_log(tmp_path / "cowrie.json", [json.loads(line) for line in _lines(["1", "2", "uname -a"])])
+    for _ in range(2):
+        reports = CowrieLogAnalyzer(logfile, chunk_bytes=1, use_cache=True).analyze_all(["command_uniq"])
+        assert [command["input"] for command in reports["command_uniq"]["commands"]] == ["1", "2", "uname -a"]
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+pytest.importorskip("duckdb")
+pytest.importorskip("pyarrow")
+
+from analysis import CowrieLogAnalyzer  # noqa: E402
+from conftest import sample_events, write_log  # noqa: E402
+from merge_logs import merge_groups, merge_to_file  # noqa: E402
+from query import REPORT_KEYS, connect, run_report, sync_dataset  # noqa: E402
+
+
+def test_reports_match_analysis(tmp_path):
+    sensor_dir = tmp_path / "COWRIE_BASE"
+    sensor_dir.mkdir()
+    logfile = write_log(sensor_dir / "cowrie.json", sample_events())
+    expected = CowrieLogAnalyzer(logfile, use_cache=False).analyze_all()
+    sync_dataset(str(tmp_path))
+    con = connect(str(tmp_path))
+
+    for name, key in REPORT_KEYS.items():
+        # Ties may be ordered differently, so compare the counts rather than the key order
+        assert run_report(con, name)[key] == expected[name][key], name
+    # The query orders sessions by timestamp, analysis.py by log position
+    commands = {c["input"]: sorted(c["session"]) for c in run_report(con, "command_uniq")["commands"]}
+    assert commands == {c["input"]: sorted(c["session"]) for c in expected["command_uniq"]["commands"]}
+
+
+def test_union_merged_json_is_not_synced(tmp_path):
+    events = sample_events()
+    for index, part in enumerate([events[: len(events) // 2], events[len(events) // 2:]]):
+        directory = tmp_path / f"CowrieShortTerm-{index}"
+        directory.mkdir()
+        write_log(directory / "cowrie.json", part)
+    # What merge_logs.sh does: COWRIE_SHORT_TERM/merged.json is the union of both directories
+    for directory, files in merge_groups(str(tmp_path)).items():
+        if files:
+            merge_to_file(files, os.path.join(directory, "merged.json"))
+    assert (tmp_path / "COWRIE_SHORT_TERM" / "merged.json").exists()
+
+    sync_dataset(str(tmp_path))
+    rows = connect(str(tmp_path)).execute("SELECT sensor_dir, count(*) FROM events GROUP BY ALL ORDER BY ALL").fetchall()
+    assert rows == [("CowrieShortTerm-0", len(events) // 2), ("CowrieShortTerm-1", len(events) - len(events) // 2)]
@@ -0,0 +1,31 @@
+import math
+
+import pytest
+
+from report_io import REPORT_FORMATS, dump_report, dumps_report, load_report, loads_report
+
+REPORT = {"ips": {"192.0.2.10": 3, "198.51.100.7": 1}, "commands": ["uname -a", "ls"], "total": 4}
+
+
+@pytest.mark.parametrize("fmt", list(REPORT_FORMATS))
+def test_round_trip(tmp_path, fmt):
+    if fmt == "zstd":
+        pytest.importorskip("zstandard")
+    if fmt == "msgpack":
+        pytest.importorskip("msgpack")
+    path = dump_report(REPORT, str(tmp_path / "ip_stats.json"), fmt)
+    assert load_report(str(tmp_path / "ip_stats.json")) == REPORT
+    assert load_report(path) == REPORT
+    assert loads_report(dumps_report(REPORT, fmt)) == REPORT
+
+
+def test_json_with_leading_whitespace_and_nan():
+    assert loads_report(b" " * 100 + b'{"a": 1}') == {"a": 1}
+    assert math.isnan(loads_report(b'{"a": NaN}')["a"])
+
+
+def test_gzip_of_msgpack():
+    msgpack = pytest.importorskip("msgpack")
+    import gzip
+
+    assert loads_report(gzip.compress(msgpack.packb(REPORT))) == REPORT
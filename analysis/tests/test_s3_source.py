@@ -0,0 +1,44 @@
+import gzip
+
+import pytest
+
+moto = pytest.importorskip("moto")
+
+from conftest import sample_events  # noqa: E402
+
+BUCKET = "cowrie-log"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.delenv("S3_ENDPOINT_URL", raising=False)
+    with moto.mock_aws():
+        import s3_source
+
+        # The shared client must be created inside the mock
+        monkeypatch.setattr(s3_source, "_client", None)
+        client = s3_source.get_s3_client()
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def test_gzip_object_closes_its_stream(s3):
+    from log_reader import LOG_COLUMNS, iter_log_chunks
+    from s3_source import find_s3_log_files, open_s3_object
+
+    body = b"".join(f"{{\"eventid\": \"{event['eventid']}\"}}\n".encode() for event in sample_events())
+    s3.put_object(Bucket=BUCKET, Key="COWRIE_A/cowrie.json.2024-12-01.gz", Body=gzip.compress(body))
+    s3.put_object(Bucket=BUCKET, Key="COWRIE_A/cowrie.json", Body=body)
+
+    f = open_s3_object(f"s3://{BUCKET}/COWRIE_A/cowrie.json.2024-12-01.gz")
+    stream = f.stream
+    assert f.read() == body
+    f.close()
+    assert stream.closed and stream.raw.closed
+
+    urls = find_s3_log_files(f"s3://{BUCKET}/COWRIE_A/")
+    assert [url.rsplit("/", 1)[-1] for url in urls] == ["cowrie.json.2024-12-01.gz", "cowrie.json"]
+    assert sum(len(chunk) for chunk in iter_log_chunks(urls, LOG_COLUMNS)) == 2 * len(sample_events())
@@ -0,0 +1,24 @@
+from sigma_condition import SigmaRuleSet
+
+PROCESS_CREATION_RULE = {
+    "title": "System Information Discovery",
+    "logsource": {"product": "linux", "category": "process_creation"},
+    "detection": {"selection": {"Image|endswith": "/uname", "CommandLine|contains": " -a"}, "condition": "selection"},
+}
+AUDITD_RULE = {
+    "title": "System Information Discovery - Auditd",
+    "logsource": {"product": "linux", "service": "auditd"},
+    "detection": {"selection": {"type": "EXECVE", "a0": "uname"}, "keywords": ["uname"], "condition": "selection or keywords"},
+}
+KEYWORD_RULE = {
+    "title": "Keyword Only",
+    "logsource": {"product": "linux"},
+    "detection": {"keywords": ["uname"], "condition": "keywords"},
+}
+
+
+def test_only_process_creation_rules_are_evaluated():
+    rule_set = SigmaRuleSet([PROCESS_CREATION_RULE, AUDITD_RULE, KEYWORD_RULE])
+    assert [compiled.title for compiled in rule_set.rules] == ["System Information Discovery"]
+    assert [rule["title"] for rule in rule_set.match_rules("uname -a; ls")] == ["System Information Discovery"]
+    assert rule_set.match_rules("ls -la") == []
@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+import httpx
+
+from vt_report import VTClient, WorkQueue, process_queue
+
+FOUND = "a" * 64
+MISSING = "b" * 64
+LIMITED = "c" * 64
+BROKEN = "d" * 64
+
+
+def stub_transport(calls):
+    """VirusTotal stand-in: 200 for FOUND, 404 for MISSING, one 429 then 200 for LIMITED, a non-JSON 200 for BROKEN"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sha256 = request.url.path.rsplit("/", 1)[-1]
+        calls.append(sha256)
+        if sha256 == MISSING:
+            return httpx.Response(404)
+        if sha256 == LIMITED and calls.count(LIMITED) == 1:
+            return httpx.Response(429)
+        if sha256 == BROKEN:
+            return httpx.Response(200, text="<html>")
+        return httpx.Response(200, json={"data": {"id": sha256}})
+
+    return httpx.MockTransport(handler)
+
+
+def client(calls):
+    return VTClient("key", "https://vt.invalid/api/v3/files/", requests_per_minute=60000, burst=10, concurrency=2, quota_backoff=0.01, transport=stub_transport(calls))
+
+
+def test_call_vt_api_statuses():
+    calls = []
+
+    async def fetch():
+        vt = client(calls)
+        try:
+            return [await vt.call_vt_api(sha256) for sha256 in (FOUND, MISSING, LIMITED)]
+        finally:
+            await vt.close()
+
+    found, missing, limited = asyncio.run(fetch())
+    assert found == {"data": {"id": FOUND}}
+    assert missing is None
+    # The 429 is retried after the backoff
+    assert limited == {"data": {"id": LIMITED}}
+    assert calls == [FOUND, MISSING, LIMITED, LIMITED]
+
+
+def test_process_queue(tmp_path):
+    queue = WorkQueue(tmp_path / ".vt_queue.json", tmp_path)
+    queue.extend([FOUND, MISSING, LIMITED, BROKEN])
+
+    async def process():
+        vt = client([])
+        try:
+            await process_queue(queue, vt)
+        finally:
+            await vt.close()
+
+    asyncio.run(process())
+    with (tmp_path / f"{FOUND}.json").open() as f:
+        assert json.load(f) == {"data": {"id": FOUND}}
+    assert (tmp_path / f"{LIMITED}.json").exists()
+    assert not list(tmp_path.glob("*.tmp"))
+    # Unknown hashes are remembered; a broken response stays queued for the next run
+    assert queue.not_found == {MISSING}
+    assert queue.pending == [BROKEN]
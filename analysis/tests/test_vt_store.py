@@ -0,0 +1,30 @@
+import json
+
+from vt_store import ReportStore, build_view
+
+SHA256 = "a" * 64
+
+
+def test_import_skips_queue_and_non_hash_files(tmp_path):
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    (reports / ".vt_queue.json").write_text(json.dumps({"pending": [], "not_found": []}))
+    (reports / "notes.json").write_text("{}")
+    (reports / f"{SHA256}.json").write_text(json.dumps({"data": {"id": SHA256}}))
+
+    store = ReportStore(tmp_path / "store.sqlite")
+    assert store.import_report_files([reports]) == 1
+    assert [row[0] for row in store.connection.execute("SELECT sha256 FROM reports")] == [SHA256]
+    store.close()
+
+
+def test_build_view(tmp_path):
+    (tmp_path / "download_hash.json").write_text(json.dumps({"download_files": {SHA256: 1}}))
+    store = ReportStore(tmp_path / "store.sqlite")
+    store.put(SHA256, {"data": {"id": SHA256}})
+    assert build_view(store, tmp_path / "download_hash.json") == 1
+    # Unchanged since the report file was written
+    assert build_view(store, tmp_path / "download_hash.json") == 0
+    assert json.loads((tmp_path / "reports" / f"{SHA256}.json").read_text()) == {"data": {"id": SHA256}}
+    assert not list((tmp_path / "reports").glob("*.tmp"))
+    store.close()
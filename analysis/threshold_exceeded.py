@@ -1,6 +1,7 @@
-import json
 import os
 
+from report_io import find_report, load_report
+
 def calculate_operation_stats(directory, threshold=100):
     """
     指定されたディレクトリ内のCowrieShortTerm-* ディレクトリにある daily_connect.json ファイルを処理し、
@@ -22,14 +23,13 @@ def calculate_operation_stats(directory, threshold=100):
         if os.path.isdir(item_path) and item.startswith("CowrieShortTerm-"):
             daily_connect_path = os.path.join(item_path, "daily_connect.json")
 
-            if os.path.exists(daily_connect_path):
+            if find_report(daily_connect_path):
                 try:
-                    with open(daily_connect_path, "r") as f:
-                        data = json.load(f)
-                        ssh_attempts_by_date = data.get("ssh_attempts_by_date", {})
-                        total_days += len(ssh_attempts_by_date)
-                        threshold_exceeded_days += sum(1 for count in ssh_attempts_by_date.values() if count > threshold)
-                except (FileNotFoundError, json.JSONDecodeError) as e:
+                    data = load_report(daily_connect_path)
+                    ssh_attempts_by_date = data.get("ssh_attempts_by_date", {})
+                    total_days += len(ssh_attempts_by_date)
+                    threshold_exceeded_days += sum(1 for count in ssh_attempts_by_date.values() if count > threshold)
+                except (FileNotFoundError, ValueError) as e:
                     print(f"Error processing {daily_connect_path}: {e}")
                     continue
             else:
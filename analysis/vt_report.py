@@ -1,25 +1,35 @@
 import os, sys
+import asyncio
 import json
 import time
 from datetime import datetime, timedelta, timezone
 from logging import INFO, getLogger, basicConfig
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
-import requests
+import httpx
 from dotenv import load_dotenv
 
+import metrics
+from report_io import load_report
+
 # Load environment variables from .env file
 load_dotenv()
 
 # Get API key from environment variable
-API_KEY = str(os.getenv("API_KEY"))
-if not API_KEY:
-    raise ValueError("Environment variable 'API_KEY' is not set.")
+API_KEY: str = os.getenv("API_KEY", "")
 HASH_LIST_PATH: Path = Path(os.getenv("HASH_LIST_PATH", "download_hash.json"))
 DOWNLOAD_DIR: Path = Path(os.getenv("DOWNLOAD_DIR", "./reports"))
-DOWNLOAD_DIR.mkdir(exist_ok=True)
-VT_API_URL: str = "https://www.virustotal.com/api/v3/files/"
+QUEUE_PATH: Path = Path(os.getenv("VT_QUEUE_PATH", str(DOWNLOAD_DIR / ".vt_queue.json")))
+VT_API_URL: str = os.getenv("VT_API_URL", "https://www.virustotal.com/api/v3/files/")
+# Public API tier: 4 requests per minute; raise these for premium keys
+REQUESTS_PER_MINUTE: float = float(os.getenv("VT_REQUESTS_PER_MINUTE", "4"))
+BURST: int = int(os.getenv("VT_BURST", "1"))
+CONCURRENCY: int = int(os.getenv("VT_CONCURRENCY", "4"))
+MAX_RETRIES: int = int(os.getenv("VT_MAX_RETRIES", "5"))
+# Backoff after HTTP 429, doubled on every consecutive quota error
+QUOTA_BACKOFF_SECONDS: float = float(os.getenv("VT_QUOTA_BACKOFF", "60"))
+QUOTA_BACKOFF_MAX_SECONDS: float = float(os.getenv("VT_QUOTA_BACKOFF_MAX", "3600"))
 
 # Initialize logger
 formatter = "%(asctime)s - %(levelname)8s - %(message)s"
@@ -27,64 +37,218 @@ basicConfig(stream=sys.stdout, format=formatter, level=INFO)
 logger = getLogger(__name__)
 
 
-def call_vt_api(sha256: str) -> dict[str, Any] | None:
-    """Call the VirusTotal API and return the response."""
-    headers: dict[str, str] = {"x-apikey": API_KEY}
-    logger.info(f"Requesting {sha256}")
+class TokenBucket:
+    """Async token bucket allowing `rate` requests per second with bursts of `capacity`"""
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class WorkQueue:
+    """Persistent queue of hashes to fetch, surviving restarts
+
+    Hashes whose report already exists in the download directory are never queued, and
+    hashes unknown to VirusTotal (HTTP 404) are remembered so they are not requested again.
+    """
+
+    def __init__(self, path: Path, download_dir: Path) -> None:
+        self.path = path
+        self.download_dir = download_dir
+        self.pending: list[str] = []
+        self.not_found: set[str] = set()
+        if path.exists():
+            with path.open("r") as f:
+                state = json.load(f)
+            self.pending = state.get("pending", [])
+            self.not_found = set(state.get("not_found", []))
+
+    def report_path(self, sha256: str) -> Path:
+        return self.download_dir.joinpath(sha256 + ".json")
+
+    def extend(self, hashes: Iterable[str]) -> None:
+        """Queue hashes that have neither a report on disk nor are known to be missing"""
+        queued = set(self.pending)
+        for sha256 in hashes:
+            if sha256 not in queued and sha256 not in self.not_found:
+                self.pending.append(sha256)
+                queued.add(sha256)
+        self.pending = [sha256 for sha256 in self.pending if not self.report_path(sha256).exists()]
+        self.save()
+
+    def done(self, sha256: str, found: bool = True) -> None:
+        if sha256 in self.pending:
+            self.pending.remove(sha256)
+        if not found:
+            self.not_found.add(sha256)
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("w") as f:
+            json.dump({"pending": self.pending, "not_found": sorted(self.not_found)}, f)
+        os.replace(tmp_path, self.path)
+
+
+class QuotaExceeded(Exception):
+    """Raised on HTTP 429"""
+
 
-    # Send a request to VirusTotal
-    response = requests.get(VT_API_URL + sha256, headers=headers)
+class VTClient:
+    """VirusTotal client sharing one pooled connection, rate limited by a token bucket"""
 
-    # Handle successful response
-    if response.status_code == 200:
-        return response.json()
-    # Handle QuotaExceededError
-    elif response.status_code == 429:
-        logger.warning("Quota exceeded... waiting until UTC midnight to request again.")
-        wait_until_utc_midnight()  # Wait until next UTC midnight
-        return call_vt_api(sha256)  # Retry the request
-    else:
-        logger.error(f"Error: {response.status_code} {response.text}")
-        return None
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str = VT_API_URL,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+        burst: int = BURST,
+        concurrency: int = CONCURRENCY,
+        quota_backoff: float = QUOTA_BACKOFF_SECONDS,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.api_url = api_url
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.concurrency = concurrency
+        self.client = httpx.AsyncClient(
+            headers={"x-apikey": api_key},
+            timeout=httpx.Timeout(60.0),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            transport=transport,  # e.g. httpx.MockTransport in tests
+        )
+        self.initial_quota_backoff = quota_backoff
+        self.quota_backoff = quota_backoff
+        self.paused_until = 0.0
 
+    async def close(self) -> None:
+        await self.client.aclose()
 
-def wait_until_utc_midnight() -> None:
-    """Wait until UTC midnight."""
+    async def _wait_for_quota(self) -> None:
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def call_vt_api(self, sha256: str) -> dict[str, Any] | None:
+        """Call the VirusTotal API and return the response, or None if the file is unknown"""
+        errors = 0
+        while True:
+            await self._wait_for_quota()
+            await self.bucket.acquire()
+            logger.info(f"Requesting {sha256}")
+            try:
+                response = await self.client.get(self.api_url + sha256)
+            except httpx.TransportError as e:
+                response = None
+                logger.warning(f"Request for {sha256} failed: {e}")
+
+            if response is not None and response.status_code == 200:
+                self.quota_backoff = self.initial_quota_backoff
+                return response.json()
+            if response is not None and response.status_code == 404:
+                logger.info(f"{sha256} is not known to VirusTotal")
+                return None
+            if response is not None and response.status_code == 429:
+                # Pause every worker, backing off exponentially while the quota stays exhausted
+                wait = min(self.quota_backoff, seconds_until_utc_midnight() + 1, QUOTA_BACKOFF_MAX_SECONDS)
+                logger.warning(f"Quota exceeded... retrying in {wait:.0f} seconds.")
+                self.paused_until = max(self.paused_until, time.monotonic() + wait)
+                self.quota_backoff = min(self.quota_backoff * 2, QUOTA_BACKOFF_MAX_SECONDS)
+                continue
+
+            errors += 1
+            if response is not None:
+                logger.error(f"Error: {response.status_code} {response.text}")
+            if errors > MAX_RETRIES:
+                raise RuntimeError(f"Giving up on {sha256} after {MAX_RETRIES} retries")
+            await asyncio.sleep(min(2**errors, 60))
+
+
+def seconds_until_utc_midnight() -> float:
+    """Seconds until the next UTC midnight, when the daily quota resets"""
     now: datetime = datetime.now(timezone.utc)
     tomorrow: datetime = now + timedelta(days=1)
-    midnight: datetime = datetime(
-        year=tomorrow.year,
-        month=tomorrow.month,
-        day=tomorrow.day,
-        hour=0,
-        minute=0,
-        second=0,
-        tzinfo=timezone.utc,
-    )
+    midnight: datetime = datetime(year=tomorrow.year, month=tomorrow.month, day=tomorrow.day, tzinfo=timezone.utc)
+    return (midnight - now).total_seconds()
 
-    # Calculate the number of seconds to wait until midnight
-    wait_seconds: int = (midnight - now).seconds
-    time.sleep(wait_seconds)
 
+def save_report(path: Path, report: dict[str, Any]) -> None:
+    """Write a report atomically, so an interrupted write never leaves a truncated <sha256>.json behind"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w") as f:
+        json.dump(report, f, indent=4)  # Pretty print the JSON
+    os.replace(tmp_path, path)
 
-def main() -> None:
-    with HASH_LIST_PATH.open("r") as f:
-        loaded_json = json.load(f)
-        for sha256, _ in loaded_json["download_files"].items():
-            response: dict[str, Any] | None = call_vt_api(sha256)
 
-            # Skip if the response is None (indicating an error or quota exceeded)
-            if response is None:
+def load_hashes(hash_list_path: Path) -> list[str]:
+    """Read the hashes of download_hash.json (written in any report format)"""
+    return list(load_report(str(hash_list_path))["download_files"])
+
+
+async def process_queue(queue: WorkQueue, client: VTClient) -> None:
+    """Fetch every pending hash with client.concurrency workers"""
+    work: asyncio.Queue[str] = asyncio.Queue()
+    for sha256 in list(queue.pending):
+        work.put_nowait(sha256)
+    logger.info(f"{work.qsize()} hashes queued")
+
+    async def worker() -> None:
+        while True:
+            try:
+                sha256 = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            metrics.VT_QUEUE_DEPTH.set(work.qsize())
+            try:
+                response = await client.call_vt_api(sha256)
+                if response is None:
+                    queue.done(sha256, found=False)
+                    continue
+                save_report(queue.report_path(sha256), response)
+            except Exception as e:
+                # e.g. retries exhausted or a 200 response that is not JSON: leave the hash queued
+                # for the next run and keep this worker going
+                logger.error(f"Failed to fetch {sha256}: {e}")
                 continue
+            logger.info(f"Saved {sha256}.json")
+            queue.done(sha256)
+
+    await asyncio.gather(*(worker() for _ in range(client.concurrency)))
 
-            # Save the response to a file
-            file_path: Path = DOWNLOAD_DIR.joinpath(sha256 + ".json")
-            with file_path.open("w") as f:
-                json.dump(response, f, indent=4)  # Pretty print the JSON
-                logger.info(f"Saved {sha256}.json")
 
-            # Wait for 15 seconds to avoid hitting the rate limit
-            time.sleep(15)
+async def run(hashes: Iterable[str], download_dir: Path = DOWNLOAD_DIR, queue_path: Path = QUEUE_PATH, api_key: str = API_KEY, api_url: str = VT_API_URL) -> WorkQueue:
+    """Queue hashes that have no report yet and fetch them"""
+    download_dir.mkdir(parents=True, exist_ok=True)
+    queue = WorkQueue(queue_path, download_dir)
+    queue.extend(hashes)
+    client = VTClient(api_key, api_url)
+    try:
+        await process_queue(queue, client)
+    finally:
+        await client.close()
+    return queue
+
+
+def main() -> None:
+    if not API_KEY:
+        raise ValueError("Environment variable 'API_KEY' is not set.")
+    # Configured by COWRIE_METRICS_PORT / COWRIE_METRICS_TEXTFILE
+    metrics.start_metrics()
+    asyncio.run(run(load_hashes(HASH_LIST_PATH)))
 
 
 if __name__ == "__main__":
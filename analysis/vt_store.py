@@ -0,0 +1,171 @@
+import os
+import argparse
+import asyncio
+import glob
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any
+
+import metrics
+from report_io import find_report
+from vt_report import API_KEY, VT_API_URL, VTClient, load_hashes, logger, save_report
+
+DEFAULT_STORE_PATH: Path = Path(os.getenv("VT_STORE_PATH", "../logs/vt_reports.sqlite"))
+# Reports are refreshed after this many days; hashes unknown to VirusTotal are retried sooner
+REPORT_TTL_DAYS: float = float(os.getenv("VT_REPORT_TTL_DAYS", "30"))
+NOT_FOUND_TTL_DAYS: float = float(os.getenv("VT_NOT_FOUND_TTL_DAYS", "7"))
+# Report files are named <sha256>.json
+SHA256_PATTERN: re.Pattern = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ReportStore:
+    """VirusTotal reports of every sensor directory, stored once per sha256 in SQLite"""
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH, report_ttl_days: float = REPORT_TTL_DAYS, not_found_ttl_days: float = NOT_FOUND_TTL_DAYS) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS reports (sha256 TEXT PRIMARY KEY, report TEXT, found INTEGER NOT NULL, fetched_at REAL NOT NULL)")
+        self.connection.commit()
+        self.report_ttl = report_ttl_days * 86400
+        self.not_found_ttl = not_found_ttl_days * 86400
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def put(self, sha256: str, report: dict[str, Any] | None, fetched_at: float | None = None) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO reports (sha256, report, found, fetched_at) VALUES (?, ?, ?, ?)",
+            (sha256, json.dumps(report) if report is not None else None, report is not None, fetched_at or time.time()),
+        )
+        self.connection.commit()
+
+    def get(self, sha256: str) -> dict[str, Any] | None:
+        row = self.connection.execute("SELECT report FROM reports WHERE sha256 = ? AND found", (sha256,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def fetched_at(self, sha256: str) -> float | None:
+        row = self.connection.execute("SELECT fetched_at FROM reports WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def stale(self, hashes: set[str]) -> list[str]:
+        """Hashes that are missing from the store or older than their TTL"""
+        now = time.time()
+        fresh = set()
+        for sha256, found, fetched_at in self.connection.execute("SELECT sha256, found, fetched_at FROM reports"):
+            if now - fetched_at < (self.report_ttl if found else self.not_found_ttl):
+                fresh.add(sha256)
+        return sorted(hashes - fresh)
+
+    def import_report_files(self, report_dirs: list[Path]) -> int:
+        """Import reports already downloaded into per-directory reports/ folders
+
+        Only <sha256>.json files are reports; reports/.vt_queue.json is the WorkQueue of vt_report.py.
+        """
+        known = {row[0] for row in self.connection.execute("SELECT sha256 FROM reports")}
+        imported = 0
+        for report_dir in report_dirs:
+            for report_file in report_dir.glob("*.json"):
+                sha256 = report_file.stem
+                if sha256 in known or not SHA256_PATTERN.match(sha256):
+                    continue
+                try:
+                    with report_file.open("r") as f:
+                        report = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.warning(f"Skipping {report_file}: {e}")
+                    continue
+                self.put(sha256, report, report_file.stat().st_mtime)
+                known.add(sha256)
+                imported += 1
+        return imported
+
+
+def find_hash_lists(logs_root: Path) -> list[Path]:
+    """download_hash.json of every COWRIE* directory, whichever report format it was written in"""
+    return [Path(p) / "download_hash.json" for p in sorted(glob.glob(str(logs_root / "COWRIE*"))) if find_report(os.path.join(p, "download_hash.json"))]
+
+
+async def refresh(store: ReportStore, hashes: list[str], api_key: str = API_KEY, api_url: str = VT_API_URL) -> None:
+    """Fetch the given hashes once each and save them into the store"""
+    work: asyncio.Queue[str] = asyncio.Queue()
+    for sha256 in hashes:
+        work.put_nowait(sha256)
+    client = VTClient(api_key, api_url)
+
+    async def worker() -> None:
+        while True:
+            try:
+                sha256 = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            metrics.VT_QUEUE_DEPTH.set(work.qsize())
+            try:
+                store.put(sha256, await client.call_vt_api(sha256))
+            except Exception as e:
+                # The hash stays stale and is fetched on the next run
+                logger.error(f"Failed to fetch {sha256}: {e}")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(client.concurrency)))
+    finally:
+        await client.close()
+
+
+def build_view(store: ReportStore, hash_list_path: Path) -> int:
+    """Write reports/<sha256>.json next to a download_hash.json from the store, without API calls"""
+    report_dir = hash_list_path.parent / "reports"
+    report_dir.mkdir(exist_ok=True)
+    written = 0
+    for sha256 in load_hashes(hash_list_path):
+        report_file = report_dir / f"{sha256}.json"
+        fetched_at = store.fetched_at(sha256)
+        if fetched_at is None or (report_file.exists() and report_file.stat().st_mtime >= fetched_at):
+            continue
+        report = store.get(sha256)
+        if report is None:
+            continue
+        save_report(report_file, report)
+        written += 1
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Resolve download_hash.json of every sensor directory against one shared VirusTotal report store.")
+    parser.add_argument("--logs-root", type=Path, default=Path("../logs"), help="Directory containing the COWRIE* sensor directories (default: ../logs)")
+    parser.add_argument("--store", type=Path, default=DEFAULT_STORE_PATH, help="SQLite report store (default: ../logs/vt_reports.sqlite)")
+    parser.add_argument("--offline", action="store_true", help="Only rebuild the per-directory reports/ views from the store")
+    metrics.add_metrics_arguments(parser)
+    args = parser.parse_args()
+    metrics.start_metrics(args.metrics_port, args.metrics_textfile)
+
+    store = ReportStore(args.store)
+    hash_lists = find_hash_lists(args.logs_root)
+    imported = store.import_report_files([p.parent / "reports" for p in hash_lists])
+    if imported:
+        logger.info(f"Imported {imported} existing reports into {args.store}")
+
+    hashes = set()
+    for hash_list_path in hash_lists:
+        hashes.update(load_hashes(hash_list_path))
+    stale = store.stale(hashes)
+    logger.info(f"{len(hashes)} unique hashes in {len(hash_lists)} directories, {len(stale)} to fetch")
+
+    if stale and not args.offline:
+        if not API_KEY:
+            raise ValueError("Environment variable 'API_KEY' is not set.")
+        asyncio.run(refresh(store, stale))
+
+    for hash_list_path in hash_lists:
+        written = build_view(store, hash_list_path)
+        logger.info(f"Wrote {written} reports for {hash_list_path.parent}")
+    store.close()
+
+
+if __name__ == "__main__":
+    logger.info("Start")
+    main()
+    logger.info("End")